@@ -1,5 +1,13 @@
+from sphinx.config import ENUM
+
 from .builder import DocxBuilder
 
 def setup(app):
     app.add_builder(DocxBuilder)
     app.add_config_value('docx_template', None, 'env')
+    app.add_config_value('docx_trace', False, '')
+    app.add_config_value('docx_streaming', False, '')
+    app.add_config_value('docx_assembly', 'inline', '', ENUM('inline', 'chapter'))
+    app.add_config_value('docx_image_dpi', 150, 'env')
+    app.add_config_value('docx_image_quality', 85, 'env')
+    return {'parallel_read_safe': True, 'parallel_write_safe': True}
@@ -3,20 +3,34 @@
 该模块实现了 Sphinx 的 DOCX 文档构建器，能够将 reStructuredText 转换为符合 OpenXML 标准的 Word 文档。
 主要包含 DocxBuilder 类，负责协调整个文档生成流程，并整合各种变换组件。
 """
-from collections.abc import Iterable, Sequence
+import hashlib
+import os
+import time
+from collections import Counter, defaultdict
+from collections.abc import Iterable, Iterator
 from typing import Literal
 from pathlib import Path
 from docutils import nodes
 from docutils.io import StringOutput
+from docutils.utils import new_document
+from docx import Document
+from sphinx import addnodes
 from sphinx.builders import Builder
 from sphinx.util.osutil import os_path
 from sphinx.util.nodes import inline_all_toctrees
+from sphinx.locale import __
 from sphinx.util import logging
+from sphinx.util.parallel import ParallelTasks, parallel_available
 from sphinx.util.console import bold, darkgreen, brown
+from .merge import merge_parts, part_marker
+from .stream import stream_parts
 from .writer import DocxWriter
 
 logger = logging.getLogger(__name__)
 
+# 分部缓存格式版本，转换逻辑变化导致输出不同时递增
+PART_CACHE_VERSION = 2
+
 
 class DocxBuilder(Builder):
     name = 'docx' # 构建器的名称，用于 `-b` 命令行选项的生成器名称。
@@ -26,13 +40,48 @@ class DocxBuilder(Builder):
     default_translator_class: type[nodes.NodeVisitor]
     file_suffix = '.docx'
 
+    @property
+    def output_path(self) -> Path:
+        """合并后的 DOCX 文件路径"""
+        name = os_path("%s-%s" % (self.config.project, self.config.version))
+        return Path(self.outdir) / (name + self.file_suffix)
+
+    @property
+    def part_cache_dir(self) -> Path:
+        """章节分部缓存目录"""
+        return Path(self.doctreedir) / 'docx-parts'
+
+    @property
+    def output_state_path(self) -> Path:
+        """记录生成当前输出文件时所用设置的摘要文件"""
+        return self.part_cache_dir / 'output.sha256'
+
+    @property
+    def image_cache_dir(self) -> Path:
+        """缩放后的图片缓存目录"""
+        return Path(self.doctreedir) / 'docx-images'
+
     def get_outdated_docs(self) -> str | Iterable[str]:
         """返回过时的输出文件的可迭代对象，或者描述更新构建将构建的内容的字符串。
 
-        如果构建器不输出与源文件对应的单个文件，则在此处返回字符串。
-        如果它输出，则返回迭代器，包含需要写入的这些文件。
+        所有文档合并为一个 DOCX 文件：输出文件不存在时重建全部文档，
+        否则返回源文件或 doctree 比输出文件新的文档。
         """
-        return 'pass'
+        try:
+            target_mtime = self.output_path.stat().st_mtime
+        except OSError:
+            return 'all documents'
+        outdated = []
+        for docname in self.env.found_docs:
+            paths = (self.env.doc2path(docname), Path(self.doctreedir) / f"{docname}.doctree")
+            try:
+                mtime = max(Path(path).stat().st_mtime for path in paths)
+            except OSError:
+                outdated.append(docname)
+                continue
+            if mtime > target_mtime:
+                outdated.append(docname)
+        return outdated
 
     def get_target_uri(self, docname: str, typ: str | None = None) -> str:
         """返回文档名称的目标 URI。
@@ -44,22 +93,52 @@ class DocxBuilder(Builder):
 
     def prepare_writing(self, docnames: set[str]) -> None:
         """在运行 :meth:`write_doc` 之前可以添加逻辑的地方"""
-        self.writer = DocxWriter(self)
+        self.part_cache_dir.mkdir(parents=True, exist_ok=True)
 
     def write_doc(self, docname: str, doctree: nodes.document) -> None:
-        """最终将内容写入文件系统的地方。
-        
-        输出文件名必须在此方法中确定，通常通过调用 get_target_uri() 或 get_relative_uri() 。
+        """把一个分部的文档树转换并保存到分部缓存中。
+
+        参数:
+            docname (str): 分部缓存键
+            doctree (nodes.document): 分部文档树
+        """
+        self._collect(self._translate_part((docname, doctree)))
+
+    def _translate_part(self, task: tuple[str, nodes.document]) -> tuple[list | None, Counter]:
+        """转换一个分部，并行时在子进程中执行。
+
+        返回:
+            tuple: 开启 docx_trace 时的节点类型统计，与缺失样式的使用次数
         """
+        key, doctree = task
+        writer = DocxWriter(self)
         destination = StringOutput(encoding='utf-8')
-        self.writer.write(doctree, destination)
-        
-        outfilename = f"{self.outdir}/{os_path(docname) + self.file_suffix}"
-        Path(outfilename).parent.mkdir(parents=True, exist_ok=True)
-        try:
-            self.writer.save(outfilename)
-        except (IOError, OSError) as err:
-            logger.warning(f"error writing file {outfilename}: {err}")
+        writer.write(doctree, destination)
+
+        outfilename = self.part_cache_dir / (key + self.file_suffix)
+        outfilename.parent.mkdir(parents=True, exist_ok=True)
+        # 并行时各进程写入不同的分部，临时文件名仍带上进程号以防万一
+        tmpfilename = outfilename.with_name(f"{outfilename.name}.{os.getpid()}.tmp")
+        writer.save(tmpfilename)
+        tmpfilename.replace(outfilename)
+        return writer.trace, writer.missing_styles
+
+    def _collect(self, result: tuple[list | None, Counter]) -> None:
+        trace, missing_styles = result
+        for name, count, seconds in trace or ():
+            self.trace_counts[name] += count
+            self.trace_times[name] += seconds
+        self.missing_styles.update(missing_styles)
+
+    def _add_part_task(self, tasks: ParallelTasks, key: str, part: nodes.document) -> None:
+        """把分部交给进程池转换，分部文件写入缓存目录，只回传统计数据。
+
+        进行中的分部已达到进程数时先等待其中一个完成，尚未转换的分部文档树不会积压在主进程中。
+        """
+        while tasks._pworking + len(tasks._precvs_waiting) >= tasks.nproc:
+            if not tasks._join_one():
+                time.sleep(0.02)
+        tasks.add_task(self._translate_part, (key, part), lambda arg, result: self._collect(result))
 
     def fix_refuris(self, tree):
         """修复文档树中的双重锚点引用问题。
@@ -109,31 +188,271 @@ class DocxBuilder(Builder):
         self.fix_refuris(tree)
         return tree
 
+    def split_parts(self, tree: nodes.document) -> list[nodes.document]:
+        """在根文档的目录树处把组装后的文档树拆分为分部。
+
+        根文档目录树中的每个文档（连同其子文档）成为一个章节分部，在根分部中以一个只含占位段落的
+        ``start_of_file`` 节点代替；转换时 ``start_of_file`` 会重置标题级别，与整体转换的结果一致。
+
+        返回:
+            list: 根分部与各章节分部，章节分部的序号与占位文本对应
+        """
+        root = self.config.root_doc
+        chapters = [
+            node for node in tree.findall(addnodes.start_of_file)
+            if node.parent is not None and self._parent_file(node) == root
+        ]
+        parts = [tree]
+        for index, chapter in enumerate(chapters, start=1):
+            placeholder = addnodes.start_of_file(docname=chapter['docname'])
+            placeholder += nodes.paragraph('', part_marker(index))
+            chapter.replace_self(placeholder)
+            part = new_document(chapter['docname'], tree.settings)
+            part['docname'] = chapter['docname']
+            part += chapter
+            parts.append(part)
+        return parts
+
+    @staticmethod
+    def _parent_file(node: nodes.Node) -> str | None:
+        parent = node.parent
+        while parent is not None:
+            if isinstance(parent, addnodes.start_of_file):
+                return parent['docname']
+            if isinstance(parent, nodes.document):
+                return parent.get('docname')
+            parent = parent.parent
+        return None
+
+    def iter_document_parts(self) -> Iterator[tuple[int, nodes.document]]:
+        """按目录树顺序逐个载入、解析文档，每个文档成为一个分部。
+
+        与 :meth:`assemble_doctree` 不同，文档不内联为一个完整的文档树：文档中的目录树由只含占位段落的
+        ``start_of_file`` 节点代替，所含文档在其后依次产生。交叉引用由环境中各领域的全局索引解析，
+        同一时间只需保留一个文档的文档树。
+
+        分部按深度优先顺序产生，而占位序号在载入上级文档时分配，两者不一定一致，因此与分部一同产生。
+
+        返回:
+            Iterator[tuple]: ``(占位序号, 分部)``，根分部的序号为 0
+        """
+        root = self.config.root_doc
+        traversed = {root}
+        index = 0
+
+        def load(docname, parent):
+            nonlocal index
+            tree = self.env.get_doctree(docname)
+            children = []
+            for toctreenode in list(tree.findall(addnodes.toctree)):
+                placeholders = []
+                for includefile in map(str, toctreenode['includefiles']):
+                    if includefile in traversed:
+                        continue
+                    if includefile not in self.env.all_docs:
+                        logger.warning(__('toctree contains ref to nonexisting file %r'),
+                                       includefile, location=docname,
+                                       type='toc', subtype='not_readable')
+                        continue
+                    traversed.add(includefile)
+                    index += 1
+                    placeholder = addnodes.start_of_file(docname=includefile)
+                    placeholder += nodes.paragraph('', part_marker(index))
+                    placeholders.append(placeholder)
+                    children.append((index, includefile))
+                toctreenode.parent.replace(toctreenode, placeholders)
+            self.env.resolve_references(tree, docname, self)
+            self.fix_refuris(tree)
+            if parent is None:
+                tree['docname'] = docname
+                return tree, children
+            # 与 inline_all_toctrees 相同，文档内容包在 start_of_file 节点中
+            part = new_document(docname, tree.settings)
+            part['docname'] = docname
+            sof = addnodes.start_of_file(docname=docname)
+            sof.children = tree.children
+            for child in sof.children:
+                child.parent = sof
+            for sectionnode in sof.findall(nodes.section):
+                if 'docname' not in sectionnode:
+                    sectionnode['docname'] = docname
+            part += sof
+            return part, children
+
+        def walk(marker, docname, parent):
+            part, children = load(docname, parent)
+            yield marker, part
+            del part
+            for child_marker, child in children:
+                yield from walk(child_marker, child, docname)
+
+        yield from walk(0, root, None)
+
+    def settings_digest(self) -> str:
+        """返回影响分部转换结果的设置摘要：缓存格式版本、模板内容与图片设置"""
+        digest = hashlib.sha256()
+        digest.update(f"{PART_CACHE_VERSION}\n".encode())
+        template = self.config['docx_template']
+        if template:
+            path = Path(self.confdir) / template
+            digest.update(f"{template}\n".encode())
+            digest.update(path.read_bytes() if path.exists() else b'')
+        image_settings = f"{self.config['docx_image_dpi']}:{self.config['docx_image_quality']}"
+        digest.update(f"{image_settings}\n".encode())
+        return digest.hexdigest()
+
+    def output_state(self) -> str:
+        """返回影响输出文件的设置摘要，在分部转换设置之外还包括组装与合并方式"""
+        return (f"{self.settings_digest()}:{self.config['docx_assembly']}:"
+                f"{bool(self.config['docx_streaming'])}")
+
+    def part_key(self, part: nodes.document, settings: str) -> str:
+        """返回分部的缓存键，由文档树内容、图片与转换设置决定
+
+        参数:
+            part (nodes.document): 分部文档树
+            settings (str): :meth:`settings_digest` 返回的设置摘要
+        """
+        digest = hashlib.sha256()
+        digest.update(f"{settings}\n".encode())
+        # 图片内容不在文档树中，以文件修改时间代替
+        for image in part.findall(nodes.image):
+            path = Path(self.env.srcdir) / image['uri']
+            mtime = path.stat().st_mtime if path.exists() else ''
+            digest.update(f"{image['uri']}:{mtime}\n".encode())
+        digest.update(part.pformat().encode('utf-8'))
+        return digest.hexdigest()
+
     def write(self, build_docnames: Iterable[str] | None,
         updated_docnames: Iterable[str],
         method: Literal['all', 'specific', 'update'] = 'update',):
-        """执行完整的文档生成流程，包含三个阶段：
+        """执行完整的文档生成流程，包含四个阶段：
         
-        1. 准备阶段：初始化文档写入器
-        2. 组装阶段：构建完整的文档树结构
-        3. 写入阶段：将最终文档树输出为 DOCX 文件
+        1. 准备阶段：创建分部缓存目录；没有过时文档、输出已存在且设置未变化时直接跳过
+        2. 组装阶段：构建完整的文档树结构并按根文档的目录树拆分为分部；
+           ``docx_assembly = 'chapter'`` 时改为按目录树顺序逐个载入文档，每个文档一个分部
+        3. 写入阶段：只转换内容变化（缓存中不存在）的分部；并行时分部产生后即交给子进程，
+           同时进行中的分部不超过进程数
+        4. 合并阶段：把各分部合并为最终的 DOCX 文件
         
             
         日志输出：
             - 准备阶段耗时状态
             - 文档组装进度提示
+            - 分部转换与缓存复用情况
             - 文件写入操作结果
         """
         docnames = self.env.all_docs
+        state = self.output_state()
+        if (method == 'update' and not build_docnames and not updated_docnames
+                and self.output_path.exists() and self.read_output_state() == state):
+            logger.info(bold('docx output is up to date'))
+            return
 
         logger.info(bold('preparing documents... '), nonl=True)
         self.prepare_writing(docnames)
         logger.info('done')
 
-        logger.info(bold('assembling single document... '), nonl=True)
-        doctree = self.assemble_doctree()
-        logger.info('')
-        logger.info(bold('writing... '), nonl=True)
-        docname = "%s-%s" % (self.config.project, self.config.version)
-        self.write_doc(docname, doctree)
+        if self.config['docx_assembly'] == 'chapter':
+            parts = self.iter_document_parts()
+        else:
+            logger.info(bold('assembling single document... '), nonl=True)
+            parts = enumerate(self.split_parts(self.assemble_doctree()))
+            logger.info('')
+
+        self.trace_counts = Counter()
+        self.trace_times = defaultdict(float)
+        self.missing_styles = Counter()
+        keys = {}
+        nproc = self._app.parallel
+        tasks = ParallelTasks(nproc) if parallel_available and nproc > 1 else None
+        translated = 0
+        settings = self.settings_digest()
+        for marker, part in parts:
+            key = self.part_key(part, settings)
+            keys[marker] = key
+            if (self.part_cache_dir / (key + self.file_suffix)).exists():
+                continue
+            translated += 1
+            logger.info(bold('writing part... ') + darkgreen(part['docname']))
+            # 分部文档树在转换（或交给子进程）后即可释放
+            if tasks is None:
+                self.write_doc(key, part)
+            else:
+                self._add_part_task(tasks, key, part)
+        if tasks is not None:
+            tasks.join()
+        logger.info(f"{translated} of {len(keys)} parts translated, "
+                    f"{len(keys) - translated} reused from cache")
+        self.report_trace()
+        self.report_missing_styles()
+
+        logger.info(bold('merging parts... '), nonl=True)
+        self.output_state_path.unlink(missing_ok=True)
+        if self.merge(keys):
+            self.output_state_path.write_text(state, encoding='utf-8')
+        self.prune_part_cache(keys.values())
         logger.info('done')
+
+    def read_output_state(self) -> str | None:
+        """读取生成当前输出文件时所用设置的摘要，不存在时返回 None"""
+        try:
+            return self.output_state_path.read_text(encoding='utf-8')
+        except OSError:
+            return None
+
+    def merge(self, keys: dict[int, str]) -> bool:
+        """合并分部缓存中的各分部并写出最终的 DOCX 文件。
+
+        开启 ``docx_streaming`` 时逐个元素流式写出，不在内存中构建合并后的文档。
+
+        参数:
+            keys (dict): 占位序号到分部缓存键的映射，序号 0 为根分部
+
+        返回:
+            bool: 是否成功写出
+        """
+        paths = {index: self.part_cache_dir / (key + self.file_suffix)
+                 for index, key in keys.items()}
+        outfilename = self.output_path
+        outfilename.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            if self.config['docx_streaming']:
+                chapters = {part_marker(index): path for index, path in paths.items() if index}
+                stream_parts(paths[0], chapters, outfilename)
+                return True
+            document = Document(str(paths[0]))
+            chapters = {part_marker(index): Document(str(path))
+                        for index, path in paths.items() if index}
+            merge_parts(document, chapters)
+            document.save(str(outfilename))
+            return True
+        except (IOError, OSError) as err:
+            logger.warning(f"error writing file {outfilename}: {err}")
+            return False
+
+    def prune_part_cache(self, keys: Iterable[str]) -> None:
+        """删除本次构建未使用的分部缓存"""
+        used = {key + self.file_suffix for key in keys}
+        for path in self.part_cache_dir.glob('*' + self.file_suffix):
+            if path.name not in used:
+                path.unlink(missing_ok=True)
+
+    def report_trace(self) -> None:
+        """开启 docx_trace 时输出各节点类型的转换耗时"""
+        if not self.trace_counts:
+            return
+        logger.info(bold('docx translation time by node type:'))
+        for name in sorted(self.trace_times, key=self.trace_times.get, reverse=True)[:20]:
+            logger.info(f"  {self.trace_times[name] * 1000:10.1f} ms  "
+                        f"{self.trace_counts[name]:8d}  {name}")
+
+    def report_missing_styles(self) -> None:
+        """汇总报告模板中缺失的样式，每个样式只报告一次"""
+        if not self.missing_styles:
+            return
+        details = ', '.join(
+            f"'{name}' ({count} uses, {f'using {resolved!r}' if resolved else 'unstyled'})"
+            for (name, resolved), count in sorted(self.missing_styles.items())
+        )
+        logger.warning(f"docx template is missing styles: {details}")
@@ -0,0 +1,129 @@
+"""DOCX 图片预处理。
+
+图片按显示宽度（``width``/``scale`` 选项，或图片自身尺寸，不超过版心宽度）与目标 DPI 计算所需的像素宽度，
+原图更大时缩小并重新压缩后再嵌入。处理结果按源文件内容摘要与处理参数缓存，跨构建复用。
+缩放依赖 Pillow；未安装时嵌入原图，但仍按显示宽度设置图片尺寸。
+"""
+import hashlib
+import os
+import re
+from pathlib import Path
+
+from docx.image.image import Image as DocxImage
+from docx.shared import Emu, Inches
+from sphinx.util import logging
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# 缓存格式版本，处理方式变化时递增
+IMAGE_CACHE_VERSION = 1
+
+# docutils 长度单位到英寸的换算，px 按 96 DPI 计算
+UNITS = {
+    'in': 1.0,
+    'cm': 1 / 2.54,
+    'mm': 1 / 25.4,
+    'pt': 1 / 72,
+    'pc': 1 / 6,
+    'px': 1 / 96,
+    '': 1 / 96,
+}
+_LENGTH = re.compile(r'^\s*([0-9.]+)\s*([a-z%]*)\s*$')
+# 缩放处理的图片类型；GIF 可能是动画，保持原样
+RESAMPLED = ('image/png', 'image/jpeg', 'image/bmp', 'image/tiff')
+
+
+def display_width(length, natural, available, scale=None):
+    """计算图片的显示宽度。
+
+    参数:
+        length (str | None): ``width`` 选项，如 ``'50%'``、``'8cm'``、``'300px'``
+        natural (int): 图片的自然宽度（EMU）
+        available (int): 版心宽度（EMU）
+        scale (int | None): ``scale`` 选项（百分比）
+
+    返回:
+        int: 显示宽度（EMU），不超过版心宽度
+    """
+    width = natural
+    match = _LENGTH.match(length or '')
+    if match:
+        value, unit = float(match.group(1)), match.group(2)
+        if unit == '%':
+            width = available * value / 100
+        elif unit in UNITS:
+            width = Inches(value * UNITS[unit])
+    if scale is not None:
+        width = width * scale / 100
+    return int(min(width, available))
+
+
+class ImageProcessor:
+    """按显示尺寸缩放图片并缓存处理结果"""
+
+    # Pillow 未安装时只警告一次
+    warned = False
+
+    def __init__(self, cache_dir, dpi, quality):
+        self.cache_dir = Path(cache_dir)
+        self.dpi = dpi
+        self.quality = quality
+
+    def prepare(self, path, length=None, scale=None, available=None):
+        """返回要嵌入的图片文件与显示宽度。
+
+        参数:
+            path (str | Path): 源图片
+            length (str | None): ``width`` 选项
+            scale (int | None): ``scale`` 选项（百分比）
+            available (int): 版心宽度（EMU）
+
+        返回:
+            tuple: ``(图片文件路径, 显示宽度 EMU)``
+        """
+        path = Path(path)
+        image = DocxImage.from_file(str(path))
+        width = display_width(length, image.width, available, scale)
+        if not self.dpi:
+            return path, Emu(width)
+        # 显示宽度下按目标 DPI 所需的像素宽度
+        pixels = max(1, round(Emu(width).inches * self.dpi))
+        if image.px_width <= pixels or image.content_type not in RESAMPLED:
+            return path, Emu(width)
+        if Image is None:
+            if not ImageProcessor.warned:
+                logger.warning('docx: Pillow is not installed, images are embedded unscaled')
+                ImageProcessor.warned = True
+            return path, Emu(width)
+        return self._resample(path, image, pixels), Emu(width)
+
+    def _resample(self, path, image, pixels):
+        digest = hashlib.sha256(path.read_bytes())
+        digest.update(f'{IMAGE_CACHE_VERSION}:{pixels}:{self.quality}'.encode())
+        ext = '.jpg' if image.content_type == 'image/jpeg' else '.png'
+        cached = self.cache_dir / (digest.hexdigest() + ext)
+        if cached.exists():
+            return cached
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with Image.open(path) as source:
+            source.load()
+            height = max(1, round(source.height * pixels / source.width))
+            if source.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+                source = source.convert('RGBA' if 'transparency' in source.info else 'RGB')
+            if ext == '.jpg' and source.mode not in ('RGB', 'L'):
+                source = source.convert('RGB')
+            resized = source.resize((pixels, height), Image.LANCZOS)
+            # 并行构建时各进程可能处理同一图片，先写入临时文件
+            tmpfile = cached.with_name(f'{cached.name}.{os.getpid()}.tmp')
+            if ext == '.jpg':
+                resized.save(tmpfile, 'JPEG', quality=self.quality, optimize=True,
+                             dpi=(self.dpi, self.dpi))
+            else:
+                resized.save(tmpfile, 'PNG', optimize=True, dpi=(self.dpi, self.dpi))
+        tmpfile.replace(cached)
+        return cached
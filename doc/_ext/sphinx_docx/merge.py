@@ -0,0 +1,96 @@
+"""DOCX 分部文档合并。
+
+按章节分别转换得到的文档（分部）在此合并为一个文档：根分部中以占位段落标记各章节的位置，
+合并时把章节分部的正文插入到占位处，并重新映射图片、超链接等关系的 rId。
+各分部使用同一模板，样式与编号定义一致，无需合并。
+"""
+from copy import deepcopy
+from io import BytesIO
+
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml.ns import qn
+
+# 引用关系 rId 的属性
+REL_ATTRIBUTES = (qn('r:embed'), qn('r:link'), qn('r:id'))
+
+
+def part_marker(index):
+    """返回第 ``index`` 个章节分部的占位文本"""
+    return f'@@sphinx-docx-part:{index}@@'
+
+
+def _paragraph_text(paragraph):
+    return ''.join(t.text or '' for t in paragraph.iter(qn('w:t')))
+
+
+class _RelationshipMapper:
+    """把源文档中的关系复制到目标文档，返回目标文档中的 rId。"""
+
+    def __init__(self, target, source):
+        self.target = target.part
+        self.source = source.part
+        self.mapping = {}
+
+    def __call__(self, rId):
+        if rId not in self.mapping:
+            rel = self.source.rels[rId]
+            if rel.is_external:
+                new_rId = self.target.relate_to(rel.target_ref, rel.reltype, is_external=True)
+            elif rel.reltype == RT.IMAGE:
+                # get_or_add_image 按内容去重，多个章节中相同的图片只保存一份
+                new_rId, _ = self.target.get_or_add_image(BytesIO(rel.target_part.blob))
+            else:
+                new_rId = self.target.relate_to(rel.target_part, rel.reltype)
+            self.mapping[rId] = new_rId
+        return self.mapping[rId]
+
+
+def copy_body(target, source):
+    """复制 ``source`` 的正文元素（不含节属性），并把其中的关系映射到 ``target``。
+
+    返回:
+        list: 可插入 ``target`` 正文的元素列表
+    """
+    remap = _RelationshipMapper(target, source)
+    elements = []
+    for element in source.element.body.iterchildren():
+        if element.tag == qn('w:sectPr'):
+            continue
+        element = deepcopy(element)
+        for node in element.iter():
+            for attribute in REL_ATTRIBUTES:
+                rId = node.get(attribute)
+                if rId:
+                    node.set(attribute, remap(rId))
+        elements.append(element)
+    return elements
+
+
+def renumber_drawings(document):
+    """为合并后的图形重新分配唯一的 ``wp:docPr`` ID"""
+    for number, doc_pr in enumerate(document.element.body.iter(qn('wp:docPr')), start=1):
+        doc_pr.set('id', str(number))
+
+
+def merge_parts(root, chapters):
+    """把章节分部插入根分部的占位段落处。
+
+    章节分部中也可以含有其他章节分部的占位段落，插入后继续替换，直到没有占位段落。
+
+    参数:
+        root (docx.document.Document): 根分部，原地修改
+        chapters (dict): 占位文本到章节分部文档的映射
+    """
+    body = root.element.body
+    merged = True
+    while merged:
+        merged = False
+        for paragraph in list(body.iterchildren(qn('w:p'))):
+            chapter = chapters.get(_paragraph_text(paragraph))
+            if chapter is None:
+                continue
+            for element in copy_body(root, chapter):
+                paragraph.addprevious(element)
+            body.remove(paragraph)
+            merged = True
+    renumber_drawings(root)
@@ -0,0 +1,271 @@
+"""DOCX 分部的流式合并。
+
+:func:`merge_parts` 需要同时载入所有分部并在内存中构建完整的合并文档，内存占用随文档规模增长。
+流式合并直接读写 OOXML 包：逐个解析分部 ``word/document.xml`` 的正文元素，重新映射关系并写入输出包，
+写出后立即释放；图片按块从分部复制到输出包的 ``word/media``，内存中只保留关系表与图片摘要。
+"""
+import hashlib
+import re
+import shutil
+from posixpath import dirname, join, normpath, splitext
+from zipfile import ZIP_DEFLATED, ZipFile
+
+from docx.opc.constants import RELATIONSHIP_TARGET_MODE as RTM
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml.ns import qn
+from lxml import etree
+from sphinx.util import logging
+
+from .merge import REL_ATTRIBUTES, _paragraph_text
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT = 'word/document.xml'
+DOCUMENT_RELS = 'word/_rels/document.xml.rels'
+CONTENT_TYPES = '[Content_Types].xml'
+RELS_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+TYPES_NS = 'http://schemas.openxmlformats.org/package/2006/content-types'
+
+# 正文元素单独序列化时带有上级作用域中的全部命名空间声明
+_XMLNS = re.compile(r'\sxmlns:([\w.-]+)="([^"]*)"')
+
+
+def _body_elements(source):
+    """逐个产生 ``word/document.xml`` 中的元素。
+
+    产生 ``('document', element)``、``('body', element)`` 与 ``('block', element)``，
+    正文元素产生后即被清除。
+    """
+    depth = 0
+    for event, element in etree.iterparse(source, events=('start', 'end'), remove_blank_text=False):
+        if event == 'start':
+            depth += 1
+            if depth == 1:
+                yield 'document', element
+            elif depth == 2:
+                yield 'body', element
+            continue
+        depth -= 1
+        if depth == 2:
+            yield 'block', element
+            element.clear()
+            parent = element.getparent()
+            while element.getprevious() is not None:
+                del parent[0]
+
+
+class _PackageWriter:
+    """把根分部与各章节分部写入输出包"""
+
+    def __init__(self, root, package):
+        self.root = root
+        self.package = package
+        self.nsmap = {}
+        self.relationships = etree.fromstring(root.read(DOCUMENT_RELS))
+        self.content_types = etree.fromstring(root.read(CONTENT_TYPES))
+        self.rel_ids = {rel.get('Id') for rel in self.relationships}
+        self.rel_index = {self._rel_key(rel): rel.get('Id') for rel in self.relationships}
+        self.names = set(root.namelist())
+        self.defaults = {
+            node.get('Extension').lower()
+            for node in self.content_types.iterfind(f'{{{TYPES_NS}}}Default')
+        }
+        # 图片内容摘要到 word/ 下相对路径的映射，相同图片只保存一份
+        self.media = {}
+        for rel in self.relationships:
+            if rel.get('Type') == RT.IMAGE and rel.get('TargetMode') != RTM.EXTERNAL:
+                self.media[self._digest(root, self._partname(rel))] = rel.get('Target')
+        self.drawings = 0
+
+    @staticmethod
+    def _rel_key(rel):
+        return rel.get('Type'), rel.get('Target'), rel.get('TargetMode')
+
+    @staticmethod
+    def _partname(rel):
+        return normpath(join(dirname(DOCUMENT), rel.get('Target')))
+
+    @staticmethod
+    def _digest(source, name):
+        digest = hashlib.sha256()
+        with source.open(name) as stream:
+            for chunk in iter(lambda: stream.read(1 << 16), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def copy_package(self):
+        """原样复制根分部中除正文、正文关系与内容类型以外的部件"""
+        for info in self.root.infolist():
+            if info.filename in (DOCUMENT, DOCUMENT_RELS, CONTENT_TYPES):
+                continue
+            with self.root.open(info) as source, self.package.open(info.filename, 'w') as target:
+                shutil.copyfileobj(source, target)
+
+    def _relate(self, reltype, target, mode=None):
+        key = (reltype, target, mode)
+        if key not in self.rel_index:
+            number = len(self.rel_ids) + 1
+            while f'rId{number}' in self.rel_ids:
+                number += 1
+            rId = f'rId{number}'
+            attributes = {'Id': rId, 'Type': reltype, 'Target': target}
+            if mode:
+                attributes['TargetMode'] = mode
+            etree.SubElement(self.relationships, f'{{{RELS_NS}}}Relationship', attributes)
+            self.rel_ids.add(rId)
+            self.rel_index[key] = rId
+        return self.rel_index[key]
+
+    def _add_image(self, source, content_types, partname):
+        digest = self._digest(source, partname)
+        if digest not in self.media:
+            ext = splitext(partname)[1]
+            number = 1
+            while f'word/media/image{number}{ext}' in self.names:
+                number += 1
+            name = f'word/media/image{number}{ext}'
+            with source.open(partname) as stream, self.package.open(name, 'w') as target:
+                shutil.copyfileobj(stream, target)
+            self.names.add(name)
+            self._add_content_type(ext[1:], content_types, partname)
+            self.media[digest] = name[len('word/'):]
+        return self.media[digest]
+
+    def _add_content_type(self, ext, content_types, partname):
+        if ext.lower() in self.defaults:
+            return
+        content_type = None
+        for node in content_types:
+            if (node.get('PartName') == '/' + partname
+                    or (node.get('Extension') or '').lower() == ext.lower()):
+                content_type = node.get('ContentType')
+                break
+        if content_type is None:
+            logger.warning(f"docx: no content type for {partname}")
+            return
+        etree.SubElement(self.content_types, f'{{{TYPES_NS}}}Default',
+                         {'Extension': ext, 'ContentType': content_type})
+        self.defaults.add(ext.lower())
+
+    def map_relationships(self, source):
+        """把章节分部的关系加入输出包，返回章节分部 rId 到输出包 rId 的映射。
+
+        写出正文时输出包中不能再写入其他部件，图片须在此之前复制。
+        """
+        content_types = etree.fromstring(source.read(CONTENT_TYPES))
+        mapping = {}
+        for rel in etree.fromstring(source.read(DOCUMENT_RELS)):
+            reltype, mode = rel.get('Type'), rel.get('TargetMode')
+            if mode == RTM.EXTERNAL:
+                mapping[rel.get('Id')] = self._relate(reltype, rel.get('Target'), mode)
+            elif reltype == RT.IMAGE:
+                target = self._add_image(source, content_types, self._partname(rel))
+                mapping[rel.get('Id')] = self._relate(reltype, target)
+            elif self._rel_key(rel) in self.rel_index:
+                # 各分部使用同一模板，样式、编号等部件与根分部一致
+                mapping[rel.get('Id')] = self.rel_index[self._rel_key(rel)]
+        return mapping
+
+    def _serialize(self, element):
+        text = etree.tostring(element, encoding='unicode')
+        end = text.index('>')
+        head = _XMLNS.sub(
+            lambda m: '' if self.nsmap.get(m.group(1)) == m.group(2) else m.group(0), text[:end]
+        )
+        return (head + text[end:]).encode('utf-8')
+
+    def write_element(self, stream, element, mapping=None):
+        """重新映射关系与图形 ID 后写出一个正文元素"""
+        for node in element.iter():
+            if mapping is not None:
+                for attribute in REL_ATTRIBUTES:
+                    rId = node.get(attribute)
+                    if rId:
+                        if rId not in mapping:
+                            logger.warning(f"docx: relationship {rId} is not in the root part")
+                        node.set(attribute, mapping.get(rId, rId))
+            if node.tag == qn('wp:docPr'):
+                self.drawings += 1
+                node.set('id', str(self.drawings))
+        stream.write(self._serialize(element))
+
+    def _qname(self, tag):
+        qname = etree.QName(tag)
+        if not qname.namespace:
+            return qname.localname
+        prefix = next(
+            prefix for prefix, uri in self.nsmap.items() if prefix and uri == qname.namespace
+        )
+        return f'{prefix}:{qname.localname}'
+
+    def _start_tag(self, element, declare=False):
+        attributes = [
+            f'xmlns:{prefix}="{uri}"' for prefix, uri in self.nsmap.items() if prefix and declare
+        ]
+        attributes += [f'{self._qname(key)}="{value}"' for key, value in element.attrib.items()]
+        return f'<{" ".join([self._qname(element.tag)] + attributes)}>'.encode('utf-8')
+
+    def write_document(self, stream, chapters):
+        """写出合并后的 ``word/document.xml``，占位段落处写入章节分部的正文。
+
+        参数:
+            chapters (dict): 占位文本到 ``(章节分部文件, rId 映射)`` 的映射
+        """
+        closing = []
+        with self.root.open(DOCUMENT) as document:
+            for kind, element in _body_elements(document):
+                if kind == 'document':
+                    self.nsmap = dict(element.nsmap)
+                    stream.write(b"<?xml version='1.0' encoding='UTF-8' standalone='yes'?>\n")
+                    stream.write(self._start_tag(element, declare=True))
+                    closing.insert(0, element.tag)
+                elif kind == 'body':
+                    stream.write(self._start_tag(element))
+                    closing.insert(0, element.tag)
+                elif kind == 'block':
+                    self.write_block(stream, element, chapters)
+        for tag in closing:
+            stream.write(f'</{self._qname(tag)}>'.encode('utf-8'))
+
+    def write_block(self, stream, element, chapters, mapping=None):
+        """写出一个正文元素，占位段落处写入对应章节分部的正文"""
+        if element.tag == qn('w:p'):
+            chapter = chapters.get(_paragraph_text(element))
+            if chapter is not None:
+                self.write_chapter(stream, chapters, *chapter)
+                return
+        self.write_element(stream, element, mapping)
+
+    def write_chapter(self, stream, chapters, path, mapping):
+        """写出一个章节分部的正文（不含节属性），其中可以含有其他章节分部的占位段落"""
+        with ZipFile(path) as source, source.open(DOCUMENT) as document:
+            for kind, element in _body_elements(document):
+                if kind == 'block' and element.tag != qn('w:sectPr'):
+                    self.write_block(stream, element, chapters, mapping)
+
+    def finish(self):
+        """写出正文关系与内容类型"""
+        self.package.writestr(DOCUMENT_RELS, etree.tostring(
+            self.relationships, xml_declaration=True, encoding='UTF-8', standalone=True))
+        self.package.writestr(CONTENT_TYPES, etree.tostring(
+            self.content_types, xml_declaration=True, encoding='UTF-8', standalone=True))
+
+
+def stream_parts(root, chapters, outfilename):
+    """流式合并各分部并写出 DOCX 文件。
+
+    参数:
+        root (str | Path): 根分部文件
+        chapters (dict): 占位文本到章节分部文件的映射
+        outfilename (str | Path): 输出文件
+    """
+    with ZipFile(root) as source, ZipFile(outfilename, 'w', ZIP_DEFLATED) as package:
+        writer = _PackageWriter(source, package)
+        writer.copy_package()
+        parts = {}
+        for marker, path in chapters.items():
+            with ZipFile(path) as chapter:
+                parts[marker] = (path, writer.map_relationships(chapter))
+        with package.open(DOCUMENT, 'w', force_zip64=True) as stream:
+            writer.write_document(stream, parts)
+        writer.finish()
@@ -0,0 +1,82 @@
+"""模板样式索引。
+
+python-docx 按名称查找样式时每次都线性扫描模板的全部样式，转换器为每个列表项、表格、代码块都要查找一次。
+:class:`StyleRegistry` 对每个模板只建立一次名称到样式 ID 的索引，并预先确定缺失样式的替代样式。
+"""
+from pathlib import Path
+
+from docx.enum.style import WD_STYLE_TYPE
+
+# 样式缺失时依次尝试的替代样式，都缺失时不使用样式
+FALLBACKS = {
+    'Grid Table 4': ('Table Grid',),
+    'Preformatted Text': ('HTML Preformatted',),
+}
+
+_registries = {}
+
+
+def fallbacks(name):
+    """返回样式 ``name`` 的替代样式名称"""
+    if name in FALLBACKS:
+        return FALLBACKS[name]
+    # 较深层级的列表样式逐级退回，例如 List Bullet 4 -> List Bullet 3 -> ... -> List Bullet
+    base, _, level = name.rpartition(' ')
+    if base.startswith('List') and level.isdigit():
+        return tuple(f'{base} {n}' for n in range(int(level) - 1, 1, -1)) + (base,)
+    return ()
+
+
+class StyleRegistry:
+    """模板中样式名称到样式 ID 的索引"""
+
+    def __init__(self, styles):
+        defaults = {}
+        for style_type in WD_STYLE_TYPE:
+            default = styles.default(style_type)
+            if default is not None:
+                defaults[style_type] = default.style_id
+        self._ids = {}
+        self._names = {}
+        for style in styles:
+            # 类型默认样式的 ID 为 None，与 python-docx 的 get_style_id 一致
+            style_id = None if defaults.get(style.type) == style.style_id else style.style_id
+            self._ids[(style.type, style.name)] = style_id
+            self._names.setdefault((style.type, style_id), style.name)
+        self._resolved = {}
+
+    @classmethod
+    def for_template(cls, template, document):
+        """返回模板的样式索引，同一模板（未修改时）只建立一次。
+
+        参数:
+            template (str | None): 模板路径，``None`` 表示 python-docx 的默认模板
+            document (docx.document.Document): 由该模板创建的文档
+        """
+        key = template
+        if template is not None:
+            path = Path(template)
+            key = (str(path.resolve()), path.stat().st_mtime if path.exists() else None)
+        if key not in _registries:
+            _registries[key] = cls(document.styles)
+        return _registries[key]
+
+    def resolve(self, name, style_type):
+        """查找样式，缺失时使用替代样式。
+
+        返回:
+            tuple: ``(实际使用的样式名称, 样式 ID)``，没有可用样式时为 ``(None, None)``
+        """
+        key = (style_type, name)
+        if key not in self._resolved:
+            resolved = (None, None)
+            for candidate in (name,) + fallbacks(name):
+                if (style_type, candidate) in self._ids:
+                    resolved = (candidate, self._ids[(style_type, candidate)])
+                    break
+            self._resolved[key] = resolved
+        return self._resolved[key]
+
+    def name(self, style_id, style_type=WD_STYLE_TYPE.PARAGRAPH):
+        """返回样式 ID 对应的样式名称，``None`` 为类型的默认样式；ID 不在模板中时返回 ``None``"""
+        return self._names.get((style_type, style_id))
@@ -1,8 +1,10 @@
-import sys
+from collections import Counter, defaultdict
+from time import perf_counter
 
 # noinspection PyUnresolvedReferences
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.enum.style import WD_STYLE_TYPE
+from docx.oxml.simpletypes import ST_Merge
 from docx.shared import Cm
 # noinspection PyProtectedMember
 from docx.table import _Cell
@@ -11,50 +13,16 @@ from docx import Document
 from docutils import nodes, writers
 import logging
 
-logger = logging.getLogger('docx')
-
+from .images import ImageProcessor
+from .styles import StyleRegistry
 
-def dprint(_func=None, **kw):
-    """调试信息打印工具函数
-    
-    功能：
-        - 自动捕获调用者函数名和局部变量
-        - 支持关键字参数和自动变量收集两种模式
-        - 生成格式化的调试日志信息
-    
-    参数：
-        _func  手动指定的函数名（通常自动获取调用者名称）
-        **kw   需要特殊展示的关键字参数对
-    
-    日志级别：
-        - 关键字参数模式使用 INFO 级别
-        - 自动变量模式使用 DEBUG 级别（当前实现暂未完全支持）
-    """
-    # 获取调用栈中上一帧的上下文
-    f = sys._getframe(1)
-    
-    # 处理两种参数模式
-    if kw:
-        text = ', '.join('%s = %s' % (k, v) for k, v in kw.items())
-    else:
-        # 自动收集调用者局部变量（排除self）
-        text = dict((k, repr(v)) for k, v in f.f_locals.items() if k != 'self')
-        text = str(text)
-
-    # 自动获取调用函数名称
-    if _func is None:
-        _func = f.f_code.co_name
-
-    # 生成日志信息（当前实现统一使用INFO级别）
-    if kw:
-        logger.info(' '.join([_func, text]))
+logger = logging.getLogger('docx')
 
 
 # noinspection PyUnusedLocal
 def _make_depart_admonition(name):
     # noinspection PyMissingOrEmptyDocstring,PyUnusedLocal
     def depart_admonition(self, node):
-        dprint()
         raise nodes.SkipNode
         # from sphinx.locale import admonitionlabels, versionlabels, _
     return depart_admonition
@@ -69,6 +37,8 @@ class DocxWriter(writers.Writer):
 
     output = None
     template_dir = "NO"
+    trace = None  # 开启 docx_trace 时为 TracingDocxTranslator.report() 的结果
+    missing_styles = None  # 缺失样式 (样式名称, 替代样式名称) 到使用次数的映射
 
     def __init__(self, builder):
         # 初始化父类（docutils的Writer基类）
@@ -83,12 +53,13 @@ class DocxWriter(writers.Writer):
         else:
             dc = Document(self.template_dir)  # 基于模板创建文档
         self.docx_container = dc  # 存储docx文档容器
+        template = None if self.template_dir == "NO" else self.template_dir
+        self.styles = StyleRegistry.for_template(template, dc)
 
     def template_setup(self):
         """配置文档模板"""
         # 从Sphinx配置中获取模板路径
         dotx = self.builder.config['docx_template']
-        print(dotx)  # 控制台输出模板路径
         if dotx:
             logger.info("MK using template {}".format(dotx))
             self.template_dir = dotx  # 更新模板路径
@@ -99,10 +70,15 @@ class DocxWriter(writers.Writer):
 
     def translate(self):
         """执行文档转换流程"""
-        # 创建文档转换器并遍历文档树
-        visitor = DocxTranslator(self.document, self.builder, self.docx_container)
+        # 创建文档转换器并遍历文档树，开启 docx_trace 时使用带统计的转换器
+        tracing = self.builder.config['docx_trace']
+        translator_class = TracingDocxTranslator if tracing else DocxTranslator
+        visitor = translator_class(self.document, self.builder, self.docx_container, self.styles)
         self.document.walkabout(visitor)
         self.output = ''  # 清空输出（实际内容已写入docx_container）
+        self.missing_styles = visitor.missing_styles
+        if tracing:
+            self.trace = visitor.report()
 
 
 class DocxState:
@@ -115,9 +91,7 @@ class DocxState:
         self.table = None         # 当前操作的表格对象
         self.column_widths = None # 表格列宽配置
         self.table_style = None   # 表格样式名称
-        self.more_cols = 0        # 当前单元格跨越的列数
-        self.row = None           # 当前操作的表行
-        self.cell_counter = 0     # 当前行中的单元格计数器
+        self.cells = None         # 当前表格中 entry 节点到单元格的映射
         self.ncolumns = 1         # 当前表格的总列数
         "Number of columns in the current table."
 
@@ -126,9 +100,13 @@ class DocxState:
 class DocxTranslator(nodes.NodeVisitor):
     """Visitor class to create docx content."""
 
-    def __init__(self, document, builder, docx_container):
+    def __init__(self, document, builder, docx_container, styles):
         self.builder = builder
         self.docx_container = docx_container
+        self.styles = styles
+        self.missing_styles = Counter()
+        self.images = ImageProcessor(builder.image_cache_dir, builder.config['docx_image_dpi'],
+                                     builder.config['docx_image_quality'])
         nodes.NodeVisitor.__init__(self, document)
 
         # TODO: Perhaps move the list_style into DocxState.
@@ -154,180 +132,189 @@ class DocxTranslator(nodes.NodeVisitor):
         self.old_states = []
         "A list of older states, e.g. typically [document, table-cell]"
 
-        self.current_paragraph = None
-        "The current paragraph that text is being added to."
+        # 待写入当前段落的文本与其格式，格式相同的相邻文本合并为一个 run
+        self.pending_text = []
+        self.pending_format = None
+        self._current_paragraph = None
+
+    def style_id(self, name, style_type=WD_STYLE_TYPE.PARAGRAPH):
+        """返回样式的 ID，样式缺失时使用替代样式并记录，由构建器统一报告"""
+        resolved, style_id = self.styles.resolve(name, style_type)
+        if resolved != name:
+            self.missing_styles[(name, resolved)] += 1
+        return style_id
+
+    def add_paragraph(self, location, style=None):
+        """在 ``location`` 中添加段落并设置样式"""
+        paragraph = location.add_paragraph()
+        if style is not None:
+            paragraph._p.style = self.style_id(style)
+        return paragraph
+
+    @property
+    def current_paragraph(self):
+        """The current paragraph that text is being added to."""
+        return self._current_paragraph
+
+    @current_paragraph.setter
+    def current_paragraph(self, paragraph):
+        # 切换段落前写出缓冲的文本
+        self.flush_text()
+        self._current_paragraph = paragraph
 
     def add_text(self, text):
-        """向当前段落添加文本内容并应用格式"""
-        dprint()
-        textrun = self.current_paragraph.add_run(text)  # 创建文本运行对象
-        if self.strong:   # 应用粗体格式
+        """向当前段落添加文本内容，与前一段格式相同的文本合并到同一个 run"""
+        text_format = (self.strong, self.emphasis)
+        if text_format != self.pending_format:
+            self.flush_text()
+            self.pending_format = text_format
+        self.pending_text.append(text)
+
+    def flush_text(self):
+        """把缓冲的文本作为一个 run 写入当前段落并应用格式"""
+        if not self.pending_text:
+            return
+        text = ''.join(self.pending_text)
+        self.pending_text = []
+        if not text:
+            return
+        strong, emphasis = self.pending_format
+        textrun = self._current_paragraph.add_run(text)  # 创建文本运行对象
+        if strong:   # 应用粗体格式
             textrun.bold = True
-        if self.emphasis:  # 应用斜体格式
+        if emphasis:  # 应用斜体格式
             textrun.italic = True
 
     def new_state(self, location):
         """进入新的文档状态（用于处理嵌套结构）"""
-        dprint()
         self.old_states.append(self.current_state)  # 保存当前状态到栈
         self.current_state = DocxState(location=location)  # 创建新状态
 
     def end_state(self, first=None):
         """退出当前状态，恢复前一个状态"""
-        dprint()
         self.current_state = self.old_states.pop()  # 从栈顶弹出历史状态
 
     def visit_start_of_file(self, node):
         """处理新文件时的初始化（重置章节层级）"""
-        dprint()
         # FIXME: 未正确关闭前文件的章节可能导致层级错乱
         self.sectionlevel = 0  # 强制重置标题级别计数器
 
     def depart_start_of_file(self, node):
-        dprint()
+        pass
 
     def visit_document(self, node):
-        dprint()
+        pass
 
     def depart_document(self, node):
-        dprint()
+        self.flush_text()
 
     def visit_highlightlang(self, node):
-        dprint()
         raise nodes.SkipNode
 
     def visit_section(self, node):
-        dprint()
         self.sectionlevel += 1
 
     def depart_section(self, node):
-        dprint()
         if self.sectionlevel > 0:
             self.sectionlevel -= 1
 
     def visit_topic(self, node):
-        dprint()
         raise nodes.SkipNode
 
     def depart_topic(self, node):
-        dprint()
         raise nodes.SkipNode
 
     visit_sidebar = visit_topic
     depart_sidebar = depart_topic
 
     def visit_rubric(self, node):
-        dprint()
         raise nodes.SkipNode
         # self.add_text('-[ ')
 
     def depart_rubric(self, node):
-        dprint()
         raise nodes.SkipNode
         # self.add_text(' ]-')
 
     def visit_compound(self, node):
-        dprint()
         pass
 
     def depart_compound(self, node):
-        dprint()
         pass
 
     def visit_glossary(self, node):
-        dprint()
         pass
 
     def depart_glossary(self, node):
-        dprint()
         pass
 
     def visit_title(self, node):
-        dprint()
-        self.current_paragraph = self.current_state.location.add_heading(level=self.sectionlevel)
+        # 与 add_heading 相同：级别 0 为 Title，其余为 Heading N
+        style = 'Title' if self.sectionlevel == 0 else f'Heading {self.sectionlevel}'
+        self.current_paragraph = self.add_paragraph(self.current_state.location, style)
 
     def depart_title(self, node):
-        dprint()
+        pass
 
     def visit_subtitle(self, node):
-        dprint()
         pass
 
     def depart_subtitle(self, node):
-        dprint()
         pass
 
     def visit_attribution(self, node):
-        dprint()
         raise nodes.SkipNode
         # self.add_text('-- ')
 
     def depart_attribution(self, node):
-        dprint()
         pass
 
     def visit_desc(self, node):
-        dprint()
         pass
 
     def depart_desc(self, node):
-        dprint()
         pass
 
     def visit_desc_signature(self, node):
-        dprint()
         raise nodes.SkipNode
 
     def depart_desc_signature(self, node):
-        dprint()
         raise nodes.SkipNode
 
     def visit_desc_name(self, node):
-        dprint()
         pass
 
     def depart_desc_name(self, node):
-        dprint()
         pass
 
     def visit_desc_addname(self, node):
-        dprint()
         pass
 
     def depart_desc_addname(self, node):
-        dprint()
         pass
 
     def visit_desc_type(self, node):
-        dprint()
         pass
 
     def depart_desc_type(self, node):
-        dprint()
         pass
 
     def visit_desc_returns(self, node):
-        dprint()
         raise nodes.SkipNode
         # self.add_text(' -> ')
 
     def depart_desc_returns(self, node):
-        dprint()
         pass
 
     def visit_desc_parameterlist(self, node):
-        dprint()
         raise nodes.SkipNode
         # self.add_text('(')
         # self.first_param = 1
 
     def depart_desc_parameterlist(self, node):
-        dprint()
         raise nodes.SkipNode
         # self.add_text(')')
 
     def visit_desc_parameter(self, node):
-        dprint()
         raise nodes.SkipNode
         # if not self.first_param:
         #     self.add_text(', ')
@@ -337,57 +324,46 @@ class DocxTranslator(nodes.NodeVisitor):
         # raise nodes.SkipNode
 
     def visit_desc_optional(self, node):
-        dprint()
         raise nodes.SkipNode
         # self.add_text('[')
 
     def depart_desc_optional(self, node):
-        dprint()
         raise nodes.SkipNode
         # self.add_text(']')
 
     def visit_desc_annotation(self, node):
-        dprint()
         pass
 
     def depart_desc_annotation(self, node):
-        dprint()
         pass
 
     def visit_refcount(self, node):
-        dprint()
         pass
 
     def depart_refcount(self, node):
-        dprint()
         pass
 
     def visit_desc_content(self, node):
-        dprint()
         raise nodes.SkipNode
         # self.add_text('\n')
 
     def depart_desc_content(self, node):
-        dprint()
         raise nodes.SkipNode
 
     def visit_figure(self, node):
         # FIXME: figure text become normal paragraph instead of caption.
-        dprint()
+        pass
 
     def depart_figure(self, node):
-        dprint()
+        pass
 
     def visit_caption(self, node):
-        dprint()
         pass
 
     def depart_caption(self, node):
-        dprint()
         pass
 
     def visit_productionlist(self, node):
-        dprint()
         raise nodes.SkipNode
         # names = []
         # for production in node:
@@ -403,22 +379,19 @@ class DocxTranslator(nodes.NodeVisitor):
         # raise nodes.SkipNode
 
     def visit_seealso(self, node):
-        dprint()
+        pass
 
     def depart_seealso(self, node):
-        dprint()
+        pass
 
     def visit_footnote(self, node):
-        dprint()
         raise nodes.SkipNode
         # self._footnote = node.children[0].astext().strip()
 
     def depart_footnote(self, node):
-        dprint()
         raise nodes.SkipNode
 
     def visit_citation(self, node):
-        dprint()
         raise nodes.SkipNode
         # if len(node) and isinstance(node[0], nodes.label):
         #     self._citlabel = node[0].astext()
@@ -426,43 +399,34 @@ class DocxTranslator(nodes.NodeVisitor):
         #     self._citlabel = ''
 
     def depart_citation(self, node):
-        dprint()
         raise nodes.SkipNode
 
     def visit_label(self, node):
-        dprint()
         raise nodes.SkipNode
 
     # XXX: option list could use some better styling
 
     def visit_option_list(self, node):
-        dprint()
         pass
 
     def depart_option_list(self, node):
-        dprint()
         pass
 
     def visit_option_list_item(self, node):
-        dprint()
         raise nodes.SkipNode
 
     def depart_option_list_item(self, node):
-        dprint()
         raise nodes.SkipNode
 
     def visit_option_group(self, node):
-        dprint()
         raise nodes.SkipNode
         # self._firstoption = True
 
     def depart_option_group(self, node):
-        dprint()
         raise nodes.SkipNode
         # self.add_text('     ')
 
     def visit_option(self, node):
-        dprint()
         raise nodes.SkipNode
         # if self._firstoption:
         #     self._firstoption = False
@@ -470,36 +434,28 @@ class DocxTranslator(nodes.NodeVisitor):
         #     self.add_text(', ')
 
     def depart_option(self, node):
-        dprint()
         pass
 
     def visit_option_string(self, node):
-        dprint()
         pass
 
     def depart_option_string(self, node):
-        dprint()
         pass
 
     def visit_option_argument(self, node):
-        dprint()
         raise nodes.SkipNode
         # self.add_text(node['delimiter'])
 
     def depart_option_argument(self, node):
-        dprint()
         pass
 
     def visit_description(self, node):
-        dprint()
         pass
 
     def depart_description(self, node):
-        dprint()
         pass
 
     def visit_tabular_col_spec(self, node):
-        dprint()
         # TODO: properly implement this!!
         spec = node['spec']
         widths = [float(l.split('cm')[0]) for l in spec.split("{")[1:]]
@@ -507,7 +463,6 @@ class DocxTranslator(nodes.NodeVisitor):
         raise nodes.SkipNode
 
     def visit_colspec(self, node):
-        dprint()
         # The difficulty here is getting the right column width.
         # This can be specified with a tabular_col_spec, see above.
         #
@@ -529,61 +484,102 @@ class DocxTranslator(nodes.NodeVisitor):
         raise nodes.SkipNode
 
     def depart_colspec(self, node):
-        dprint()
+        pass
 
     def visit_tgroup(self, node):
-        dprint()
         colspecs = [c for c in node.children if isinstance(c, nodes.colspec)]
         self.current_state.ncolumns = len(colspecs)
 
     def depart_tgroup(self, node):
-        dprint()
         self.current_state.ncolumns = 1
-        pass
+        self.current_state.cells = None
 
     def visit_thead(self, node):
-        dprint()
-        pass
+        self.build_table_rows(node.parent)
 
     def depart_thead(self, node):
-        dprint()
         pass
 
     def visit_tbody(self, node):
-        dprint()
+        self.build_table_rows(node.parent)
 
     def depart_tbody(self, node):
-        dprint()
         pass
 
+    @staticmethod
+    def table_layout(tgroup, ncolumns):
+        """根据 tgroup 计算表格的单元格布局，包括跨列与跨行的单元格。
+
+        参数:
+            tgroup (nodes.tgroup): 表格分组节点
+            ncolumns (int): 表格列数
+
+        返回:
+            list: 每行一个列表，元素为 ``(entry, 起始列, 跨列数, vMerge)``；
+            跨行单元格下方的延续单元格与补齐的空单元格的 ``entry`` 为 ``None``
+        """
+        rows = [row for section in tgroup.children
+                if isinstance(section, (nodes.thead, nodes.tbody))
+                for row in section.children if isinstance(row, nodes.row)]
+        continued = {}  # (行, 列) -> 上方跨行单元格的跨列数
+        layout = []
+        for index, row in enumerate(rows):
+            entries = iter(entry for entry in row.children if isinstance(entry, nodes.entry))
+            cells = []
+            column = 0
+            while column < ncolumns:
+                if (index, column) in continued:
+                    span = continued.pop((index, column))
+                    cells.append((None, column, span, ST_Merge.CONTINUE))
+                    column += span
+                    continue
+                entry = next(entries, None)
+                if entry is None:
+                    cells.append((None, column, 1, None))
+                    column += 1
+                    continue
+                span = entry.get('morecols', 0) + 1
+                for offset in range(1, entry.get('morerows', 0) + 1):
+                    continued[(index + offset, column)] = span
+                merge = ST_Merge.RESTART if entry.get('morerows') else None
+                cells.append((entry, column, span, merge))
+                column += span
+            layout.append(cells)
+        return layout
+
+    def build_table_rows(self, tgroup):
+        """一次性生成表格所有行的 XML，并记录各 entry 对应的单元格。
+
+        在 colspec 之后、第一个 thead/tbody 时调用，此时表格的列已经添加。
+        """
+        state = self.current_state
+        if state.cells is not None:
+            return
+        state.cells = {}
+        tbl = state.table._tbl
+        widths = [gridCol.w for gridCol in tbl.tblGrid.gridCol_lst]
+        for cells in self.table_layout(tgroup, len(widths)):
+            tr = tbl.add_tr()
+            for entry, column, span, merge in cells:
+                tc = tr.add_tc()
+                spanned = widths[column:column + span]
+                if None not in spanned:
+                    tc.width = sum(spanned)
+                if span > 1:
+                    tc.grid_span = span
+                if merge:
+                    tc.vMerge = merge
+                if entry is not None:
+                    state.cells[id(entry)] = _Cell(tc, state.table)
+
     def visit_row(self, node):
-        dprint()
-        self.current_state.row = self.current_state.table.add_row()
-        self.current_state.cell_counter = 0
+        pass
 
     def depart_row(self, node):
-        dprint()
         pass
 
     def visit_entry(self, node):
-        dprint()
-        if 'morerows' in node:
-            raise NotImplementedError('Row spanning cells are not implemented.')
-        if 'morecols' in node:
-            # Hack to make column spanning possible. TODO FIX
-            self.current_state.more_cols = node['morecols']
-
-        cell = self.current_state.row.cells[self.current_state.cell_counter]
-        # A new paragraph will be added by Sphinx, so remove the automated one
-        # This turns out to be not possible, so instead the existing one is
-        # reused in visit_paragraph.
-        # cell.paragraphs.pop()
-        if self.current_state.more_cols:
-            # Perhaps this commented line works no too.
-            # cell = cell.merge(self.row.cells[self.cell_counter + self.more_cols])
-            for i in range(self.current_state.more_cols):
-                cell = cell.merge(self.current_state.row.cells[self.current_state.cell_counter + i + 1])
-
+        cell = self.current_state.cells[id(node)]
         self.new_state(location=cell)
         # For some annoying reason, a new paragraph is automatically added
         # to each table cell. This is frustrating when you want, e.g. to
@@ -591,22 +587,11 @@ class DocxTranslator(nodes.NodeVisitor):
         self.current_paragraph = cell.paragraphs[0]
 
     def depart_entry(self, node):
-        dprint()
         self.end_state()
-        self.current_state.cell_counter = self.current_state.cell_counter + self.current_state.more_cols + 1
-        self.current_state.more_cols = 0
 
     def visit_table(self, node):
-        dprint()
 
-        style = self.current_state.table_style
-        try:
-            # Check whether the style is part of the document.
-            self.docx_container.styles.get_style_id(style, WD_STYLE_TYPE.TABLE)
-        except KeyError as exc:
-            msg = 'looks like style "{}" is missing\n{}\n using no style'.format(style, repr(exc))
-            logger.warning(msg)
-            style = None
+        style_id = self.style_id(self.current_state.table_style, WD_STYLE_TYPE.TABLE)
 
         # Columns are added when a colspec is visited.
 
@@ -615,11 +600,10 @@ class DocxTranslator(nodes.NodeVisitor):
         if len(self.old_states):
             self.current_state.table = self.current_state.location.add_table(rows=0, cols=0)
         else:
-            self.current_state.table = self.current_state.location.add_table(
-                rows=0, cols=0, style=style)
+            self.current_state.table = self.current_state.location.add_table(rows=0, cols=0)
+            self.current_state.table._tbl.tblStyle_val = style_id
 
     def depart_table(self, node):
-        dprint()
 
         self.current_state.table = None
         self.current_state.table_style = self.table_style_default
@@ -629,74 +613,74 @@ class DocxTranslator(nodes.NodeVisitor):
         self.current_state.location.add_paragraph("")
 
     def visit_acks(self, node):
-        dprint()
         raise nodes.SkipNode
         # self.add_text(', '.join(n.astext() for n in node.children[0].children)
         #               + '.')
 
     def visit_image(self, node):
-        dprint()
         uri = node.attributes['uri']
         file_path = f"{self.builder.env.srcdir}/{uri}"
-        self.docx_container.add_picture(file_path)  # width=Inches(1.25))
-        # .. todo:: 'width' keyword is not supported
+        curloc = self.current_state.location
+        # noinspection PyProtectedMember
+        available = self.docx_container._block_width
+        if isinstance(curloc, _Cell) and curloc.width:
+            available = min(available, curloc.width)
+        picture, width = self.images.prepare(file_path, node.get('width'), node.get('scale'),
+                                             available)
+
+        if isinstance(node.parent, nodes.TextElement):
+            # 行内图片（如替换引用）加入当前段落，排在已缓冲的文本之后
+            self.flush_text()
+            paragraph = self.current_paragraph
+        elif (isinstance(curloc, _Cell) and len(curloc.paragraphs) == 1
+                and not curloc.paragraphs[0].runs):
+            # 重用单元格创建时自带的空段落
+            paragraph = curloc.paragraphs[0]
+        else:
+            paragraph = self.add_paragraph(curloc)
+        paragraph.add_run().add_picture(str(picture), width=width)
 
     def depart_image(self, node):
-        dprint()
+        pass
 
     def visit_transition(self, node):
-        dprint()
         raise nodes.SkipNode
         # self.add_text('=' * 70)
 
     def visit_bullet_list(self, node):
         """处理无序列表的进入事件"""
-        dprint()
         # TODO: 需要区分编号列表与非编号列表（原设计通过list_style存储样式名）
         # 当前方案通过list_level跟踪嵌套层级（替代原list_style方案）
         # 注意：需与visit_list_item中的样式生成规则保持同步
         self.list_level += 1  # 增加列表嵌套深度计数器
 
     def depart_bullet_list(self, node):
-        dprint()
         # TODO: self.list_style.pop()
         self.list_level -= 1
 
     def visit_enumerated_list(self, node):
-        dprint()
         # TODO: self.list_style.append('ListNumber')
         self.list_level += 1
 
     def depart_enumerated_list(self, node):
-        dprint()
         # TODO: self.list_style.pop()
         self.list_level -= 1
 
     def visit_definition_list(self, node):
-        dprint()
         raise nodes.SkipNode
         # self.list_style.append(-2)
 
     def depart_definition_list(self, node):
-        dprint()
         raise nodes.SkipNode
         # self.list_style.pop()
 
     def visit_list_item(self, node):
         """处理列表项创建的核心逻辑"""
-        dprint()
         # 动态生成列表样式名称（根据嵌套层级）
         style = 'List Bullet' if self.list_level < 2 else f'List Bullet {self.list_level}'
-        print(f"列表样式 {style}")  # 控制台输出当前列表样式名称
-        try:
-            # 验证文档是否包含指定列表样式
-            self.docx_container.styles.get_style_id(style, WD_STYLE_TYPE.PARAGRAPH)
-        except KeyError as exc:
-            # 样式缺失时的处理（降级为无样式）
-            logger.warning(f'列表样式 {style} 缺失，使用默认格式')
-            style = None
 
         # 获取当前操作位置（可能是文档主体或表格单元格）
+        self.flush_text()
         curloc = self.current_state.location
         
         # 特殊处理表格单元格中的列表项
@@ -704,117 +688,92 @@ class DocxTranslator(nodes.NodeVisitor):
             # 重用单元格的初始空段落（避免产生多余段落）
             if len(curloc.paragraphs) == 1 and not curloc.paragraphs[0].text:
                 self.current_paragraph = curloc.paragraphs[0]
-                self.current_paragraph.style = style
+                self.current_paragraph._p.style = self.style_id(style)
             else:
                 # 添加新段落并应用列表样式
-                self.current_paragraph = curloc.add_paragraph(style=style)
+                self.current_paragraph = self.add_paragraph(curloc, style)
         else:
             # 常规文档流中添加列表段落
-            self.current_paragraph = curloc.add_paragraph(style=style)
+            self.current_paragraph = self.add_paragraph(curloc, style)
 
     def depart_list_item(self, node):
-        dprint()
+        pass
 
     def visit_definition_list_item(self, node):
-        dprint()
         raise nodes.SkipNode
 
     def depart_definition_list_item(self, node):
-        dprint()
         pass
 
     def visit_term(self, node):
-        dprint()
         raise nodes.SkipNode
 
     def depart_term(self, node):
-        dprint()
         raise nodes.SkipNode
 
     def visit_classifier(self, node):
-        dprint()
         raise nodes.SkipNode
         # self.add_text(' : ')
 
     def depart_classifier(self, node):
-        dprint()
         raise nodes.SkipNode
 
     def visit_definition(self, node):
-        dprint()
         raise nodes.SkipNode
 
     def depart_definition(self, node):
-        dprint()
         raise nodes.SkipNode
 
     def visit_field_list(self, node):
-        dprint()
         pass
 
     def depart_field_list(self, node):
-        dprint()
         pass
 
     def visit_field(self, node):
-        dprint()
         pass
 
     def depart_field(self, node):
-        dprint()
         pass
 
     def visit_field_name(self, node):
-        dprint()
         raise nodes.SkipNode
 
     def depart_field_name(self, node):
-        dprint()
         raise nodes.SkipNode
         # self.add_text(':')
 
     def visit_field_body(self, node):
-        dprint()
         raise nodes.SkipNode
 
     def depart_field_body(self, node):
-        dprint()
         raise nodes.SkipNode
 
     def visit_centered(self, node):
-        dprint()
         pass
 
     def depart_centered(self, node):
-        dprint()
         pass
 
     def visit_hlist(self, node):
-        dprint()
         pass
 
     def depart_hlist(self, node):
-        dprint()
         pass
 
     def visit_hlistcol(self, node):
-        dprint()
         pass
 
     def depart_hlistcol(self, node):
-        dprint()
         pass
 
     def visit_admonition(self, node):
-        dprint()
         raise nodes.SkipNode
 
     def depart_admonition(self, node):
-        dprint()
         raise nodes.SkipNode
 
     def _visit_admonition(self, node):
-        dprint()
         raise nodes.SkipNode
 
     visit_attention = _visit_admonition
@@ -837,7 +796,6 @@ class DocxTranslator(nodes.NodeVisitor):
     depart_warning = _make_depart_admonition('warning')
 
     def visit_versionmodified(self, node):
-        dprint()
         raise nodes.SkipNode
         # from sphinx.locale import admonitionlabels, versionlabels, _
         # if node.children:
@@ -848,74 +806,59 @@ class DocxTranslator(nodes.NodeVisitor):
         #             versionlabels[node['type']] % node['version'] + '.')
 
     def depart_versionmodified(self, node):
-        dprint()
         raise nodes.SkipNode
 
     def visit_literal_block(self, node):
-        dprint()
         # TODO: Check whether literal blocks work in tables and lists.
         self.in_literal_block = True
 
         # Unlike with Lists, there will not be a visit to paragraph in a
         # literal block, so we *must* create the paragraph here.
-        style = 'Preformatted Text'
-        try:
-            # Check whether the style is part of the document.
-            self.docx_container.styles.get_style_id(style, WD_STYLE_TYPE.PARAGRAPH)
-        except KeyError as exc:
-            msg = 'looks like style "{}" is missing\n{}\n using no style'.format(style, repr(exc))
-            logger.warning(msg)
-            style = None
-
-        self.current_paragraph = self.current_state.location.add_paragraph(style=style)
+        self.current_paragraph = self.add_paragraph(self.current_state.location,
+                                                    'Preformatted Text')
         self.current_paragraph.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.LEFT
 
     def depart_literal_block(self, node):
-        dprint()
         self.in_literal_block = False
 
     def visit_doctest_block(self, node):
-        dprint()
         raise nodes.SkipNode
 
     def depart_doctest_block(self, node):
-        dprint()
         raise nodes.SkipNode
 
     def visit_line_block(self, node):
-        dprint()
         raise nodes.SkipNode
 
     def depart_line_block(self, node):
-        dprint()
         raise nodes.SkipNode
 
     def visit_line(self, node):
-        dprint()
         pass
 
     def depart_line(self, node):
-        dprint()
         pass
 
     def visit_block_quote(self, node):
-        dprint()
+        pass
 
     def depart_block_quote(self, node):
-        dprint()
+        pass
 
     def visit_compact_paragraph(self, node):
-        dprint()
+        pass
 
     def depart_compact_paragraph(self, node):
-        dprint()
+        pass
 
     def visit_paragraph(self, node):
-        dprint()
-
+        # 判断段落是否为空之前写出缓冲的文本
+        self.flush_text()
         curloc = self.current_state.location
 
-        if 'List' in self.current_paragraph.style.name and not self.current_paragraph.text:
+        if (self.current_paragraph is not None
+                and 'List' in (self.styles.name(self.current_paragraph._p.style) or '')
+                and not self.current_paragraph.text):
             # This is the first paragraph in a list item, so do not create another one.
             pass
         elif isinstance(curloc, _Cell):
@@ -935,127 +878,107 @@ class DocxTranslator(nodes.NodeVisitor):
             self.current_paragraph = curloc.add_paragraph()
 
     def depart_paragraph(self, node):
-        dprint()
+        pass
 
     def visit_target(self, node):
-        dprint()
         raise nodes.SkipNode
 
     def visit_index(self, node):
-        dprint()
         raise nodes.SkipNode
 
     def visit_substitution_definition(self, node):
-        dprint()
         raise nodes.SkipNode
 
     def visit_pending_xref(self, node):
-        dprint()
         pass
 
     def depart_pending_xref(self, node):
-        dprint()
         pass
 
     def visit_reference(self, node):
-        dprint()
         pass
 
     def depart_reference(self, node):
-        dprint()
         pass
 
     def visit_download_reference(self, node):
-        dprint()
         pass
 
     def depart_download_reference(self, node):
-        dprint()
         pass
 
     def visit_emphasis(self, node):
-        dprint()
         # self.add_text('*')
         self.emphasis = True
 
     def depart_emphasis(self, node):
-        dprint()
         # self.add_text('*')
         self.emphasis = False
 
     def visit_literal_emphasis(self, node):
-        dprint()
+        pass
         # self.add_text('*')
 
     def depart_literal_emphasis(self, node):
-        dprint()
+        pass
         # self.add_text('*')
 
     def visit_strong(self, node):
-        dprint()
         # self.add_text('**')
         self.strong = True
 
     def depart_strong(self, node):
-        dprint()
         # self.add_text('**')
         self.strong = False
 
     def visit_abbreviation(self, node):
-        dprint()
+        pass
         # self.add_text('')
 
     def depart_abbreviation(self, node):
-        dprint()
+        pass
         # if node.hasattr('explanation'):
         #     self.add_text(' (%s)' % node['explanation'])
 
     def visit_title_reference(self, node):
-        dprint()
+        pass
         # self.add_text('*')
 
     def depart_title_reference(self, node):
-        dprint()
+        pass
         # self.add_text('*')
 
     def visit_literal(self, node):
-        dprint()
+        pass
         # self.add_text('``')
 
     def depart_literal(self, node):
-        dprint()
+        pass
         # self.add_text('``')
 
     def visit_subscript(self, node):
-        dprint()
         raise nodes.SkipNode
         # self.add_text('_')
 
     def depart_subscript(self, node):
-        dprint()
         pass
 
     def visit_superscript(self, node):
-        dprint()
         raise nodes.SkipNode
         # self.add_text('^')
 
     def depart_superscript(self, node):
-        dprint()
         pass
 
     def visit_footnote_reference(self, node):
-        dprint()
         raise nodes.SkipNode
         # self.add_text('[%s]' % node.astext())
 
     def visit_citation_reference(self, node):
-        dprint()
         raise nodes.SkipNode
         # self.add_text('[%s]' % node.astext())
 
     def visit_Text(self, node):
-        dprint()
         text = node.astext()
         if not self.in_literal_block:
             # assert '\n\n' not in text, 'Found \n\n'
@@ -1067,42 +990,33 @@ class DocxTranslator(nodes.NodeVisitor):
         self.add_text(text)
 
     def depart_Text(self, node):
-        dprint()
         pass
 
     def visit_generated(self, node):
-        dprint()
         pass
 
     def depart_generated(self, node):
-        dprint()
         pass
 
     def visit_inline(self, node):
-        dprint()
         pass
 
     def depart_inline(self, node):
-        dprint()
         pass
 
     def visit_problematic(self, node):
-        dprint()
         raise nodes.SkipNode
         # self.add_text('>>')
 
     def depart_problematic(self, node):
-        dprint()
         raise nodes.SkipNode
         # self.add_text('<<')
 
     def visit_system_message(self, node):
-        dprint()
         raise nodes.SkipNode
         # self.add_text('<SYSTEM MESSAGE: %s>' % node.astext())
 
     def visit_comment(self, node):
-        dprint()
         # TODO: FIX Dirty hack / kludge to set table style.
         # Use proper directives or something like that
         comment = node[0]
@@ -1111,22 +1025,54 @@ class DocxTranslator(nodes.NodeVisitor):
         raise nodes.SkipNode
 
     def visit_meta(self, node):
-        dprint()
         raise nodes.SkipNode
         # only valid for HTML
 
     def visit_raw(self, node):
-        dprint()
         raise nodes.SkipNode
         # if 'text' in node.get('format', '').split():
         #     self.body.append(node.astext())
 
     def unknown_visit(self, node):
-        dprint()
         raise nodes.SkipNode
         # raise NotImplementedError('Unknown node: ' + node.__class__.__name__)
 
     def unknown_departure(self, node):
-        dprint()
         raise nodes.SkipNode
         # raise NotImplementedError('Unknown node: ' + node.__class__.__name__)
+
+
+class TracingDocxTranslator(DocxTranslator):
+    """记录各节点类型访问次数与累计耗时的 DocxTranslator。
+
+    只在 ``docx_trace`` 开启时使用，未开启时 DocxTranslator 没有任何跟踪开销。
+    耗时为该类型节点 visit/depart 方法自身的执行时间，不包括子节点。
+    """
+
+    def __init__(self, document, builder, docx_container, styles):
+        DocxTranslator.__init__(self, document, builder, docx_container, styles)
+        self.trace_counts = Counter()
+        self.trace_times = defaultdict(float)
+
+    def dispatch_visit(self, node):
+        name = node.__class__.__name__
+        self.trace_counts[name] += 1
+        start = perf_counter()
+        try:
+            return DocxTranslator.dispatch_visit(self, node)
+        finally:
+            self.trace_times[name] += perf_counter() - start
+
+    def dispatch_departure(self, node):
+        start = perf_counter()
+        try:
+            return DocxTranslator.dispatch_departure(self, node)
+        finally:
+            self.trace_times[node.__class__.__name__] += perf_counter() - start
+
+    def report(self):
+        """返回按累计耗时降序排列的 ``(节点类型, 访问次数, 秒数)`` 列表"""
+        return sorted(
+            ((name, count, self.trace_times[name]) for name, count in self.trace_counts.items()),
+            key=lambda item: item[2], reverse=True,
+        )
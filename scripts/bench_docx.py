@@ -0,0 +1,265 @@
+"""DOCX 构建器基准测试。
+
+为每个场景生成合成的文档（章节层级、段落、嵌套列表、大表格、代码块、图片），用 docx 构建器构建，
+记录读取与写出耗时、峰值内存与输出大小，结果写入 reports/bench-docx.json。
+
+每个场景在单独的子进程中构建，峰值 RSS 互不影响::
+
+    python scripts/bench_docx.py                 # 全部场景
+    python scripts/bench_docx.py tables lists    # 指定场景
+    python scripts/bench_docx.py --scale 0.1     # 按比例缩小规模，快速检查
+"""
+import argparse
+import json
+import platform
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+import zlib
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+EXT = Path(__file__).resolve().parents[1] / "doc" / "_ext"
+UNDERLINES = "=-~^\"'`"
+
+DEFAULTS = {
+    "chapters": 4,
+    "depth": 2,
+    "sections": 3,
+    "paragraphs": 5,
+    "lists": 0,
+    "list_depth": 2,
+    "list_items": 5,
+    "tables": 0,
+    "table_rows": 50,
+    "table_cols": 4,
+    "literals": 0,
+    "literal_lines": 20,
+    "images": 0,
+    "image_size": (1600, 1000),
+    "config": {},
+}
+
+SCENARIOS = {
+    "sections": {"chapters": 8, "depth": 4, "sections": 3, "paragraphs": 8},
+    "lists": {"chapters": 4, "paragraphs": 2, "lists": 20, "list_depth": 4, "list_items": 6},
+    "tables": {"chapters": 2, "depth": 1, "tables": 4, "table_rows": 1000, "table_cols": 5},
+    "literals": {"chapters": 4, "paragraphs": 2, "literals": 40, "literal_lines": 40},
+    "images": {"chapters": 2, "depth": 1, "images": 12, "image_size": (2400, 1600)},
+    "mixed": {"chapters": 6, "depth": 3, "paragraphs": 6, "lists": 3, "tables": 1,
+              "table_rows": 100, "literals": 3, "images": 1},
+    "mixed-chapter-stream": {"chapters": 6, "depth": 3, "paragraphs": 6, "lists": 3, "tables": 1,
+                             "table_rows": 100, "literals": 3, "images": 1,
+                             "config": {"docx_assembly": "chapter", "docx_streaming": True}},
+}
+
+SENTENCE = ("Lorem ipsum dolor sit amet, *consectetur* adipiscing elit, sed do ``eiusmod`` tempor "
+            "**incididunt** ut labore et dolore magna aliqua, "
+            "see `example <https://example.org>`_.")
+
+
+def png_bytes(width: int, height: int, seed: int) -> bytes:
+    # 每行是同一斜纹的平移：7 * 183 ≡ 1 (mod 256)，第 y 行取 (x * 7 + y * 3 + seed) % 256
+    pattern = bytes(x * 7 % 256 for x in range(width * 3 + 256))
+    rows = b"".join(
+        b"\x00" + pattern[(y * 3 + seed) * 183 % 256:][:width * 3]
+        for y in range(height)
+    )
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        crc = struct.pack(">I", zlib.crc32(kind + data))
+        return struct.pack(">I", len(data)) + kind + data + crc
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(rows, 1)) + chunk(b"IEND", b""))
+
+
+def scaled(params: dict, scale: float) -> dict:
+    result = dict(params)
+    for key in ("sections", "paragraphs", "lists", "list_items", "tables", "table_rows", "literals",
+                "literal_lines", "images"):
+        if result[key]:
+            result[key] = max(1, round(result[key] * scale))
+    return result
+
+
+def bullet_list(depth: int, items: int, indent: str = "") -> list[str]:
+    lines = []
+    for i in range(items):
+        lines += [f"{indent}- Item {i} with some text", ""]
+        if depth > 1 and i == 0:
+            lines += bullet_list(depth - 1, items, indent + "  ")
+    return lines
+
+
+def table(rows: int, cols: int) -> list[str]:
+    lines = [".. list-table::", "   :header-rows: 1", ""]
+    for r in range(rows + 1):
+        for c in range(cols):
+            lines.append(f"   {'*' if c == 0 else ' '} - {'Name' if r == 0 else f'cell {r}.{c}'}")
+    return lines + [""]
+
+
+def literal(lines: int) -> list[str]:
+    return ["::", ""] + [f"    value_{i} = compute({i}, key='k{i}')" for i in range(lines)] + [""]
+
+
+def body(params: dict, images: list[str]) -> list[str]:
+    lines = [SENTENCE, ""] * params["paragraphs"]
+    for _ in range(params["lists"]):
+        lines += bullet_list(params["list_depth"], params["list_items"])
+    for _ in range(params["tables"]):
+        lines += table(params["table_rows"], params["table_cols"])
+    for _ in range(params["literals"]):
+        lines += literal(params["literal_lines"])
+    for name in images:
+        lines += [f".. image:: {name}", "   :width: 80%", ""]
+    return lines
+
+
+def sections(params: dict, level: int, prefix: str, images: list[str]) -> list[str]:
+    lines = []
+    for i in range(params["sections"]):
+        title = f"Section {prefix}{i}"
+        lines += [title, UNDERLINES[level] * len(title), ""]
+        lines += body(params, images if i == 0 else [])
+        if level + 1 < params["depth"]:
+            lines += sections(params, level + 1, f"{prefix}{i}.", [])
+    return lines
+
+
+def generate(srcdir: Path, params: dict) -> None:
+    srcdir.mkdir(parents=True, exist_ok=True)
+    config = "".join(f"{key} = {value!r}\n" for key, value in params["config"].items())
+    (srcdir / "conf.py").write_text(
+        f"import sys\nsys.path.insert(0, {str(EXT)!r})\n"
+        f"extensions = ['sphinx_docx']\nproject = 'bench'\nversion = '1'\n{config}", "utf-8")
+    names = [f"chapter{i}" for i in range(params["chapters"])]
+    toctree = "".join(f"   {name}\n" for name in names)
+    (srcdir / "index.rst").write_text(
+        "Benchmark\n=========\n\n.. toctree::\n\n" + toctree, "utf-8")
+    width, height = params["image_size"]
+    for i, name in enumerate(names):
+        images = []
+        count = params["images"] // params["chapters"] + (i < params["images"] % params["chapters"])
+        for j in range(count):
+            image = f"{name}-{j}.png"
+            (srcdir / image).write_bytes(png_bytes(width, height, seed=i * 31 + j))
+            images.append(image)
+        title = f"Chapter {i}"
+        lines = [title, "#" * len(title), ""] + body(params, images)
+        lines += sections(params, 0, f"{i}.", [])
+        (srcdir / f"{name}.rst").write_text("\n".join(lines) + "\n", "utf-8")
+
+
+def peak_rss() -> dict:
+    if resource is None:
+        return {}
+    unit = 1 if sys.platform == "darwin" else 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit,
+    }
+
+
+def build(srcdir: Path, nproc: int) -> dict:
+    from sphinx.application import Sphinx
+
+    marks = {}
+
+    def env_updated(app, env):
+        marks["read"] = time.perf_counter()
+
+    start = time.perf_counter()
+    outdir = srcdir / "_build"
+    app = Sphinx(srcdir, srcdir, outdir, outdir / ".doctrees", "docx",
+                 status=None, warning=sys.stderr, freshenv=True, parallel=nproc)
+    app.connect("env-updated", env_updated)
+    app.build()
+    end = time.perf_counter()
+    output = app.builder.output_path
+    with zipfile.ZipFile(output) as package:
+        document = package.getinfo("word/document.xml").file_size
+        media = sum(info.file_size for info in package.infolist()
+                    if info.filename.startswith("word/media/"))
+    return {
+        "read_seconds": round(marks["read"] - start, 3),
+        "write_seconds": round(end - marks["read"], 3),
+        "total_seconds": round(end - start, 3),
+        "peak_rss_bytes": peak_rss(),
+        "output_bytes": output.stat().st_size,
+        "document_xml_bytes": document,
+        "media_bytes": media,
+    }
+
+
+def run_scenario(name: str, params: dict, nproc: int) -> dict:
+    with tempfile.TemporaryDirectory(prefix=f"bench-docx-{name}-") as tmp:
+        srcdir = Path(tmp)
+        generate(srcdir, params)
+        sources = sum(p.stat().st_size for p in srcdir.glob("*.rst"))
+        result = subprocess.run(
+            [sys.executable, __file__, "--build", str(srcdir), "-j", str(nproc)],
+            capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            return {"params": params, "error": result.stderr.strip().splitlines()[-1:]}
+        record = json.loads(result.stdout)
+    return {"params": params, "source_bytes": sources, **record}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the docx builder on synthetic documents.")
+    parser.add_argument("scenarios", nargs="*",
+                        help=f"scenarios to run (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="multiply content counts by this factor")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="parallel write processes")
+    parser.add_argument("--build", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.build:
+        print(json.dumps(build(args.build, args.jobs)))
+        return
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    import docx
+    import sphinx
+
+    report = {
+        "python": platform.python_version(),
+        "sphinx": sphinx.__version__,
+        "python_docx": getattr(docx, "__version__", None),
+        "scale": args.scale,
+        "jobs": args.jobs,
+        "scenarios": {},
+    }
+    for name in args.scenarios or SCENARIOS:
+        params = scaled({**DEFAULTS, **SCENARIOS[name]}, args.scale)
+        record = run_scenario(name, params, args.jobs)
+        report["scenarios"][name] = record
+        if "error" in record:
+            print(f"{name:24s} failed: {record['error']}")
+        else:
+            print(f"{name:24s} {record['total_seconds']:8.2f} s  "
+                  f"{record['peak_rss_bytes'].get('self', 0) / 2**20:8.1f} MiB  "
+                  f"{record['output_bytes'] / 2**10:10.1f} KiB")
+
+    out_dir = Path(__file__).parent / ".." / "reports"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    (out_dir / "bench-docx.json").write_text(json.dumps(report, indent=2), "utf-8")
+
+
+if __name__ == "__main__":
+    main()
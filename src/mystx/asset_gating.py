@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按页面裁剪前端资源模块
+
+MathJax、Plotly/RequireJS、Thebe、tippy、copybutton、PyScript 等扩展会把脚本和样式加到每个页面，
+即使页面中并没有公式、图表、可执行单元格、提示框或代码。启用 ``mystx_asset_gating`` 后：
+
+- 在 ``html-page-context`` 中遍历页面已解析的 doctree，记录页面实际用到的功能；
+- 按 :data:`ASSET_RULES` 把脚本和样式对应到功能，去掉页面未用到的功能的资源，
+  Sphinx 的全局资源列表由此变为逐页的资源清单；
+- 清单写入页面上下文的 ``mystx_page_assets``，供模板使用。
+
+不属于任何规则的资源不受影响。页面内容在浏览器中动态生成时，可通过
+``mystx_asset_gating_always`` 指定始终加载的功能。
+"""
+
+import re
+from dataclasses import dataclass
+from fnmatch import fnmatch
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Set, Tuple
+from docutils import nodes
+from sphinx.application import Sphinx
+from sphinx.config import Config
+from sphinx.util import logging
+
+# 获取Sphinx日志记录器
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class AssetRule:
+    """资源与功能的对应规则。
+
+    Attributes:
+        features: 需要该资源的功能，页面用到其中任意一个即保留
+        patterns: 匹配资源文件名或 URL 的通配符（小写）
+        inline: 匹配内联脚本 ``type`` 属性与内容的正则表达式
+    """
+    features: Tuple[str, ...]
+    patterns: Tuple[str, ...] = ()
+    inline: Optional[str] = None
+
+    def matches(self, filename: str, inline: str = "") -> bool:
+        """判断资源是否属于该规则。"""
+        if filename:
+            filename = filename.lower()
+            return any(fnmatch(filename, pattern) for pattern in self.patterns)
+        return bool(self.inline and inline and re.search(self.inline, inline))
+
+
+ASSET_RULES: Tuple[AssetRule, ...] = (
+    AssetRule(("math",), ("*mathjax*", "*katex*"), r"MathJax|mathjax"),
+    AssetRule(("plotly",), ("*plotly*",)),
+    AssetRule(("plotly", "requirejs", "widgets"),
+              ("*/require.js", "*/require.min.js", "require.js", "require.min.js")),
+    AssetRule(("widgets",), ("*@jupyter-widgets/*", "*embed-amd.js")),
+    AssetRule(("notebook",), ("*thebe*",), r"thebe"),
+    AssetRule(("tooltips",), ("*tippy*", "*@popperjs/core*")),
+    AssetRule(("code",), ("*copybutton*", "*clipboard.min.js")),
+    AssetRule(("pyscript",), ("*pyscript*",)),
+)
+
+# 原始 HTML（笔记本输出等）中表明页面需要某功能的特征
+RAW_FEATURES: Tuple[Tuple[str, Pattern[str]], ...] = (
+    ("plotly", re.compile(r"plotly", re.IGNORECASE)),
+    ("requirejs", re.compile(r"\brequire(?:js)?\s*[(.]|\bdefine\s*\(")),
+    ("widgets", re.compile(r"application/vnd\.jupyter\.widget-view\+json")),
+    ("notebook", re.compile(r"text/x-thebe-config")),
+    ("math", re.compile(r"\\\(|\\\[|\$\$")),
+    ("pyscript", re.compile(r"<py-(?:script|repl|config|terminal)\b"
+                            r"|<script[^>]*\btype=[\"'](?:py|mpy|py-script)[\"']")),
+)
+
+# mystx.nb_outputs 外置输出的占位元素
+LAZY_OUTPUT = re.compile(r'class="mystx-lazy-output" data-src="([^"]+)"')
+
+# sphinx-tippy 默认为这些外部链接生成提示
+TIPPY_URLS = ("https://doi.org/", "https://en.wikipedia.org/wiki/")
+
+
+def _is_tooltip_reference(node: nodes.reference, urls: Tuple[str, ...]) -> bool:
+    if node.get("refid") or node.get("internal"):
+        return True
+    refuri = node.get("refuri", "")
+    if not refuri or refuri.startswith("mailto:"):
+        return False
+    return "://" not in refuri or refuri.startswith(urls)
+
+
+@lru_cache(maxsize=256)
+def _raw_file_features(path: Path) -> frozenset:
+    try:
+        text = path.read_text("utf-8")
+    except OSError:
+        # 无法确定时保留全部可由原始 HTML 触发的功能
+        return frozenset(name for name, _ in RAW_FEATURES)
+    return frozenset(name for name, pattern in RAW_FEATURES if pattern.search(text))
+
+
+def _raw_features(text: str, outdir: Optional[Path]) -> Set[str]:
+    features = {name for name, pattern in RAW_FEATURES if pattern.search(text)}
+    if outdir is not None:
+        # 外置输出在浏览器中加载，其所需的功能要从外置文件中取得
+        for src in LAZY_OUTPUT.findall(text):
+            features.update(_raw_file_features(outdir / src))
+    return features
+
+
+def page_features(doctree: Optional[nodes.document], config: Optional[Config] = None,
+                  metadata: Optional[Dict[str, Any]] = None,
+                  outdir: Optional[Path] = None) -> Set[str]:
+    """遍历 doctree，收集页面用到的功能。
+
+    Args:
+        doctree: 已解析的文档树，为 ``None`` 时（如索引、搜索页）视为不使用任何功能
+        config: Sphinx配置对象，用于读取 ``tippy_rtd_urls``
+        metadata: 页面元数据
+        outdir: 构建输出目录，用于读取 :mod:`mystx.nb_outputs` 外置的输出
+
+    Returns:
+        功能名称集合
+    """
+    features: Set[str] = set()
+    if metadata and any(str(key).startswith("py-") for key in metadata):
+        features.add("pyscript")
+    if doctree is None:
+        return features
+    urls = tuple(getattr(config, "tippy_rtd_urls", None) or ()) + TIPPY_URLS
+    for node in doctree.findall(nodes.Element):
+        if isinstance(node, (nodes.math, nodes.math_block)):
+            features.add("math")
+        elif isinstance(node, nodes.literal_block):
+            features.add("code")
+        elif isinstance(node, (nodes.footnote_reference, nodes.citation_reference)):
+            features.add("tooltips")
+        elif isinstance(node, nodes.reference):
+            if "tooltips" not in features and _is_tooltip_reference(node, urls):
+                features.add("tooltips")
+        elif isinstance(node, nodes.raw) and "html" in node.get("format", "").split():
+            features.update(_raw_features(node.astext(), outdir))
+        if str(node.get("nb_element", "")).startswith("cell_code"):
+            features.add("notebook")
+        classes = node.get("classes", [])
+        if type(node).__name__ == "ThebeButtonNode" or any("thebe" in name for name in classes):
+            features.add("notebook")
+        if any(name.startswith("py-") for name in classes):
+            features.add("pyscript")
+    return features
+
+
+def _asset_rule(asset: Any, rules: Iterable[AssetRule]) -> Optional[AssetRule]:
+    filename = str(getattr(asset, "filename", asset) or "")
+    attributes = getattr(asset, "attributes", {})
+    inline = f"{attributes.get('type', '')}\n{attributes.get('body', '')}"
+    return next((rule for rule in rules if rule.matches(filename, inline)), None)
+
+
+def filter_assets(assets: List[Any], features: Set[str],
+                  rules: Iterable[AssetRule] = ASSET_RULES) -> List[Any]:
+    """原地去掉页面未用到的功能的资源。
+
+    Args:
+        assets: 页面的脚本或样式列表
+        features: 页面用到的功能
+        rules: 资源与功能的对应规则
+
+    Returns:
+        被去掉的资源
+    """
+    rules = list(rules)
+    kept, dropped = [], []
+    for asset in assets:
+        rule = _asset_rule(asset, rules)
+        if rule is None or features.intersection(rule.features):
+            kept.append(asset)
+        else:
+            dropped.append(asset)
+    assets[:] = kept
+    return dropped
+
+
+def _rules(config: Config) -> Tuple[AssetRule, ...]:
+    mathjax_path = str(getattr(config, "mathjax_path", "") or "").lower()
+    if not mathjax_path:
+        return ASSET_RULES
+    # 自定义的 MathJax 地址未必包含 "mathjax"
+    return (AssetRule(("math",), (mathjax_path,)),) + ASSET_RULES
+
+
+def html_page_context_handler(app: Sphinx, pagename: str, templatename: str,
+                              context: Dict[str, Any], doctree) -> None:
+    """html-page-context 事件处理器，按页面内容裁剪脚本与样式。"""
+    features = page_features(doctree, app.config, context.get("meta"), Path(app.outdir))
+    if context.get("has_maths_elements"):
+        features.add("math")
+    features.update(app.config.mystx_asset_gating_always)
+    rules = _rules(app.config)
+    dropped = []
+    for key in ("script_files", "css_files"):
+        assets = context.get(key)
+        if isinstance(assets, list):
+            dropped.extend(filter_assets(assets, features, rules))
+    context["mystx_page_assets"] = {
+        "features": sorted(features),
+        "dropped": [str(getattr(asset, "filename", "") or "<inline>") for asset in dropped],
+    }
+    if dropped:
+        logger.debug(f"[{pagename}] 功能 {sorted(features)}，去掉 {len(dropped)} 个资源")
+
+
+def sphinx_setup(app: Sphinx, config: Config) -> None:
+    """启用按页面裁剪前端资源。
+
+    Args:
+        app: Sphinx应用实例
+        config: Sphinx配置对象
+    """
+    logger.info("正在配置按页面裁剪前端资源")
+    # 需在各扩展添加页面资源之后执行
+    app.connect("html-page-context", html_page_context_handler, priority=900)
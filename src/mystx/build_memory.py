@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+构建内存报告模块
+
+启用 ``mystx_memory_report`` 后记录构建各阶段的内存使用，并分析构建环境与 doctree 的体积构成：
+
+- 在 ``builder-inited``、``env-updated``、``build-finished`` 等阶段边界记录 tracemalloc 快照
+  （当前占用、阶段峰值与分配最多的文件）、主进程当前的 RSS 与阶段内的峰值 RSS，
+  以及主进程和已结束的工作进程截至该边界的累计峰值 RSS（``ru_maxrss``，进程启动以来的峰值）；
+- 阶段峰值 RSS 在 Linux 上每个边界向 ``/proc/self/clear_refs`` 写入 ``5`` 重置 ``VmHWM`` 后读取，
+  不支持时改为后台线程定期采样当前 RSS；
+- 按域（domain）、Sphinx 核心数据与扩展数据分解 pickle 后的构建环境体积；
+- 按节点类型分解 doctree 体积，myst-nb 的单元格节点额外按 ``nb_element`` 区分，
+  可以看出笔记本输出等内容所占的比例。
+
+报告写入 doctree 目录下的 ``mystx/memory.json``，并在日志中输出摘要。
+"""
+
+import inspect
+import json
+import os
+import pickle
+import re
+import sys
+import threading
+import tracemalloc
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from docutils import nodes
+from sphinx.application import Sphinx
+from sphinx.config import Config
+from sphinx.environment import BuildEnvironment
+from sphinx.util import logging
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# 获取Sphinx日志记录器
+logger = logging.getLogger(__name__)
+
+# 报告中每项列出的条目数
+TOP = 15
+# 无法重置 VmHWM 时采样当前 RSS 的间隔（秒）
+SAMPLE_INTERVAL = 0.05
+
+
+def _pickled_size(obj: Any) -> int:
+    try:
+        return len(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return -1
+
+
+def current_rss() -> Optional[int]:
+    """返回当前进程此刻的 RSS（字节），无法获取时返回 None。"""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def _read_hwm() -> Optional[int]:
+    """返回 ``/proc/self/status`` 中的 ``VmHWM``（字节），无法获取时返回 None。"""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def _reset_hwm() -> bool:
+    """把 ``VmHWM`` 重置为当前 RSS，成功时返回 True。"""
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as f:
+            f.write("5")
+    except OSError:
+        return False
+    return True
+
+
+class PeakRss:
+    """跟踪主进程在两次 :meth:`take` 之间的峰值 RSS。
+
+    优先使用可重置的 ``VmHWM``；不支持时在后台线程中每隔 :data:`SAMPLE_INTERVAL` 秒采样当前 RSS，
+    采样得到的峰值可能略低于真实峰值。两者都不可用时峰值为 None。
+
+    Attributes:
+        method: 峰值的来源，``"hwm"``、``"sampled"`` 或 None
+    """
+
+    def __init__(self) -> None:
+        self.method: Optional[str] = None
+        self._peak: Optional[int] = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """开始跟踪。"""
+        if _read_hwm() is not None and _reset_hwm():
+            self.method = "hwm"
+        elif current_rss() is not None:
+            self.method = "sampled"
+            self._peak = current_rss()
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._sample, name="mystx-rss-sampler",
+                                            daemon=True)
+            self._thread.start()
+
+    def _sample(self) -> None:
+        while not self._stopped.wait(SAMPLE_INTERVAL):
+            rss = current_rss()
+            with self._lock:
+                if rss is not None and (self._peak is None or rss > self._peak):
+                    self._peak = rss
+
+    def take(self) -> Optional[int]:
+        """返回上次调用以来的峰值 RSS（字节），并开始下一段的跟踪。"""
+        if self.method == "hwm":
+            peak = _read_hwm()
+            _reset_hwm()
+            return peak
+        if self.method == "sampled":
+            rss = current_rss()
+            with self._lock:
+                peak = max(filter(None, (self._peak, rss)), default=None)
+                self._peak = rss
+            return peak
+        return None
+
+    def stop(self) -> None:
+        """停止后台采样。"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def peak_rss() -> Dict[str, int]:
+    """返回当前进程与已结束的子进程自启动以来的累计峰值 RSS（字节）。"""
+    if resource is None:
+        return {}
+    # Linux 以 KiB 为单位，macOS 以字节为单位
+    unit = 1 if sys.platform == "darwin" else 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit,
+    }
+
+
+@dataclass
+class PhaseRecorder:
+    """在阶段边界记录内存使用。
+
+    Attributes:
+        phases: 各阶段的记录
+        snapshot: 上一个阶段边界的 tracemalloc 快照
+        peak: 阶段峰值 RSS 跟踪器
+    """
+    phases: List[Dict[str, Any]] = field(default_factory=list)
+    snapshot: Optional[tracemalloc.Snapshot] = None
+    peak: PeakRss = field(default_factory=PeakRss)
+
+    def mark(self, phase: str) -> None:
+        """记录截至当前的阶段。"""
+        record: Dict[str, Any] = {
+            "phase": phase,
+            "rss": current_rss(),
+            "rss_peak": self.peak.take(),
+            "rss_peak_method": self.peak.method,
+            "rss_peak_cumulative": peak_rss(),
+        }
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            ))
+            record.update(
+                traced=current,
+                traced_peak=peak,
+                top_files=[
+                    {"file": str(stat.traceback[0].filename), "size": stat.size,
+                     "count": stat.count}
+                    for stat in snapshot.statistics("filename")[:TOP]
+                ],
+            )
+            if self.snapshot is not None:
+                record["growth"] = [
+                    {"file": str(stat.traceback[0].filename), "size_diff": stat.size_diff}
+                    for stat in snapshot.compare_to(self.snapshot, "filename")[:TOP]
+                ]
+            self.snapshot = snapshot
+        self.phases.append(record)
+        cumulative = record["rss_peak_cumulative"]
+        logger.info(f"内存 [{phase}]: 当前 RSS {_mib(record['rss'])}，"
+                    f"阶段峰值 RSS {_mib(record['rss_peak'])}，"
+                    f"累计峰值 RSS {_mib(cumulative.get('self'))}，"
+                    f"子进程累计峰值 RSS {_mib(cumulative.get('children'))}，"
+                    f"阶段 tracemalloc 峰值 {_mib(record.get('traced_peak'))}")
+
+
+def _mib(size: Optional[int]) -> str:
+    return "-" if size is None else f"{size / 1024 / 1024:.1f} MiB"
+
+
+def _core_env_attributes() -> set:
+    """从 ``BuildEnvironment.__init__`` 的源码中取得 Sphinx 自身设置的环境属性。"""
+    try:
+        source = inspect.getsource(BuildEnvironment.__init__)
+    except (OSError, TypeError):
+        return set()
+    return set(re.findall(r"self\.(\w+)\s*[:=]", source))
+
+
+def env_breakdown(env: BuildEnvironment) -> Dict[str, int]:
+    """按域、Sphinx 核心数据与扩展数据分解构建环境 pickle 后的体积。
+
+    Args:
+        env: 构建环境
+
+    Returns:
+        ``domain:<名称>``、``core:<属性>``、``extension:<属性>`` 到字节数的映射
+    """
+    state = env.__getstate__()
+    core = _core_env_attributes()
+    sizes: Dict[str, int] = {}
+    for name, value in state.items():
+        if name == "domaindata":
+            for domain, data in value.items():
+                sizes[f"domain:{domain}"] = _pickled_size(data)
+        elif name in core:
+            sizes[f"core:{name}"] = _pickled_size(value)
+        else:
+            sizes[f"extension:{name}"] = _pickled_size(value)
+    return sizes
+
+
+def _node_key(node: nodes.Node) -> str:
+    key = type(node).__name__
+    if isinstance(node, nodes.Element) and node.get("nb_element"):
+        key = f"{key}[{node['nb_element']}]"
+    return key
+
+
+def doctree_breakdown(doctree: nodes.document) -> Dict[str, Tuple[int, int]]:
+    """按节点类型估算 doctree 的体积。
+
+    每个节点只计算自身（属性、原始文本或文本内容），不包含子节点。
+
+    Args:
+        doctree: 文档树
+
+    Returns:
+        节点类型到 ``(数量, 字节数)`` 的映射
+    """
+    result: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+    for node in doctree.findall():
+        if isinstance(node, nodes.Text):
+            size = len(str(node).encode("utf-8"))
+        else:
+            size = _pickled_size((node.attributes, node.rawsource))
+        entry = result[_node_key(node)]
+        entry[0] += 1
+        entry[1] += size
+    return {key: (count, size) for key, (count, size) in result.items()}
+
+
+def _top(sizes: Dict[str, int]) -> List[Tuple[str, int]]:
+    return sorted(sizes.items(), key=lambda item: item[1], reverse=True)[:TOP]
+
+
+_recorder = PhaseRecorder()
+
+
+def builder_inited_handler(app: Sphinx) -> None:
+    """builder-inited 事件处理器，记录初始化阶段。"""
+    _recorder.mark("init")
+
+
+def env_updated_handler(app: Sphinx, env: BuildEnvironment) -> None:
+    """env-updated 事件处理器，记录读取阶段。"""
+    _recorder.mark("read")
+
+
+def build_finished_handler(app: Sphinx, exception: Optional[Exception]) -> None:
+    """build-finished 事件处理器，记录写入阶段并输出体积分解报告。"""
+    _recorder.mark("write")
+    _recorder.peak.stop()
+    if exception is not None:
+        return
+    env = app.env
+    env_sizes = env_breakdown(env)
+
+    doctree_sizes: Dict[str, int] = {}
+    node_types: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+    for docname in sorted(env.found_docs):
+        path = Path(app.doctreedir) / f"{docname}.doctree"
+        if not path.exists():
+            continue
+        doctree_sizes[docname] = path.stat().st_size
+        for key, (count, size) in doctree_breakdown(env.get_doctree(docname)).items():
+            node_types[key][0] += count
+            node_types[key][1] += size
+
+    env_items = sorted(env_sizes.items(), key=lambda item: item[1], reverse=True)
+    node_items = sorted(node_types.items(), key=lambda item: item[1][1], reverse=True)
+    report = {
+        "phases": _recorder.phases,
+        "environment": {"total": sum(env_sizes.values()), "items": dict(env_items)},
+        "doctrees": {"total": sum(doctree_sizes.values()), "largest": dict(_top(doctree_sizes))},
+        "node_types": {
+            key: {"count": count, "size": size}
+            for key, (count, size) in node_items
+        },
+    }
+    report_path = Path(app.doctreedir) / "mystx" / "memory.json"
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    report_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), "utf-8")
+
+    logger.info(f"内存报告已写入 {report_path}")
+    logger.info(f"构建环境 {_mib(report['environment']['total'])}，"
+                f"doctree 共 {_mib(report['doctrees']['total'])}")
+    for name, size in env_items[:5]:
+        logger.info(f"  {_mib(size):>12}  {name}")
+    for key, item in list(report["node_types"].items())[:5]:
+        logger.info(f"  {_mib(item['size']):>12}  <{key}> x{item['count']}")
+
+
+def sphinx_setup(app: Sphinx, config: Config) -> None:
+    """启用构建内存报告。
+
+    Args:
+        app: Sphinx应用实例
+        config: Sphinx配置对象
+    """
+    logger.info("正在配置构建内存报告")
+    if getattr(config, "mystx_memory_tracemalloc", True) and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _recorder.peak.start()
+    app.connect("builder-inited", builder_inited_handler)
+    app.connect("env-updated", env_updated_handler, priority=1000)
+    app.connect("build-finished", build_finished_handler, priority=1000)
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+构建性能剖析模块
+
+启用 ``mystx_profile`` 后，使用 cProfile 分别剖析构建的读取阶段与写入阶段：
+
+- 读取阶段从 ``env-before-read-docs`` 开始，到 ``env-updated`` 结束；
+- 写入阶段从 ``env-check-consistency`` 之后开始，到 ``build-finished`` 结束；
+- ``-j`` 并行构建的工作进程在分叉后重新开始剖析，退出时写出各自的统计数据。
+
+构建结束时（在其他 ``build-finished`` 处理器之后）合并各进程的统计数据，在 doctree 目录的 ``mystx/profile`` 下写出
+``<阶段>.pstats``（可用 pstats、snakeviz 等查看）与 ``<阶段>.collapsed``（可用 flamegraph.pl、speedscope 等绘制火焰图），
+剖析结果不会随站点发布。
+"""
+
+import cProfile
+import os
+import pstats
+import shutil
+from collections import defaultdict
+from dataclasses import dataclass
+from multiprocessing import util as mp_util
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from sphinx.application import Sphinx
+from sphinx.config import Config
+from sphinx.environment import BuildEnvironment
+from sphinx.util import logging
+
+# 获取Sphinx日志记录器
+logger = logging.getLogger(__name__)
+
+# 剖析结果在 doctree 目录中的位置，各进程的统计数据暂存在其下的 parts 目录
+OUTPUT_DIR = "mystx/profile"
+PHASES = ("read", "write")
+# 火焰图中忽略占比低于该值的调用路径
+MIN_FRACTION = 1e-4
+
+# pstats 中函数的键：(文件名, 行号, 函数名)
+Func = Tuple[str, int, str]
+
+
+@dataclass
+class PhaseProfiler:
+    """按阶段管理当前进程的 cProfile。
+
+    Attributes:
+        directory: 各进程统计数据的临时目录，为 None 时不剖析
+        phase: 正在剖析的阶段
+        profile: 正在运行的剖析器
+    """
+    directory: Optional[Path] = None
+    phase: Optional[str] = None
+    profile: Optional[cProfile.Profile] = None
+
+    def start(self, phase: str) -> None:
+        """开始剖析某个阶段。"""
+        if self.directory is None:
+            return
+        self.stop()
+        self.phase = phase
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def stop(self) -> None:
+        """结束当前阶段，并把统计数据写入以阶段和进程号命名的文件。"""
+        if self.profile is None:
+            return
+        self.profile.disable()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.profile.dump_stats(self.directory / f"{self.phase}.{os.getpid()}.pstats")
+        self.profile = None
+        self.phase = None
+
+    def after_fork(self) -> None:
+        """在并行构建的工作进程中丢弃继承自主进程的剖析器，重新开始剖析当前阶段。"""
+        if self.profile is None:
+            return
+        self.profile.disable()
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+        mp_util.Finalize(self, PhaseProfiler.stop, args=(self,), exitpriority=10)
+
+
+_profiler = PhaseProfiler()
+mp_util.register_after_fork(_profiler, PhaseProfiler.after_fork)
+
+
+def _label(func: Func) -> str:
+    filename, lineno, name = func
+    if filename == "~":
+        # 内置函数
+        return name.replace(";", ",")
+    return f"{name} ({Path(filename).name}:{lineno})".replace(";", ",")
+
+
+def collapsed_stacks(stats: pstats.Stats) -> Dict[str, float]:
+    """由调用关系近似还原调用栈，生成火焰图使用的折叠栈。
+
+    cProfile 只记录调用者与被调用者之间的耗时，这里按每条调用边的累计耗时占比，
+    把被调用函数的自身耗时分摊到各条调用路径上。
+
+    Args:
+        stats: 合并后的统计数据
+
+    Returns:
+        以 ``;`` 连接的调用路径到自身耗时（秒）的映射
+    """
+    entries = stats.stats
+    callees: Dict[Func, Dict[Func, float]] = defaultdict(dict)
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller, edge in callers.items():
+            callees[caller][func] = edge[3]
+    total = sum(tt for _, _, tt, _, _ in entries.values()) or 1.0
+    roots = [func for func, entry in entries.items() if not entry[4]]
+    result: Dict[str, float] = defaultdict(float)
+
+    def walk(func: Func, path: List[str], active: set, scale: float) -> None:
+        _, _, tt, _, _ = entries[func]
+        if tt * scale > 0:
+            result[";".join(path)] += tt * scale
+        for callee, edge_ct in callees[func].items():
+            callee_ct = entries[callee][3]
+            if callee in active or callee_ct <= 0:
+                continue
+            fraction = scale * min(edge_ct / callee_ct, 1.0)
+            if callee_ct * fraction < total * MIN_FRACTION:
+                continue
+            active.add(callee)
+            walk(callee, path + [_label(callee)], active, fraction)
+            active.discard(callee)
+
+    for root in roots:
+        walk(root, [_label(root)], {root}, 1.0)
+    return dict(result)
+
+
+def merge_phase(directory: Path, phase: str, output: Path) -> Optional[pstats.Stats]:
+    """合并某阶段各进程的统计数据并写出 pstats 与折叠栈文件。
+
+    Args:
+        directory: 各进程统计数据所在目录
+        phase: 阶段名
+        output: 输出目录
+
+    Returns:
+        合并后的统计数据，该阶段没有数据时返回 None
+    """
+    files = sorted(directory.glob(f"{phase}.*.pstats"))
+    if not files:
+        return None
+    stats = pstats.Stats(str(files[0]))
+    for path in files[1:]:
+        stats.add(str(path))
+    output.mkdir(parents=True, exist_ok=True)
+    stats.dump_stats(output / f"{phase}.pstats")
+    with open(output / f"{phase}.collapsed", "w", encoding="utf-8") as f:
+        for stack, seconds in sorted(collapsed_stacks(stats).items()):
+            micros = int(seconds * 1e6)
+            if micros:
+                f.write(f"{stack} {micros}\n")
+    logger.info(f"{phase} 阶段剖析完成：合并了 {len(files)} 个进程，共 {stats.total_tt:.2f}s")
+    return stats
+
+
+def env_before_read_docs_handler(app: Sphinx, env: BuildEnvironment, docnames: List[str]) -> None:
+    """env-before-read-docs 事件处理器，开始剖析读取阶段。"""
+    _profiler.start("read")
+
+
+def env_updated_handler(app: Sphinx, env: BuildEnvironment) -> None:
+    """env-updated 事件处理器，结束读取阶段的剖析。"""
+    _profiler.stop()
+
+
+def env_check_consistency_handler(app: Sphinx, env: BuildEnvironment) -> None:
+    """env-check-consistency 事件处理器，开始剖析写入阶段。"""
+    _profiler.start("write")
+
+
+def build_finished_handler(app: Sphinx, exception: Optional[Exception]) -> None:
+    """build-finished 事件处理器，结束剖析并合并各进程的统计数据。"""
+    _profiler.stop()
+    directory = _profiler.directory
+    if directory is None or not directory.exists():
+        return
+    output = Path(app.doctreedir) / OUTPUT_DIR
+    for phase in PHASES:
+        merge_phase(directory, phase, output)
+    shutil.rmtree(directory, ignore_errors=True)
+    logger.info(f"剖析结果已写入 {output}")
+
+
+def sphinx_setup(app: Sphinx, config: Config) -> None:
+    """启用构建性能剖析。
+
+    Args:
+        app: Sphinx应用实例
+        config: Sphinx配置对象
+    """
+    logger.info("正在配置构建性能剖析")
+    _profiler.directory = Path(app.doctreedir) / OUTPUT_DIR / "parts"
+    # 清理上次构建中断时残留的数据
+    shutil.rmtree(_profiler.directory, ignore_errors=True)
+    app.connect("env-before-read-docs", env_before_read_docs_handler, priority=0)
+    app.connect("env-updated", env_updated_handler, priority=1000)
+    app.connect("env-check-consistency", env_check_consistency_handler, priority=1000)
+    # 写入阶段的剖析包括字体子集化、service worker 清单等其他 build-finished 处理器
+    app.connect("build-finished", build_finished_handler, priority=1000)
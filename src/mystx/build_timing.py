@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+构建计时模块
+
+记录构建中每个文档、每个阶段的耗时，用于定位拖慢构建的页面和扩展：
+
+- ``source-read``、``doctree-read``、``doctree-resolved``、``html-page-context``、``build-finished``
+  的事件处理器按所属扩展（模块）分别计时；
+- 每个文档的读取（``read_doc``）与写入（``write_doc``）整体计时；
+- mystx 自身的处理器与指令通过 :func:`timed` 装饰器计时。
+
+每个进程把记录追加到 doctree 目录下以进程号命名的 JSONL 文件，``-j`` 并行构建的工作进程退出时写出各自的记录，
+构建结束时由主进程合并为 ``timing.json`` 并输出耗时最多的文档与扩展。
+"""
+
+import functools
+import json
+import os
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from multiprocessing import util as mp_util
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from sphinx.application import Sphinx
+from sphinx.config import Config
+from sphinx.util import logging
+
+# 获取Sphinx日志记录器
+logger = logging.getLogger(__name__)
+
+# 需要计时的事件及从事件参数中取得文档名的方式
+TIMED_EVENTS: Dict[str, Callable[[Sphinx, tuple], Optional[str]]] = {
+    "source-read": lambda app, args: args[0],
+    "doctree-read": lambda app, args: app.env.docname,
+    "doctree-resolved": lambda app, args: args[1],
+    "html-page-context": lambda app, args: args[0],
+    "build-finished": lambda app, args: None,
+}
+
+
+@dataclass
+class TimingRecorder:
+    """进程内的计时记录器。
+
+    Attributes:
+        directory: 记录文件所在目录，为 None 时不记录
+        records: 尚未写出的记录
+        docname: 正在读取或写入的文档
+    """
+    directory: Optional[Path] = None
+    records: List[Dict[str, Any]] = field(default_factory=list)
+    docname: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    def add(self, phase: str, name: str, docname: Optional[str], seconds: float) -> None:
+        """添加一条记录。
+
+        Args:
+            phase: 阶段，如事件名、``read``、``write`` 或 ``mystx``
+            name: 处理器所属的模块或被计时的函数名
+            docname: 相关文档，与文档无关时为 None
+            seconds: 耗时（秒）
+        """
+        if self.enabled:
+            self.records.append(
+                {"phase": phase, "name": name, "docname": docname, "seconds": seconds}
+            )
+
+    def flush(self) -> None:
+        """把记录追加到当前进程的记录文件。"""
+        if not self.enabled or not self.records:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / f"{os.getpid()}.jsonl", "a", encoding="utf-8") as f:
+            for record in self.records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.records.clear()
+
+    def after_fork(self) -> None:
+        """在并行构建的工作进程中丢弃继承自主进程的记录，并在进程退出时写出。"""
+        self.records = []
+        if self.enabled:
+            mp_util.Finalize(self, TimingRecorder.flush, args=(self,), exitpriority=10)
+
+
+_recorder = TimingRecorder()
+mp_util.register_after_fork(_recorder, TimingRecorder.after_fork)
+
+
+def timed(name: str) -> Callable:
+    """计时装饰器，用于 mystx 自身的处理器、指令等。
+
+    Args:
+        name: 记录中使用的名称
+
+    Returns:
+        装饰器
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _recorder.add("mystx", name, _recorder.docname, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def _timed_listener(event: str, handler: Callable) -> Callable:
+    """包装事件处理器，按所属模块记录耗时。"""
+    get_docname = TIMED_EVENTS[event]
+    name = getattr(handler, "__module__", None) or repr(handler)
+
+    @functools.wraps(handler)
+    def wrapper(app: Sphinx, *args):
+        start = time.perf_counter()
+        try:
+            return handler(app, *args)
+        finally:
+            _recorder.add(event, name, get_docname(app, args), time.perf_counter() - start)
+    return wrapper
+
+
+def _timed_span(phase: str, method: Callable) -> Callable:
+    """包装构建器的 ``read_doc``/``write_doc``，记录单个文档的整体耗时。"""
+    @functools.wraps(method)
+    def wrapper(docname: str, *args, **kwargs):
+        _recorder.docname = docname
+        start = time.perf_counter()
+        try:
+            return method(docname, *args, **kwargs)
+        finally:
+            _recorder.add(phase, phase, docname, time.perf_counter() - start)
+            _recorder.docname = None
+    return wrapper
+
+
+def summarize(records: List[Dict[str, Any]], top: int = 10) -> Dict[str, Any]:
+    """汇总计时记录。
+
+    Args:
+        records: 所有进程的记录
+        top: 汇总中保留的条目数
+
+    Returns:
+        包含按文档、按扩展、mystx 处理器统计及前 ``top`` 项的报告
+    """
+    documents: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    extensions: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    handlers: Dict[str, Dict[str, float]] = defaultdict(lambda: {"calls": 0, "seconds": 0.0})
+    for record in records:
+        phase, name = record["phase"], record["name"]
+        docname, seconds = record["docname"], record["seconds"]
+        if phase == "mystx":
+            handlers[name]["calls"] += 1
+            handlers[name]["seconds"] += seconds
+            continue
+        if docname is not None:
+            documents[docname][phase] += seconds
+        if phase in TIMED_EVENTS:
+            extensions[name][phase] += seconds
+
+    def total(phases: Dict[str, float]) -> float:
+        # read/write 已包含期间触发的事件，不重复累加
+        spans = [phases[p] for p in ("read", "write") if p in phases]
+        return sum(spans) if spans else sum(phases.values())
+
+    document_totals = sorted(((total(p), d) for d, p in documents.items()), reverse=True)
+    extension_totals = sorted(((sum(p.values()), e) for e, p in extensions.items()), reverse=True)
+    return {
+        "documents": {d: dict(p) for d, p in documents.items()},
+        "extensions": {e: dict(p) for e, p in extensions.items()},
+        "mystx": dict(handlers),
+        "top_documents": [{"docname": d, "seconds": s} for s, d in document_totals[:top]],
+        "top_extensions": [{"extension": e, "seconds": s} for s, e in extension_totals[:top]],
+    }
+
+
+def _timing_dir(app: Sphinx) -> Path:
+    return Path(app.doctreedir) / "mystx" / "timing"
+
+
+def builder_inited_handler(app: Sphinx) -> None:
+    """builder-inited 事件处理器，包装事件处理器与构建器的读写方法。"""
+    for event in TIMED_EVENTS:
+        app.events.listeners[event] = [
+            listener._replace(handler=_timed_listener(event, listener.handler))
+            for listener in app.events.listeners[event]
+        ]
+    app.builder.read_doc = _timed_span("read", app.builder.read_doc)
+    app.builder.write_doc = _timed_span("write", app.builder.write_doc)
+
+
+def build_finished_handler(app: Sphinx, exception: Optional[Exception]) -> None:
+    """build-finished 事件处理器，合并各进程的记录并输出报告。"""
+    if exception is not None or not _recorder.enabled:
+        return
+    _recorder.flush()
+    records = []
+    for path in sorted(_recorder.directory.glob("*.jsonl")):
+        with open(path, encoding="utf-8") as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+        path.unlink()
+    report = summarize(records, app.config.mystx_build_timing_top)
+    report_path = _recorder.directory.parent / "timing.json"
+    report_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), "utf-8")
+
+    logger.info(f"构建计时报告已写入 {report_path}")
+    for item in report["top_documents"]:
+        logger.info(f"  {item['seconds']:8.3f}s  {item['docname']}")
+    for item in report["top_extensions"]:
+        logger.info(f"  {item['seconds']:8.3f}s  [{item['extension']}]")
+
+
+def sphinx_setup(app: Sphinx, config: Config) -> None:
+    """启用构建计时。
+
+    Args:
+        app: Sphinx应用实例
+        config: Sphinx配置对象
+    """
+    logger.info("正在配置构建计时")
+    _recorder.directory = _timing_dir(app)
+    # 清理上次构建中断时残留的记录
+    for path in _recorder.directory.glob("*.jsonl"):
+        path.unlink()
+    # 尽量晚地包装，以覆盖其他扩展注册的处理器
+    app.connect("builder-inited", builder_inited_handler, priority=900)
+    # 合并需在其他 build-finished 处理器之后执行
+    app.connect("build-finished", build_finished_handler, priority=1000)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+评论与批注嵌入的点击加载外观模块
+
+sphinx-comments 根据 ``comments_config`` 在每个页面加载 Hypothesis、Utterances、dokieli 的脚本，
+Utterances 还会嵌入跨域 iframe。启用 ``mystx_comments_facade`` 后，这些嵌入由轻量的外观（facade）代替：
+
+- Utterances 在正文末尾显示评论区占位，点击或滚动到可视区域附近时才加载；
+- Hypothesis 与 dokieli 显示为固定位置的按钮，点击后才加载；
+- ``mystx_comments_facade_pages`` 按页面名称模式（与 ``html_sidebars`` 相同的通配符语法）选择加载方式。
+
+搜索、索引等没有正文的页面保持原样。
+"""
+
+import html
+import json
+from typing import Any, Dict, List
+from sphinx.application import Sphinx
+from sphinx.config import Config
+from sphinx.util import logging
+from sphinx.util.matching import patmatch
+
+# 获取Sphinx日志记录器
+logger = logging.getLogger(__name__)
+
+# sphinx-comments 以 kind 属性标记各嵌入的脚本
+KINDS = ("hypothesis", "utterances", "dokieli")
+# visible：点击或滚动到可视区域时加载；click：仅点击时加载；eager：保持原样；off：不加载
+MODES = ("visible", "click", "eager", "off")
+DOKIELI_CSS = "https://dokie.li/media/css/dokieli.css"
+
+LABELS = {
+    "utterances": "加载评论",
+    "hypothesis": "开启批注",
+    "dokieli": "开启 dokieli",
+}
+HOSTS = {
+    "utterances": "utteranc.es",
+    "hypothesis": "hypothes.is",
+    "dokieli": "dokie.li",
+}
+
+
+def page_mode(pagename: str, patterns: Dict[str, str], default: str = "visible") -> str:
+    """按页面名称模式取得加载方式，使用第一个匹配的模式。
+
+    Args:
+        pagename: 页面名称
+        patterns: 页面名称模式到加载方式的映射
+        default: 没有模式匹配时的加载方式
+
+    Returns:
+        加载方式
+    """
+    for pattern, mode in patterns.items():
+        if patmatch(pagename, pattern):
+            return mode
+    return default
+
+
+def embeds(comments_config: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """按 sphinx-comments 的规则生成各嵌入实际加载的脚本。
+
+    Args:
+        comments_config: sphinx-comments 的配置
+
+    Returns:
+        嵌入类型到脚本地址、属性与样式表的映射
+    """
+    result: Dict[str, Dict[str, Any]] = {}
+    if comments_config.get("hypothesis"):
+        result["hypothesis"] = {"src": "https://hypothes.is/embed.js", "attributes": {}, "css": []}
+    if comments_config.get("dokieli"):
+        result["dokieli"] = {
+            "src": "https://dokie.li/scripts/dokieli.js",
+            "attributes": {},
+            "css": [DOKIELI_CSS],
+        }
+    utterances = comments_config.get("utterances")
+    if utterances and "repo" in utterances:
+        result["utterances"] = {
+            "src": "https://utteranc.es/client.js",
+            "attributes": {
+                "repo": utterances["repo"],
+                "issue-term": utterances.get("issue-term", "pathname"),
+                "theme": utterances.get("theme", "github-light"),
+                "label": utterances.get("label", "💬 comment"),
+                "crossorigin": utterances.get("crossorigin", "anonymous"),
+            },
+            "css": [],
+        }
+    return result
+
+
+def facade_html(kinds: List[str]) -> str:
+    """生成各嵌入的外观元素。"""
+    parts = []
+    for kind in kinds:
+        label = html.escape(LABELS[kind])
+        note = html.escape(f"将连接到 {HOSTS[kind]}")
+        parts.append(
+            f'<div class="mystx-comments-facade mystx-comments-facade-{kind}" data-kind="{kind}">'
+            f'<button type="button" class="mystx-comments-facade-load" title="{note}">'
+            f'{label}</button></div>'
+        )
+    return "".join(parts)
+
+
+def html_page_context_handler(app: Sphinx, pagename: str, templatename: str,
+                              context: Dict[str, Any], doctree) -> None:
+    """html-page-context 事件处理器，以外观代替评论与批注嵌入。"""
+    script_files = context.get("script_files")
+    if not isinstance(script_files, list) or "body" not in context:
+        return
+    present = {js.attributes.get("kind") for js in script_files if hasattr(js, "attributes")}
+    if not present.intersection(KINDS):
+        return
+    mode = page_mode(pagename, app.config.mystx_comments_facade_pages)
+    if mode == "eager":
+        return
+    if mode not in MODES:
+        logger.warning(f"[{pagename}] 评论加载方式无效: {mode!r}，应为 {', '.join(MODES)} 之一")
+        return
+
+    script_files[:] = [
+        js for js in script_files
+        if not (hasattr(js, "attributes") and js.attributes.get("kind") in KINDS)
+    ]
+    css_files = context.get("css_files")
+    if isinstance(css_files, list):
+        css_files[:] = [
+            css for css in css_files if str(getattr(css, "filename", css)) != DOKIELI_CSS
+        ]
+    if mode == "off":
+        return
+
+    available = embeds(getattr(app.config, "comments_config", None) or {})
+    kinds = [kind for kind in KINDS if kind in available and kind in present]
+    if not kinds:
+        return
+    body = json.dumps({"mode": mode, "embeds": {kind: available[kind] for kind in kinds}},
+                      ensure_ascii=False)
+    app.add_js_file(None, body=body.replace("</", "<\\/"), type="application/json",
+                    id="mystx-comments-facade")
+    app.add_js_file("js/comments-facade.js", loading_method="defer")
+    context["body"] += facade_html(kinds)
+
+
+def sphinx_setup(app: Sphinx, config: Config) -> None:
+    """启用评论与批注嵌入的点击加载外观。
+
+    Args:
+        app: Sphinx应用实例
+        config: Sphinx配置对象
+    """
+    logger.info("正在配置评论与批注嵌入的点击加载外观")
+    # 需在 sphinx-comments 添加脚本之后执行
+    app.connect("html-page-context", html_page_context_handler, priority=520)
@@ -15,6 +15,19 @@ from sphinx.util import logging
 from sphinx.config import Config
 from sphinx.errors import ExtensionError
 from .version_switcher import sphinx_setup as version_switcher_setup
+from .font_subset import sphinx_setup as font_subset_setup
+from .service_worker import sphinx_setup as service_worker_setup
+from .search_shards import sphinx_setup as search_shards_setup
+from .search_zh import sphinx_setup as search_zh_setup
+from .nav_cache import sphinx_setup as nav_cache_setup
+from .build_timing import sphinx_setup as build_timing_setup, timed
+from .build_profile import sphinx_setup as build_profile_setup
+from .build_memory import sphinx_setup as build_memory_setup
+from .nb_preexecute import sphinx_setup as nb_preexecute_setup
+from .nb_outputs import sphinx_setup as nb_outputs_setup
+from .asset_gating import sphinx_setup as asset_gating_setup
+from .thebe_session import sphinx_setup as thebe_session_setup
+from .comments_facade import sphinx_setup as comments_facade_setup
 
 # 获取Sphinx日志记录器
 logger = logging.getLogger(__name__)
@@ -122,7 +135,12 @@ def thebe_setup(app: Sphinx, config: Config) -> None:
     else:
         logger.debug("sphinx_thebe扩展已存在，无需重复设置")
 
+    # 跨页面复用 Thebe 服务器与内核
+    if getattr(config, "mystx_thebe_session", False):
+        thebe_session_setup(app, config)
 
+
+@timed("config_inited_handler")
 def config_inited_handler(app: Sphinx, config: Config) -> None:
     """config-inited 事件处理器
     
@@ -149,6 +167,9 @@ def config_inited_handler(app: Sphinx, config: Config) -> None:
         
         # 设置Thebe功能开关
         app.add_config_value("use_thebe", False, "html")  # 默认禁用
+        app.add_config_value("mystx_thebe_session", False, "html")  # 跨页面复用 Thebe 会话，默认禁用
+        app.add_config_value("mystx_thebe_prewarm", "intent", "html")  # 预热时机：intent、load 或 off
+        app.add_config_value("mystx_thebe_session_max_age", 3600, "html")  # 会话在浏览器中的保存时间（秒）
         use_thebe = getattr(config, "use_thebe", False)  # 默认禁用
         if use_thebe:
             # 配置Thebe功能
@@ -165,6 +186,119 @@ def config_inited_handler(app: Sphinx, config: Config) -> None:
             event_logger.debug("版本切换器已配置")
         else:
             event_logger.debug("版本切换器已禁用")
+
+        # 设置字体子集化
+        app.add_config_value("mystx_font_subset", False, "html")  # 默认禁用
+        app.add_config_value("mystx_font_subset_text", "", "html")  # 额外保留的字符
+        if getattr(config, "mystx_font_subset", False):
+            font_subset_setup(app, config)
+            event_logger.debug("字体子集化已开启")
+        else:
+            event_logger.debug("字体子集化已禁用")
+
+        # 设置 Service Worker
+        app.add_config_value("mystx_service_worker", False, "html")  # 默认禁用
+        app.add_config_value("mystx_service_worker_precache_html", False, "html")  # 是否预缓存全部页面
+        app.add_config_value("mystx_service_worker_offline", False, "html")  # 是否启用离线模式
+        app.add_config_value("mystx_service_worker_max_size", 2 * 1024 * 1024, "html")  # 单个文件大小上限
+        if getattr(config, "mystx_service_worker", False):
+            service_worker_setup(app, config)
+            event_logger.debug("Service Worker 已开启")
+        else:
+            event_logger.debug("Service Worker 已禁用")
+
+        # 设置搜索索引分片
+        app.add_config_value("mystx_search_shards", False, "html")  # 默认禁用
+        if getattr(config, "mystx_search_shards", False):
+            search_shards_setup(app, config)
+            event_logger.debug("搜索索引分片已开启")
+        else:
+            event_logger.debug("搜索索引分片已禁用")
+
+        # 设置中文搜索分词缓存
+        app.add_config_value("mystx_zh_search", False, "html")  # 默认禁用
+        if getattr(config, "mystx_zh_search", False):
+            search_zh_setup(app, config)
+            event_logger.debug("中文搜索分词缓存已开启")
+        else:
+            event_logger.debug("中文搜索分词缓存已禁用")
+
+        # 设置侧边栏导航缓存
+        app.add_config_value("mystx_nav_cache", False, "html")  # 默认禁用
+        app.add_config_value("mystx_nav_fragment", False, "html")  # 默认禁用，开启时导航由脚本加载
+        if (getattr(config, "mystx_nav_cache", False)
+                or getattr(config, "mystx_nav_fragment", False)):
+            nav_cache_setup(app, config)
+            event_logger.debug("侧边栏导航缓存已开启")
+        else:
+            event_logger.debug("侧边栏导航缓存已禁用")
+
+        # 设置构建计时
+        app.add_config_value("mystx_build_timing", False, "")  # 默认禁用
+        app.add_config_value("mystx_build_timing_top", 10, "")  # 汇总中列出的条目数
+        if getattr(config, "mystx_build_timing", False):
+            build_timing_setup(app, config)
+            event_logger.debug("构建计时已开启")
+        else:
+            event_logger.debug("构建计时已禁用")
+
+        # 设置构建性能剖析
+        app.add_config_value("mystx_profile", False, "")  # 默认禁用
+        if getattr(config, "mystx_profile", False):
+            build_profile_setup(app, config)
+            event_logger.debug("构建性能剖析已开启")
+        else:
+            event_logger.debug("构建性能剖析已禁用")
+
+        # 设置构建内存报告
+        app.add_config_value("mystx_memory_report", False, "")  # 默认禁用
+        app.add_config_value("mystx_memory_tracemalloc", True, "")  # 是否使用 tracemalloc 记录分配
+        if getattr(config, "mystx_memory_report", False):
+            build_memory_setup(app, config)
+            event_logger.debug("构建内存报告已开启")
+        else:
+            event_logger.debug("构建内存报告已禁用")
+
+        # 设置笔记本预执行
+        app.add_config_value("mystx_nb_preexecute", False, "")  # 默认禁用
+        app.add_config_value("mystx_nb_preexecute_workers", 0, "")  # 进程数，0 表示 CPU 核数
+        app.add_config_value("mystx_nb_preexecute_timeout", 0, "")  # 单个笔记本的执行时间上限（秒），0 表示不限制
+        app.add_config_value("mystx_nb_cache_dir", "", "")  # 共享笔记本缓存目录，默认禁用
+        app.add_config_value("mystx_nb_cache_max_size", 1024 ** 3, "")  # 共享缓存大小上限（字节）
+        app.add_config_value("mystx_nb_cache_lockfiles", [], "")  # 计算环境指纹的依赖锁文件
+        if (getattr(config, "mystx_nb_preexecute", False)
+                or getattr(config, "mystx_nb_cache_dir", "")):
+            nb_preexecute_setup(app, config)
+            event_logger.debug("笔记本预执行或共享缓存已开启")
+        else:
+            event_logger.debug("笔记本预执行与共享缓存已禁用")
+
+        # 设置笔记本大输出外置
+        app.add_config_value("mystx_nb_lazy_outputs", False, "html")  # 默认禁用
+        app.add_config_value("mystx_nb_lazy_outputs_threshold", 256 * 1024, "html")  # 外置的输出大小阈值（字节）
+        if getattr(config, "mystx_nb_lazy_outputs", False):
+            nb_outputs_setup(app, config)
+            event_logger.debug("笔记本大输出外置已开启")
+        else:
+            event_logger.debug("笔记本大输出外置已禁用")
+
+        # 设置按页面裁剪前端资源
+        app.add_config_value("mystx_asset_gating", False, "html")  # 默认禁用
+        app.add_config_value("mystx_asset_gating_always", [], "html")  # 始终加载的功能
+        if getattr(config, "mystx_asset_gating", False):
+            asset_gating_setup(app, config)
+            event_logger.debug("按页面裁剪前端资源已开启")
+        else:
+            event_logger.debug("按页面裁剪前端资源已禁用")
+
+        # 设置评论与批注嵌入的点击加载外观
+        app.add_config_value("mystx_comments_facade", False, "html")  # 默认禁用
+        app.add_config_value("mystx_comments_facade_pages", {}, "html")  # 页面名称模式到加载方式的映射
+        if getattr(config, "mystx_comments_facade", False):
+            comments_facade_setup(app, config)
+            event_logger.debug("评论与批注嵌入外观已开启")
+        else:
+            event_logger.debug("评论与批注嵌入外观已禁用")
     except Exception as e:
         event_logger.error(f"配置系统初始化失败: {e}")
         raise
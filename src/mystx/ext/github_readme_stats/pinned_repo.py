@@ -14,6 +14,7 @@ Example:
 from docutils import nodes
 from docutils.parsers.rst import directives
 from .base import BaseGitHubCardDirective
+from ...build_timing import timed
 
 class GitHubPinnedRepoDirective(BaseGitHubCardDirective):
     """渲染 GitHub 置顶仓库卡片。
@@ -34,6 +35,7 @@ class GitHubPinnedRepoDirective(BaseGitHubCardDirective):
         "link": directives.uri,
     }
 
+    @timed("github-pinned-repo")
     def run(self):
         """根据指令选项构建卡片 URL 并返回 HTML 节点。
 
@@ -4,6 +4,7 @@ GitHubStatsDirective 使用 GitHub Readme Stats 服务生成用户统计卡片
 支持选项 theme、show_icons 与 hide 控制外观与显示内容。
 """
 from .base import BaseGitHubCardDirective
+from ...build_timing import timed
 from docutils.parsers.rst import directives
 
 class GitHubStatsDirective(BaseGitHubCardDirective):
@@ -33,6 +34,7 @@ class GitHubStatsDirective(BaseGitHubCardDirective):
         "hide": directives.unchanged,
     }
 
+    @timed("github-stats")
     def run(self):
         """根据选项构建统计卡片 URL 并返回 HTML 节点。
 
@@ -4,6 +4,7 @@
 支持 ``layout``、``theme`` 与 ``langs_count`` 等选项。
 """
 from .base import BaseGitHubCardDirective
+from ...build_timing import timed
 from docutils.parsers.rst import directives
 
 class GitHubTopLangsDirective(BaseGitHubCardDirective):
@@ -33,6 +34,7 @@ class GitHubTopLangsDirective(BaseGitHubCardDirective):
         "langs_count": directives.positive_int,
     }
 
+    @timed("github-top-langs")
     def run(self):
         """根据选项构建 Top Languages 卡片 URL 并返回 HTML 节点。
 
@@ -27,6 +27,7 @@
 """
 from docutils.parsers.rst import directives
 from .base import BaseGitHubCardDirective
+from ...build_timing import timed
 
 
 class GitHubWakaTimeDirective(BaseGitHubCardDirective):
@@ -45,6 +46,7 @@ class GitHubWakaTimeDirective(BaseGitHubCardDirective):
         "hide_border": directives.flag,
     }
 
+    @timed("github-wakatime")
     def run(self):
         """根据选项构建 WakaTime 卡片 URL 并返回 HTML 节点。"""
         opts = {
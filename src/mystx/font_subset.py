@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+字体子集化模块
+
+该模块在 HTML 构建完成后收集生成页面中实际使用的字符，
+使用 ``fontTools`` 将 ``html_css_files`` 样式表中 ``@font-face`` 引用的字体裁剪为 WOFF2 子集，
+并改写 ``@font-face`` 指向子集文件。子集按字形集合的哈希缓存，字形未变化时直接复用。
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set
+from sphinx.application import Sphinx
+from sphinx.config import Config
+from sphinx.util import logging
+
+# 获取Sphinx日志记录器
+logger = logging.getLogger(__name__)
+
+# 子集字体在输出目录中的位置（相对于 _static）
+SUBSET_DIR = "mystx-fonts"
+# 可被子集化的字体格式
+FONT_SUFFIXES = (".woff2", ".woff", ".ttf", ".otf")
+# 始终保留的字符：可打印 ASCII，覆盖由 JS 动态生成的界面文字
+BASE_TEXT = "".join(chr(c) for c in range(0x20, 0x7F))
+
+FONT_FACE_RE = re.compile(r"@font-face\s*\{[^}]*\}", re.IGNORECASE)
+SRC_RE = re.compile(r"(?<![-\w])src\s*:[^;}]*;?", re.IGNORECASE)
+URL_RE = re.compile(r"url\(\s*(['\"]?)([^'\")]+)\1\s*\)")
+
+
+class _TextCollector(HTMLParser):
+    """收集 HTML 中可见文本的字符（忽略 script 与 style 内容）。"""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.chars: Set[str] = set()
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs) -> None:
+        if tag in ("script", "style"):
+            self._skip += 1
+
+    def handle_endtag(self, tag) -> None:
+        if tag in ("script", "style") and self._skip:
+            self._skip -= 1
+
+    def handle_data(self, data) -> None:
+        if not self._skip:
+            self.chars.update(data)
+
+
+def collect_text(html: str) -> Set[str]:
+    """返回一段 HTML 中可见文本用到的字符集合。
+
+    Args:
+        html: HTML 源码
+
+    Returns:
+        字符集合
+    """
+    parser = _TextCollector()
+    parser.feed(html)
+    parser.close()
+    return parser.chars
+
+
+def glyph_hash(chars: Iterable[str]) -> str:
+    """计算字符集合的稳定哈希，用作子集缓存键。"""
+    text = "".join(sorted(set(chars)))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def rewrite_font_faces(css: str, resolve) -> str:
+    """改写样式表中的 ``@font-face`` 规则。
+
+    对每个 ``@font-face`` 规则，依次尝试 ``src`` 中的 ``url()``，
+    第一个被 ``resolve`` 接受的地址将替换整条 ``src`` 声明。
+
+    Args:
+        css: 样式表内容
+        resolve: 回调函数，接收原始 URL，返回子集字体的 URL；无法处理时返回 None
+
+    Returns:
+        改写后的样式表内容
+    """
+    def replace_face(match: re.Match) -> str:
+        block = match.group(0)
+        src = SRC_RE.search(block)
+        if not src:
+            return block
+        for _, url in URL_RE.findall(src.group(0)):
+            new_url = resolve(url)
+            if new_url:
+                decl = f"src: url('{new_url}') format('woff2');"
+                return block[:src.start()] + decl + block[src.end():]
+        return block
+
+    return FONT_FACE_RE.sub(replace_face, css)
+
+
+@dataclass
+class FontSubsetter:
+    """字体子集化器，负责收集字符、生成子集并改写样式表。
+
+    Attributes:
+        app: Sphinx应用实例
+        outdir: HTML 输出目录
+        cache_dir: 子集字体与字符扫描结果的缓存目录，位于 doctree 目录下，跨增量构建保留
+    """
+    app: Sphinx
+    outdir: Path = field(init=False)
+    cache_dir: Path = field(init=False)
+    _subsets: Dict[Path, Optional[Path]] = field(init=False, default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self.outdir = Path(self.app.outdir)
+        self.cache_dir = Path(self.app.doctreedir) / "mystx" / "fonts"
+
+    def collect_chars(self) -> Set[str]:
+        """扫描输出目录中的全部 HTML 页面，返回用到的字符集合。
+
+        每个页面的扫描结果按修改时间缓存，增量构建时只重新扫描被改写的页面。
+        """
+        index_file = self.cache_dir / "chars.json"
+        try:
+            index = json.loads(index_file.read_text("utf-8"))
+        except (OSError, ValueError):
+            index = {}
+
+        chars = set(BASE_TEXT)
+        chars.update(self.app.config.mystx_font_subset_text)
+        fresh = {}
+        for html_file in self.outdir.rglob("*.html"):
+            key = html_file.relative_to(self.outdir).as_posix()
+            mtime = html_file.stat().st_mtime_ns
+            cached = index.get(key)
+            if cached and cached[0] == mtime:
+                text = cached[1]
+            else:
+                text = "".join(sorted(collect_text(html_file.read_text("utf-8", errors="ignore"))))
+            fresh[key] = [mtime, text]
+            chars.update(text)
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        index_file.write_text(json.dumps(fresh, ensure_ascii=False), "utf-8")
+        return chars
+
+    def subset(self, font: Path, chars: Set[str]) -> Optional[Path]:
+        """生成（或从缓存取出）字体子集，并复制到输出目录。
+
+        Args:
+            font: 原始字体文件
+            chars: 需要保留的字符集合
+
+        Returns:
+            输出目录中子集字体的路径；子集化失败时返回 None
+        """
+        if font in self._subsets:
+            return self._subsets[font]
+
+        font_hash = hashlib.sha256(font.read_bytes()).hexdigest()[:8]
+        key = f"{font_hash}-{glyph_hash(chars)}"
+        cached = self.cache_dir / f"{font.stem}.{key}.woff2"
+        if not cached.exists():
+            try:
+                from fontTools import subset
+            except ImportError:
+                logger.warning("未安装 fontTools，跳过字体子集化")
+                self._subsets[font] = None
+                return None
+            options = subset.Options()
+            options.flavor = "woff2"
+            options.layout_features = ["*"]
+            options.notdef_outline = True
+            try:
+                ttfont = subset.load_font(str(font), options)
+                subsetter = subset.Subsetter(options)
+                subsetter.populate(unicodes=[ord(c) for c in chars])
+                subsetter.subset(ttfont)
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                # 先写入临时文件，避免中断后留下损坏的缓存
+                tmp = cached.with_suffix(".tmp")
+                subset.save_font(ttfont, str(tmp), options)
+                tmp.replace(cached)
+            except Exception as e:
+                logger.warning(f"字体子集化失败 {font}: {e}")
+                self._subsets[font] = None
+                return None
+            # 清理同一字体的旧子集
+            for stale in self.cache_dir.glob(f"{font.stem}.*.woff2"):
+                if stale != cached:
+                    stale.unlink(missing_ok=True)
+            logger.info(f"已生成字体子集 {font.name}: {font.stat().st_size} -> {cached.stat().st_size} 字节")
+
+        target = self.outdir / "_static" / SUBSET_DIR / cached.name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if not target.exists():
+            shutil.copyfile(cached, target)
+        self._subsets[font] = target
+        return target
+
+    def resolve_font(self, css_file: Path, url: str) -> Optional[Path]:
+        """将样式表中的字体 URL 解析为输出目录中的文件。"""
+        url = url.split("?", 1)[0].split("#", 1)[0]
+        if "://" in url or url.startswith("data:"):
+            return None
+        if not url.lower().endswith(FONT_SUFFIXES):
+            return None
+        if url.startswith("/"):
+            path = self.outdir / url.lstrip("/")
+        else:
+            path = css_file.parent / url
+        path = path.resolve()
+        return path if path.is_file() else None
+
+    def run(self) -> None:
+        """执行子集化：收集字符、改写 ``html_css_files`` 中包含 ``@font-face`` 的样式表。"""
+        static = self.outdir / "_static"
+        # 只处理用户通过 html_css_files 引入的样式表；主题自带的图标字体依赖 CSS 中的私有区码位，不能裁剪
+        css_files = []
+        for entry in self.app.config.html_css_files:
+            name = entry[0] if isinstance(entry, tuple) else entry
+            path = static / name
+            if "://" in name or not path.is_file():
+                continue
+            if "@font-face" in path.read_text("utf-8", errors="ignore"):
+                css_files.append(path)
+        if not css_files:
+            return
+
+        chars = self.collect_chars()
+        logger.info(f"字体子集化：站点共使用 {len(chars)} 个字符")
+        for css_file in css_files:
+            def resolve(url: str, css_file: Path = css_file) -> Optional[str]:
+                font = self.resolve_font(css_file, url)
+                if font is None or SUBSET_DIR in font.parts:
+                    return None
+                target = self.subset(font, chars)
+                if target is None:
+                    return None
+                return Path(os.path.relpath(target, css_file.parent)).as_posix()
+
+            css = css_file.read_text("utf-8")
+            new_css = rewrite_font_faces(css, resolve)
+            if new_css != css:
+                css_file.write_text(new_css, "utf-8")
+                logger.debug(f"已改写 {css_file} 中的 @font-face")
+
+        # 删除输出目录中本次未使用的旧子集
+        used = {p for p in self._subsets.values() if p is not None}
+        for old in (static / SUBSET_DIR).glob("*.woff2"):
+            if old not in used:
+                old.unlink(missing_ok=True)
+
+
+def build_finished_handler(app: Sphinx, exception: Optional[Exception]) -> None:
+    """build-finished 事件处理器，仅在 HTML 构建成功时执行子集化。"""
+    if exception is not None or app.builder.format != "html":
+        return
+    FontSubsetter(app).run()
+
+
+def sphinx_setup(app: Sphinx, config: Config) -> None:
+    """启用字体子集化。
+
+    Args:
+        app: Sphinx应用实例
+        config: Sphinx配置对象
+    """
+    logger.info("正在配置字体子集化")
+    app.connect("build-finished", build_finished_handler)
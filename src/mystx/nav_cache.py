@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+侧边栏导航缓存模块
+
+``sbt-sidebar-nav.html`` 通过 pydata-sphinx-theme 的 ``generate_toctree_html`` 为每个页面重新解析全站目录树，
+写入阶段的耗时约与页面数的平方成正比。该模块在每次构建中只渲染一次全站导航，
+得到与页面无关的导航模板；每个页面只需在模板上标记当前页面及其祖先节点（``current``/``active``/``open``），
+并把站内链接改写为相对于该页面的路径。目录树发生变化时缓存自动失效。
+
+启用 ``mystx_nav_fragment`` 后，导航只以带内容哈希的静态片段写出一次，
+页面中仅保留占位元素，由主题脚本 ``nav-fragment.js`` 加载片段（浏览器缓存后复用）并标记当前页面；
+``<noscript>`` 中只保留由缓存模板渲染的顶层导航，供禁用脚本的读者使用。
+"""
+
+import hashlib
+import os
+import posixpath
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from html.parser import HTMLParser
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sphinx.application import Sphinx
+from sphinx.config import Config
+from sphinx.environment import BuildEnvironment
+from sphinx.util import logging
+from sphinx.util.osutil import relative_uri
+
+# 获取Sphinx日志记录器
+logger = logging.getLogger(__name__)
+
+# 模板中站内链接的标记，渲染时替换为相对于当前页面的路径
+ROOT_MARK = "\x00"
+INTERNAL_HREF_RE = re.compile(r'href="(?![a-zA-Z][a-zA-Z0-9+.-]*:|#|/)')
+CLASS_RE = re.compile(r'\sclass="([^"]*)"')
+HREF_RE = re.compile(r'\shref="([^"]*)"')
+
+# 导航片段在输出目录中的位置（相对于 _static）
+FRAGMENT_DIR = "mystx-nav"
+
+# 一次编辑：(起始偏移, 删除长度, 插入文本)
+Edit = Tuple[int, int, str]
+
+
+def _class_edit(offset: int, starttag: str, tag: str, classes: str) -> Edit:
+    """在开始标签的 class 属性末尾追加类名；没有 class 属性时新增。"""
+    match = CLASS_RE.search(starttag)
+    if match:
+        return offset + match.end(1), 0, f" {classes}"
+    return offset + 1 + len(tag), 0, f' class="{classes}"'
+
+
+class _NavParser(HTMLParser):
+    """解析导航模板，为每个站内链接预先计算标记为当前页面所需的编辑。"""
+
+    def __init__(self, html: str) -> None:
+        super().__init__(convert_charrefs=False)
+        self._line_starts = [0] + [m.end() for m in re.finditer("\n", html)]
+        self._stack: List[Tuple[str, int, str]] = []
+        self._li_details: Dict[int, Tuple[int, str]] = {}
+        self._pending: List[Tuple[str, List[Edit], List[int]]] = []
+        self.links: Dict[str, List[Edit]] = {}
+
+    def _offset(self) -> int:
+        line, col = self.getpos()
+        return self._line_starts[line - 1] + col
+
+    def handle_starttag(self, tag, attrs) -> None:
+        offset = self._offset()
+        text = self.get_starttag_text()
+        if tag == "details" and self._stack and self._stack[-1][0] == "li":
+            self._li_details[self._stack[-1][1]] = (offset, text)
+        if tag == "a":
+            self._handle_link(offset, text, dict(attrs))
+        if tag not in ("a", "i", "span", "summary", "input", "label", "p", "br", "img"):
+            self._stack.append((tag, offset, text))
+
+    def handle_endtag(self, tag) -> None:
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i][0] == tag:
+                del self._stack[i:]
+                break
+
+    def _handle_link(self, offset: int, text: str, attrs: Dict[str, Optional[str]]) -> None:
+        href = attrs.get("href") or ""
+        if not href.startswith(ROOT_MARK) or "internal" not in (attrs.get("class") or ""):
+            return
+        target = href[len(ROOT_MARK):].split("#", 1)[0]
+        if target in self.links:
+            return
+        edits: List[Edit] = [_class_edit(offset, text, "a", "current")]
+        match = HREF_RE.search(text)
+        edits.append((offset + match.start(1), len(match.group(1)), "#"))
+        li_offsets = []
+        for tag, tag_offset, tag_text in self._stack:
+            if tag == "li":
+                edits.append(_class_edit(tag_offset, tag_text, tag, "current active"))
+                li_offsets.append(tag_offset)
+            elif tag == "ul":
+                edits.append(_class_edit(tag_offset, tag_text, tag, "current"))
+            elif tag == "details" and " open" not in tag_text:
+                edits.append((tag_offset + len("<details"), 0, ' open="open"'))
+        # 当前页面自身的 <details> 在链接之后才出现，解析结束后再补充
+        self._pending.append((target, edits, li_offsets[-1:]))
+        self.links[target] = edits
+
+    def close(self) -> None:
+        super().close()
+        for target, edits, own_li in self._pending:
+            for li_offset in own_li:
+                details = self._li_details.get(li_offset)
+                if details and " open" not in details[1]:
+                    edits.append((details[0] + len("<details"), 0, ' open="open"'))
+            edits.sort()
+
+
+@dataclass
+class NavTemplate:
+    """与页面无关的导航模板。
+
+    Attributes:
+        html: 导航 HTML，站内链接以 ``ROOT_MARK`` 开头，其后为相对于根文档目录的路径
+        links: 链接目标到“标记为当前页面”所需编辑的映射
+    """
+    html: str
+    links: Dict[str, List[Edit]] = field(default_factory=dict)
+
+    @classmethod
+    def from_html(cls, html: str) -> "NavTemplate":
+        """由根文档视角渲染的导航 HTML 构建模板。"""
+        html = INTERNAL_HREF_RE.sub(f'href="{ROOT_MARK}', html)
+        parser = _NavParser(html)
+        parser.feed(html)
+        parser.close()
+        return cls(html=html, links=parser.links)
+
+    def render(self, target: str, base: str, root_dir: str = "") -> str:
+        """渲染某个页面的导航。
+
+        Args:
+            target: 当前页面相对于根文档目录的地址
+            base: 当前页面的目标地址，站内链接改写为相对于它的路径
+            root_dir: 根文档所在目录的地址（以 ``/`` 结尾，位于顶层时为空）
+
+        Returns:
+            导航 HTML
+        """
+        pieces = []
+        pos = 0
+        for offset, length, text in self.links.get(target, ()):
+            pieces.append(self.html[pos:offset])
+            pieces.append(text)
+            pos = offset + length
+        pieces.append(self.html[pos:])
+        return _rewrite_links("".join(pieces),
+                              lambda path: relative_uri(base, _join_uri(root_dir, path)) or "#")
+
+    def fragment(self, root_dir: str = "") -> str:
+        """生成与页面无关的导航片段，站内链接改写为相对于站点根目录的路径。
+
+        Args:
+            root_dir: 根文档所在目录的地址（以 ``/`` 结尾，位于顶层时为空）
+
+        Returns:
+            导航 HTML 片段
+        """
+        return _rewrite_links(self.html, lambda path: _join_uri(root_dir, path))
+
+
+def _rewrite_links(html: str, rewrite: Callable[[str], str]) -> str:
+    """按 ``rewrite`` 改写模板中带 ``ROOT_MARK`` 的链接，保留锚点。"""
+    parts = html.split(ROOT_MARK)
+    for i in range(1, len(parts)):
+        end = parts[i].index('"')
+        path, sep, anchor = parts[i][:end].partition("#")
+        parts[i] = rewrite(path) + sep + anchor + parts[i][end:]
+    return "".join(parts)
+
+
+def _join_uri(root_dir: str, path: str) -> str:
+    """拼接根文档目录与相对地址，保留末尾的 ``/``。"""
+    if not root_dir:
+        return path
+    uri = posixpath.normpath(root_dir + path)
+    if uri == ".":
+        return ""
+    return uri + "/" if path.endswith("/") or not path else uri
+
+
+def render_sidebar_nav(app: Sphinx, show_nav_level: int, **kwargs: Any) -> str:
+    """以根文档视角渲染完整的侧边栏导航，处理方式与 pydata-sphinx-theme 保持一致。"""
+    from bs4 import BeautifulSoup
+    from pydata_sphinx_theme.toctree import add_collapse_checkboxes
+    from sphinx.environment.adapters.toctree import global_toctree_for_doc
+
+    if kwargs.get("maxdepth") == "":
+        kwargs.pop("maxdepth")
+    toctree = global_toctree_for_doc(
+        app.env, app.config.root_doc, app.builder, tags=app.builder.tags, collapse=False, **kwargs
+    )
+    if toctree is None:
+        return ""
+    soup = BeautifulSoup(app.builder.render_partial(toctree)["fragment"], "html.parser")
+    # 移除指向页面内小节的链接
+    for li in soup.select("li"):
+        link = li.find("a")
+        if link and "#" in link["href"] and link["href"] != "#":
+            li.decompose()
+    for ul in soup("ul", recursive=False):
+        ul.attrs["class"] = [*ul.attrs.get("class", []), "nav", "bd-sidenav"]
+    add_collapse_checkboxes(soup)
+    for ii in range(int(show_nav_level)):
+        for details in soup.select(f"li.toctree-l{ii} > details"):
+            details["open"] = "open"
+    return str(soup)
+
+
+def toctree_digest(env: BuildEnvironment) -> str:
+    """计算全站目录树的摘要，目录结构或标题变化时改变。"""
+    digest = hashlib.sha1()
+    for docname in sorted(env.toctree_includes):
+        digest.update(docname.encode("utf-8"))
+        digest.update("\0".join(env.toctree_includes[docname]).encode("utf-8"))
+    for docname in sorted(env.titles):
+        digest.update(f"{docname}\0{env.titles[docname].astext()}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+@dataclass
+class NavCache:
+    """进程内的导航模板缓存。
+
+    Attributes:
+        digest: 生成缓存时的目录树摘要
+        templates: 渲染参数到导航模板的映射
+        fragments: 渲染参数到已写出的导航片段文件名的映射
+    """
+    digest: str = ""
+    templates: Dict[Tuple, NavTemplate] = field(default_factory=dict)
+    fragments: Dict[Tuple, str] = field(default_factory=dict)
+
+    def get(self, app: Sphinx, show_nav_level: int, **kwargs: Any) -> NavTemplate:
+        digest = app.env.mystx_toctree_digest if hasattr(app.env, "mystx_toctree_digest") else ""
+        if digest != self.digest:
+            self.digest = digest
+            self.templates.clear()
+            self.fragments.clear()
+        key = self._key(show_nav_level, **kwargs)
+        template = self.templates.get(key)
+        if template is None:
+            template = NavTemplate.from_html(render_sidebar_nav(app, show_nav_level, **kwargs))
+            self.templates[key] = template
+            logger.debug(f"已渲染全站导航模板，共 {len(template.links)} 个链接")
+        return template
+
+    def fragment(self, app: Sphinx, root_dir: str, show_nav_level: int, **kwargs: Any) -> str:
+        """写出导航片段（内容不变时复用已有文件），返回其相对于 ``_static`` 的路径。"""
+        template = self.get(app, show_nav_level, **kwargs)
+        key = self._key(show_nav_level, **kwargs)
+        name = self.fragments.get(key)
+        if name is None:
+            html = template.fragment(root_dir)
+            digest = hashlib.sha256(html.encode("utf-8")).hexdigest()[:12]
+            name = f"{FRAGMENT_DIR}/nav.{digest}.html"
+            path = Path(app.outdir) / "_static" / name
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                # 并行写入时各进程内容相同，先写临时文件再替换
+                tmp = path.with_suffix(f".{os.getpid()}.tmp")
+                tmp.write_text(html, "utf-8")
+                tmp.replace(path)
+                logger.debug(f"已写出导航片段: {name}")
+            self.fragments[key] = name
+        return name
+
+    @staticmethod
+    def _key(show_nav_level: int, **kwargs: Any) -> Tuple:
+        return show_nav_level, tuple(sorted(kwargs.items()))
+
+
+_cache = NavCache()
+
+
+def env_updated_handler(app: Sphinx, env: BuildEnvironment) -> None:
+    """env-updated 事件处理器，记录目录树摘要。"""
+    env.mystx_toctree_digest = toctree_digest(env)
+
+
+def html_page_context_handler(app: Sphinx, pagename: str, templatename: str,
+                              context: Dict[str, Any], doctree) -> None:
+    """html-page-context 事件处理器，用缓存版本包装 ``generate_toctree_html``。
+
+    只接管完整侧边栏（``kind="sidebar"``、``startdepth=0``、不折叠）的渲染，其余调用交给原函数。
+    启用 ``mystx_nav_fragment`` 时输出占位元素，并以顶层导航作为无脚本时的回退。
+    """
+    original = context.get("generate_toctree_html")
+    if original is None:
+        return
+
+    def generate_toctree_html(kind: str, startdepth: int = 1, show_nav_level: int = 1, **kwargs):
+        if (kind != "sidebar" or startdepth != 0 or kwargs.get("collapse")
+                or int(show_nav_level) == 0):
+            return original(kind, startdepth, show_nav_level, **kwargs)
+        kwargs.pop("collapse", None)
+        root_doc = app.config.root_doc
+        root_uri = app.builder.get_target_uri(root_doc)
+        root_dir = root_uri.rsplit("/", 1)[0] + "/" if "/" in root_uri else ""
+        target = app.builder.get_relative_uri(root_doc, pagename)
+        base = app.builder.get_target_uri(pagename)
+        if getattr(app.config, "mystx_nav_fragment", False):
+            name = _cache.fragment(app, root_dir, int(show_nav_level), **kwargs)
+            # 回退导航只含顶层链接，同样由缓存的模板渲染，不为每个页面重新解析目录树
+            top_level = _cache.get(app, 1, **{**kwargs, "maxdepth": 1})
+            fallback = top_level.render(target, base, root_dir)
+            src = context["pathto"](f"_static/{name}", 1)
+            return (f'<div class="mystx-nav-fragment" data-src="{src}"></div>'
+                    f"<noscript>{fallback}</noscript>")
+        template = _cache.get(app, int(show_nav_level), **kwargs)
+        return template.render(target, base, root_dir)
+
+    context["generate_toctree_html"] = generate_toctree_html
+
+
+def sphinx_setup(app: Sphinx, config: Config) -> None:
+    """启用侧边栏导航缓存。
+
+    Args:
+        app: Sphinx应用实例
+        config: Sphinx配置对象
+    """
+    logger.info("正在配置侧边栏导航缓存")
+    if getattr(config, "mystx_nav_fragment", False):
+        app.add_js_file("js/nav-fragment.js", loading_method="defer")
+    app.connect("env-updated", env_updated_handler)
+    # 需在 pydata-sphinx-theme 注册 generate_toctree_html 之后执行
+    app.connect("html-page-context", html_page_context_handler, priority=501)
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共享笔记本执行缓存模块
+
+jupyter-cache 以构建目录为单位保存执行结果，不同分支、版本与 PR 的构建无法复用彼此的结果。
+该模块提供一个按内容寻址的共享缓存：
+
+- 键由规范化后的代码单元格源码、内核名称与执行环境指纹（Python 版本、依赖锁文件或已安装包）计算；
+- 缓存目录可以位于任意共享位置，写入采用原子替换，可供多个构建同时使用；
+- 总大小超过上限时按最近使用时间淘汰。
+
+读取阶段前由 :mod:`mystx.nb_preexecute` 查询：命中的结果合并到当前笔记本后写入 jupyter-cache，
+新执行的结果写回共享缓存。
+"""
+
+import hashlib
+import json
+import os
+import platform
+import sys
+from dataclasses import dataclass
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Iterable, List, Optional
+from sphinx.util import logging
+
+# 获取Sphinx日志记录器
+logger = logging.getLogger(__name__)
+
+# 影响执行结果的单元格标签
+EXECUTION_TAGS = ("raises-exception", "skip-execution")
+
+
+def normalize_source(source: str) -> str:
+    """规范化单元格源码：统一换行符，去掉行尾与首尾空白。"""
+    lines = source.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def environment_fingerprint(lockfiles: Iterable[Path] = ()) -> str:
+    """计算执行环境指纹。
+
+    Args:
+        lockfiles: 依赖锁文件；为空时使用已安装的包及其版本
+
+    Returns:
+        环境指纹（十六进制摘要）
+    """
+    digest = hashlib.sha256()
+    interpreter = f"{platform.python_implementation()} {sys.version_info[:3]} {platform.machine()}"
+    digest.update(f"{interpreter}\n".encode())
+    lockfiles = [Path(path) for path in lockfiles]
+    if lockfiles:
+        for path in sorted(lockfiles):
+            digest.update(path.name.encode("utf-8"))
+            digest.update(path.read_bytes() if path.exists() else b"<missing>")
+    else:
+        packages = sorted(
+            f"{(dist.metadata['Name'] or '').lower()}=={dist.version}"
+            for dist in metadata.distributions()
+        )
+        digest.update("\n".join(packages).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def notebook_key(notebook: Any, fingerprint: str) -> str:
+    """计算笔记本的缓存键，只取决于代码单元格、内核与执行环境。
+
+    Args:
+        notebook: 笔记本
+        fingerprint: 执行环境指纹
+
+    Returns:
+        缓存键
+    """
+    cells = []
+    for cell in notebook.cells:
+        if cell.get("cell_type") != "code":
+            continue
+        tags = sorted(
+            tag for tag in cell.get("metadata", {}).get("tags", []) if tag in EXECUTION_TAGS
+        )
+        cells.append([normalize_source(cell.get("source", "")), tags])
+    kernel = notebook.metadata.get("kernelspec", {}).get("name", "")
+    data = json.dumps({"kernel": kernel, "cells": cells, "environment": fingerprint},
+                      sort_keys=True)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def merge_outputs(notebook: Any, executed: Any) -> Any:
+    """把已执行笔记本中代码单元格的输出合并到当前笔记本（按代码单元格顺序对应）。
+
+    Args:
+        notebook: 当前笔记本，原地修改
+        executed: 缓存中已执行的笔记本
+
+    Returns:
+        合并后的笔记本
+    """
+    sources = [cell for cell in executed.cells if cell.get("cell_type") == "code"]
+    targets = [cell for cell in notebook.cells if cell.get("cell_type") == "code"]
+    for target, source in zip(targets, sources):
+        target["outputs"] = source.get("outputs", [])
+        target["execution_count"] = source.get("execution_count")
+    if "language_info" in executed.metadata:
+        notebook.metadata["language_info"] = executed.metadata["language_info"]
+    return notebook
+
+
+@dataclass
+class NotebookStore:
+    """按内容寻址的共享笔记本缓存。
+
+    Attributes:
+        path: 缓存目录
+        max_size: 缓存总大小上限（字节），为 0 时不淘汰
+        fingerprint: 执行环境指纹
+    """
+    path: Path
+    max_size: int = 0
+    fingerprint: str = ""
+
+    def _file(self, key: str) -> Path:
+        return self.path / key[:2] / f"{key}.ipynb"
+
+    def get(self, notebook: Any) -> Optional[Any]:
+        """查找与笔记本对应的执行结果，命中时更新其最近使用时间。"""
+        import nbformat
+
+        path = self._file(notebook_key(notebook, self.fingerprint))
+        try:
+            executed = nbformat.reads(path.read_text("utf-8"), as_version=4)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return executed
+
+    def put(self, notebook: Any, executed: Any) -> None:
+        """保存笔记本的执行结果。
+
+        Args:
+            notebook: 执行前的笔记本，用于计算缓存键
+            executed: 执行后的笔记本
+        """
+        import nbformat
+
+        path = self._file(notebook_key(notebook, self.fingerprint))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(nbformat.writes(executed), "utf-8")
+        tmp.replace(path)
+
+    def evict(self) -> List[Path]:
+        """淘汰最久未使用的条目，直到总大小不超过上限。
+
+        Returns:
+            被删除的文件
+        """
+        if not self.max_size:
+            return []
+        entries = []
+        for path in self.path.glob("*/*.ipynb"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        removed = []
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed.append(path)
+        if removed:
+            logger.info(f"共享笔记本缓存已淘汰 {len(removed)} 个条目")
+        return removed
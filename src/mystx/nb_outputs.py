@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+笔记本大输出外置模块
+
+myst-nb 会把 Plotly 图表的完整 JSON、ipywidgets 状态等输出直接内联到页面 HTML 中，页面体积可达数十 MB。
+启用 ``mystx_nb_lazy_outputs`` 后：
+
+- 超过阈值的 HTML 输出写入 ``_static/mystx-outputs`` 下按内容哈希命名的文件（跨页面去重），
+  页面中只保留占位元素；同一输出若还有静态图片版本（如 ``image/png``），作为占位预览；
+- 超过阈值的 ipywidgets 状态同样写入外部 JSON 文件，ipywidgets 脚本推迟到部件可见时再加载；
+- 主题脚本 ``lazy-outputs.js`` 在占位元素滚动到可视区域附近时加载内容并执行其中的脚本。
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from docutils import nodes
+from sphinx.application import Sphinx
+from sphinx.config import Config
+from sphinx.transforms.post_transforms import SphinxPostTransform
+from sphinx.util import logging
+
+# 获取Sphinx日志记录器
+logger = logging.getLogger(__name__)
+
+# 外置输出在输出目录中的位置（相对于 _static）
+OUTPUT_DIR = "mystx-outputs"
+WIDGET_STATE_MIMETYPE = "application/vnd.jupyter.widget-state+json"
+PREVIEW_MIMETYPES = ("image/png", "image/jpeg", "image/svg+xml", "image/gif")
+
+
+def write_asset(outdir: Path, content: str, suffix: str) -> str:
+    """以内容哈希为文件名写出外置输出，内容相同的输出只写一次。
+
+    Args:
+        outdir: 构建输出目录
+        content: 文件内容
+        suffix: 文件扩展名（含 ``.``）
+
+    Returns:
+        相对于输出目录的路径
+    """
+    data = content.encode("utf-8")
+    name = f"_static/{OUTPUT_DIR}/{hashlib.sha256(data).hexdigest()[:16]}{suffix}"
+    path = outdir / name
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # 并行写入时各进程内容相同，先写临时文件再替换
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        tmp.replace(path)
+    return name
+
+
+def _format_size(size: int) -> str:
+    return f"{size / 1024 / 1024:.1f} MB" if size >= 1024 * 1024 else f"{size / 1024:.0f} KB"
+
+
+def lazy_placeholder(src: str, size: int, preview: List[nodes.Node]) -> List[nodes.Node]:
+    """生成外置输出的占位节点。
+
+    Args:
+        src: 外置文件相对于站点根目录的路径
+        size: 原始输出的字节数
+        preview: 预览节点（通常为图片），可为空
+
+    Returns:
+        替换原输出的节点列表
+    """
+    label = f"加载输出（{_format_size(size)}）"
+    result: List[nodes.Node] = [nodes.raw(
+        "", f'<div class="mystx-lazy-output" data-src="{src}" data-size="{size}">', format="html"
+    )]
+    result.extend(preview)
+    button = f'<button type="button" class="mystx-lazy-output-load">{label}</button></div>'
+    result.append(nodes.raw("", button, format="html"))
+    return result
+
+
+class ExternalizeOutputs(SphinxPostTransform):
+    """把 myst-nb 输出中过大的 HTML 渲染外置。
+
+    需在 myst-nb 的 ``SelectMimeType``（优先级 4）之前执行，此时同一输出的各种 MIME 渲染仍然并列，
+    可以从中取得静态图片作为预览。
+    """
+
+    default_priority = 3
+    formats = ("html",)
+
+    def run(self, **kwargs: Any) -> None:
+        threshold = self.config.mystx_nb_lazy_outputs_threshold
+        outdir = Path(self.app.outdir)
+
+        def condition(node: nodes.Node) -> bool:
+            return isinstance(node, nodes.container) and node.get("nb_element") == "mime_bundle"
+
+        for bundle in list(self.document.findall(condition)):
+            children = {child.get("mime_type"): child for child in bundle.children}
+            html = children.get("text/html")
+            if html is None:
+                continue
+            content = "".join(
+                raw.astext() for raw in html.findall(nodes.raw) if raw.get("format") == "html"
+            )
+            size = len(content.encode("utf-8"))
+            if size < threshold:
+                continue
+            src = write_asset(outdir, content, ".html")
+            preview: List[nodes.Node] = []
+            for mime_type in PREVIEW_MIMETYPES:
+                if mime_type in children:
+                    preview = [child.deepcopy() for child in children[mime_type].children]
+                    break
+            html.children = []
+            html.extend(lazy_placeholder(src, size, preview))
+            logger.debug(f"已外置 {_format_size(size)} 的输出: {src}", location=bundle)
+
+
+def html_page_context_handler(app: Sphinx, pagename: str, templatename: str,
+                              context: Dict[str, Any], doctree) -> None:
+    """html-page-context 事件处理器，外置过大的 ipywidgets 状态并推迟加载 ipywidgets 脚本。"""
+    script_files = context.get("script_files")
+    if not script_files:
+        return
+    state = next(
+        (js for js in script_files if js.attributes.get("type") == WIDGET_STATE_MIMETYPE), None
+    )
+    threshold = app.config.mystx_nb_lazy_outputs_threshold
+    if state is None or len(state.attributes.get("body", "")) < threshold:
+        return
+    nb_config = getattr(app.env, "mystnb_config", None)
+    widget_js = dict(nb_config.ipywidgets_js) if nb_config is not None else {}
+    deferred: List[List[Any]] = [
+        [js.filename, js.attributes] for js in script_files if js.filename in widget_js
+    ]
+    script_files[:] = [
+        js for js in script_files if js is not state and js.filename not in widget_js
+    ]
+    loader = {
+        "state": write_asset(Path(app.outdir), state.attributes["body"], ".json"),
+        "scripts": deferred,
+    }
+    # 避免 JSON 中的 </script> 提前结束标签
+    body = json.dumps(loader).replace("</", "<\\/")
+    app.add_js_file(None, body=body, type="application/json", id="mystx-widget-loader")
+
+
+def sphinx_setup(app: Sphinx, config: Config) -> None:
+    """启用笔记本大输出外置。
+
+    Args:
+        app: Sphinx应用实例
+        config: Sphinx配置对象
+    """
+    logger.info("正在配置笔记本大输出外置")
+    app.add_post_transform(ExternalizeOutputs)
+    app.add_js_file("js/lazy-outputs.js", loading_method="defer")
+    # 需在 myst-nb 添加 ipywidgets 脚本之后执行
+    app.connect("html-page-context", html_page_context_handler, priority=510)
@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+笔记本预执行模块
+
+myst-nb 在读取每个文档时才执行笔记本，读取阶段中笔记本只能逐个执行。
+该模块在读取阶段开始前（``env-before-read-docs``）找出所有需要执行且尚未缓存的笔记本，
+以有限的并发数在独立的工作进程中并行执行，并把结果写入 myst-nb ``cache`` 执行模式使用的 jupyter-cache；
+随后的读取阶段直接使用缓存结果。
+
+- 笔记本的读取方式、内核别名、笔记本级配置与排除规则均与 myst-nb 保持一致；
+- 每个笔记本的总执行时间（包括内核启动）受 ``mystx_nb_preexecute_timeout`` 限制，
+  到期时由主进程结束其工作进程；单元格超时仍遵循 ``nb_execution_timeout``；
+- 执行出错或超时的笔记本不写入 jupyter-cache，在预执行时报告错误，本次构建的读取阶段不再执行它们
+  （按 myst-nb 的排除规则以未执行的形式渲染）；文档下次被读取时重新预执行。
+  设置 ``nb_execution_raise_on_error`` 时在第一个失败处中止构建。
+
+配置 ``mystx_nb_cache_dir`` 后，执行前先查询 :mod:`mystx.nb_cache` 的共享缓存，新的执行结果也会写回共享缓存。
+"""
+
+import copy
+import glob
+import multiprocessing
+import os
+import re
+import time
+import traceback
+from contextlib import nullcontext, suppress
+from dataclasses import dataclass
+from multiprocessing.connection import Connection, wait
+from pathlib import Path, PurePosixPath
+from tempfile import TemporaryDirectory
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from sphinx.application import Sphinx
+from sphinx.config import Config
+from sphinx.environment import BuildEnvironment
+from sphinx.errors import ExtensionError
+from sphinx.util import logging
+from sphinx.util.display import status_iterator
+from .nb_cache import NotebookStore, environment_fingerprint, merge_outputs
+
+# 获取Sphinx日志记录器
+logger = logging.getLogger(__name__)
+
+# 超时的工作进程收到 SIGTERM 后（nbclient 借此关闭内核）等待退出的时间（秒），之后强制结束
+STOP_GRACE = 5
+
+
+@dataclass
+class NotebookJob:
+    """一个待执行的笔记本。
+
+    Attributes:
+        docname: 文档名
+        path: 源文件路径
+        notebook: 由 myst-nb 读取器得到的笔记本
+        read_fmt: jupyter-cache 读取源文件所需的格式信息
+        cell_timeout: 单元格超时（秒），为 None 时不限制
+        allow_errors: 是否允许单元格出错
+        raise_on_error: 执行出错时是否中止构建
+        in_temp: 是否在临时目录中执行
+    """
+    docname: str
+    path: Path
+    notebook: Any
+    read_fmt: Optional[Dict[str, Any]]
+    cell_timeout: Optional[int]
+    allow_errors: bool
+    raise_on_error: bool
+    in_temp: bool
+
+
+def execute_notebook(nb_json: str, cwd: Optional[str], in_temp: bool, cell_timeout: Optional[int],
+                     allow_errors: bool) -> Dict[str, Any]:
+    """在工作进程中执行笔记本。
+
+    Args:
+        nb_json: 笔记本的 JSON 文本
+        cwd: 执行目录，``in_temp`` 为真时忽略
+        in_temp: 是否在临时目录中执行
+        cell_timeout: 单元格超时（秒）
+        allow_errors: 是否允许单元格出错
+
+    Returns:
+        包含执行后的笔记本（``notebook``）、耗时（``seconds``）、错误名（``error``）与回溯（``traceback``）的字典
+    """
+    import nbformat
+    from jupyter_cache.executors.utils import single_nb_execution
+
+    notebook = nbformat.reads(nb_json, as_version=4)
+    with TemporaryDirectory() if in_temp else nullcontext(cwd) as workdir:
+        result = single_nb_execution(
+            notebook,
+            cwd=os.path.abspath(workdir),
+            timeout=cell_timeout,
+            allow_errors=allow_errors,
+            meta_override=True,
+        )
+    return {
+        "notebook": nbformat.writes(result.nb),
+        "seconds": result.time,
+        "error": result.err.__class__.__name__ if result.err is not None else None,
+        "traceback": result.exc_string,
+    }
+
+
+def collect_jobs(app: Sphinx, env: BuildEnvironment, docnames: List[str]) -> List[NotebookJob]:
+    """找出需要执行且尚未缓存的笔记本。
+
+    Args:
+        app: Sphinx应用实例
+        env: 构建环境
+        docnames: 本次需要读取的文档
+
+    Returns:
+        待执行的笔记本列表
+    """
+    from jupyter_cache import get_cache
+    from myst_nb.core.nb_to_tokens import nb_node_to_dict
+    from myst_nb.core.read import create_nb_reader
+
+    base_config = env.mystnb_config
+    cache = get_cache(base_config.execution_cache_path or ".jupyter_cache")
+    jobs = []
+    for docname in docnames:
+        path = Path(env.doc2path(docname))
+        try:
+            content = path.read_text("utf-8")
+            nb_reader = create_nb_reader(str(path), env.myst_config, base_config, content)
+            if nb_reader is None:
+                continue
+            notebook = nb_reader.read(content)
+        except Exception as e:
+            logger.debug(f"跳过无法读取的笔记本 {docname}: {e}")
+            continue
+
+        # 与 myst-nb 的解析器一致：内核别名与笔记本级配置
+        nb_config = base_config
+        kernel_name = notebook.metadata.get("kernelspec", {}).get("name", None)
+        if kernel_name is not None and nb_config.kernel_rgx_aliases:
+            for rgx, alias in nb_config.kernel_rgx_aliases.items():
+                if re.fullmatch(rgx, kernel_name):
+                    notebook.metadata["kernelspec"]["name"] = alias
+                    break
+        if nb_config.metadata_key in notebook.metadata:
+            overrides = nb_node_to_dict(notebook.metadata[nb_config.metadata_key])
+            overrides.pop("output_folder", None)
+            with suppress(Exception):
+                nb_config = nb_config.copy(**overrides)
+        if nb_config.execution_mode != "cache":
+            continue
+        posix_path = PurePosixPath(path.as_posix())
+        if any(posix_path.match(pattern) for pattern in nb_config.execution_excludepatterns):
+            continue
+        with suppress(KeyError):
+            if cache.match_cache_notebook(notebook) is not None:
+                continue
+        jobs.append(NotebookJob(
+            docname=docname,
+            path=path,
+            notebook=notebook,
+            read_fmt=nb_reader.read_fmt,
+            cell_timeout=nb_config.execution_timeout,
+            allow_errors=nb_config.execution_allow_errors,
+            raise_on_error=nb_config.execution_raise_on_error,
+            in_temp=nb_config.execution_in_temp,
+        ))
+    return jobs
+
+
+def store_result(env: BuildEnvironment, job: NotebookJob, result: Dict[str, Any]) -> None:
+    """把执行结果写入 jupyter-cache，方式与 myst-nb 的 ``cache`` 执行模式一致。
+
+    执行出错的笔记本只在项目条目中记录回溯，不写入缓存。
+    """
+    import nbformat
+    from jupyter_cache import get_cache
+    from jupyter_cache.base import CacheBundleIn
+    from jupyter_cache.cache.db import NbProjectRecord
+
+    cache = get_cache(env.mystnb_config.execution_cache_path or ".jupyter_cache")
+    if job.read_fmt is not None:
+        stage_record = cache.add_nb_to_project(str(job.path), read_data=job.read_fmt)
+    else:
+        stage_record = cache.add_nb_to_project(str(job.path))
+    NbProjectRecord.remove_tracebacks([stage_record.pk], cache.db)
+    if result["error"] is not None:
+        NbProjectRecord.set_traceback(stage_record.uri, result["traceback"], cache.db)
+        return
+    cache.cache_notebook_bundle(
+        CacheBundleIn(
+            nbformat.reads(result["notebook"], as_version=4),
+            stage_record.uri,
+            data={"execution_seconds": result["seconds"]},
+        ),
+        check_validity=False,
+        overwrite=True,
+    )
+
+
+def restore_from_store(env: BuildEnvironment, store: NotebookStore,
+                       jobs: List[NotebookJob]) -> List[NotebookJob]:
+    """从共享缓存恢复笔记本的执行结果并写入 jupyter-cache。
+
+    Returns:
+        共享缓存中没有的笔记本
+    """
+    import nbformat
+
+    remaining = []
+    for job in jobs:
+        executed = store.get(job.notebook)
+        if executed is None:
+            remaining.append(job)
+            continue
+        notebook = merge_outputs(copy.deepcopy(job.notebook), executed)
+        store_result(env, job,
+                     {"notebook": nbformat.writes(notebook), "seconds": None, "error": None})
+        logger.info(f"{job.docname}: 使用共享缓存")
+    return remaining
+
+
+def _worker(sender: Connection, args: Tuple) -> None:
+    """工作进程入口：执行笔记本并把结果发回主进程。"""
+    try:
+        result = execute_notebook(*args)
+    except BaseException as e:
+        result = _failure(e.__class__.__name__, traceback.format_exc())
+    sender.send(result)
+    sender.close()
+
+
+def _failure(error: str, message: str) -> Dict[str, Any]:
+    return {"notebook": None, "seconds": None, "error": error, "traceback": message}
+
+
+def _stop(process: multiprocessing.Process) -> None:
+    """结束工作进程：先发送 SIGTERM 让 nbclient 关闭内核，未及时退出时强制结束。"""
+    process.terminate()
+    process.join(STOP_GRACE)
+    if process.is_alive():
+        process.kill()
+        process.join()
+
+
+def run_jobs(jobs: List[NotebookJob], workers: int,
+             timeout: Optional[float]) -> Iterator[Tuple[NotebookJob, Dict[str, Any]]]:
+    """在最多 ``workers`` 个工作进程中执行笔记本，按完成顺序产生 ``(笔记本, 执行结果)``。
+
+    每个笔记本使用一个新的工作进程，超过 ``timeout`` 秒时由主进程结束该进程，结果记为 ``TimeoutError``。
+    生成器提前关闭时结束所有仍在运行的工作进程。
+    """
+    import nbformat
+
+    # 使用 spawn 启动工作进程，避免继承 Sphinx 进程中的事件循环等状态
+    context = multiprocessing.get_context("spawn")
+    queued = list(reversed(jobs))
+    running: Dict[Connection, Tuple[NotebookJob, Any, Optional[float]]] = {}
+    try:
+        while queued or running:
+            while queued and len(running) < workers:
+                job = queued.pop()
+                receiver, sender = context.Pipe(duplex=False)
+                args = (nbformat.writes(job.notebook), str(job.path.parent), job.in_temp,
+                        job.cell_timeout, job.allow_errors)
+                process = context.Process(target=_worker, args=(sender, args))
+                process.start()
+                sender.close()
+                deadline = time.monotonic() + timeout if timeout else None
+                running[receiver] = (job, process, deadline)
+
+            deadlines = [deadline for _, _, deadline in running.values() if deadline is not None]
+            remaining = max(min(deadlines) - time.monotonic(), 0) if deadlines else None
+            for receiver in wait(list(running), timeout=remaining):
+                job, process, _ = running.pop(receiver)
+                try:
+                    result = receiver.recv()
+                except EOFError:
+                    process.join()
+                    result = _failure("WorkerError", f"工作进程异常退出，退出码 {process.exitcode}")
+                receiver.close()
+                process.join()
+                yield job, result
+
+            now = time.monotonic()
+            for receiver, (job, process, deadline) in list(running.items()):
+                if deadline is not None and now >= deadline:
+                    del running[receiver]
+                    _stop(process)
+                    receiver.close()
+                    yield job, _failure("TimeoutError", f"笔记本执行时间超过 {timeout}s")
+    finally:
+        for receiver, (_, process, _) in running.items():
+            _stop(process)
+            receiver.close()
+
+
+def execute_jobs(app: Sphinx, env: BuildEnvironment, jobs: List[NotebookJob]) -> List[NotebookJob]:
+    """并行执行笔记本，结果写入 jupyter-cache 与共享缓存。
+
+    设置 ``nb_execution_raise_on_error`` 的笔记本出错时结束其余工作进程并抛出 :class:`ExtensionError`。
+
+    Returns:
+        执行出错或超时的笔记本
+    """
+    import nbformat
+
+    workers = app.config.mystx_nb_preexecute_workers or os.cpu_count() or 1
+    workers = min(workers, len(jobs))
+    timeout = app.config.mystx_nb_preexecute_timeout or None
+    logger.info(f"使用 {workers} 个进程预执行 {len(jobs)} 个笔记本")
+
+    started = time.perf_counter()
+    failed = []
+    results = run_jobs(jobs, workers, timeout)
+    try:
+        for job, result in status_iterator(results, "预执行笔记本... ", "darkgreen", len(jobs),
+                                           app.verbosity, lambda item: item[0].docname):
+            store_result(env, job, result)
+            if result["error"] is not None:
+                failed.append(job)
+                message = f"预执行笔记本失败: {result['error']}"
+                if env.mystnb_config.execution_show_tb:
+                    message += f"\n{result['traceback']}"
+                logger.warning(message, location=job.docname)
+                if job.raise_on_error:
+                    raise ExtensionError(f"预执行笔记本失败: {job.path}")
+                continue
+            logger.info(f"{job.docname}: {result['seconds']:.2f}s")
+            if _store is not None:
+                _store.put(job.notebook, nbformat.reads(result["notebook"], as_version=4))
+    finally:
+        results.close()
+    logger.info(f"笔记本预执行完成，共 {time.perf_counter() - started:.2f}s，失败 {len(failed)} 个")
+    return failed
+
+
+def exclude_failed(env: BuildEnvironment, failed: List[NotebookJob]) -> None:
+    """本次构建中不再由 myst-nb 执行预执行失败的笔记本，以未执行的形式渲染。"""
+    patterns = [glob.escape(job.path.as_posix()) for job in failed]
+    _excluded[:] = patterns
+    env.mystnb_config = env.mystnb_config.copy(
+        execution_excludepatterns=[*env.mystnb_config.execution_excludepatterns, *patterns]
+    )
+
+
+# 共享缓存，未配置 mystx_nb_cache_dir 时为 None
+_store: Optional[NotebookStore] = None
+# 未预执行、留给 myst-nb 在读取阶段执行的笔记本，读取结束后写入共享缓存
+_pending: List[NotebookJob] = []
+# 本次构建中加入 myst-nb 排除规则的失败笔记本路径，读取结束后移除
+_excluded: List[str] = []
+
+
+def env_before_read_docs_handler(app: Sphinx, env: BuildEnvironment, docnames: List[str]) -> None:
+    """env-before-read-docs 事件处理器，在读取阶段前从共享缓存恢复或并行执行笔记本。"""
+    if getattr(env, "mystnb_config", None) is None:
+        return
+    if env.mystnb_config.execution_mode != "cache":
+        logger.info("笔记本预执行与共享缓存需要 nb_execution_mode = 'cache'，已跳过")
+        return
+    jobs = collect_jobs(app, env, docnames)
+    if _store is not None:
+        jobs = restore_from_store(env, _store, jobs)
+    if not jobs:
+        return
+    if app.config.mystx_nb_preexecute:
+        failed = execute_jobs(app, env, jobs)
+        if failed:
+            exclude_failed(env, failed)
+    else:
+        _pending[:] = jobs
+
+
+def env_updated_handler(app: Sphinx, env: BuildEnvironment) -> None:
+    """env-updated 事件处理器，移除临时的排除规则，把 myst-nb 在读取阶段执行的结果写入共享缓存，并淘汰旧条目。"""
+    from jupyter_cache import get_cache
+
+    if _excluded:
+        patterns = env.mystnb_config.execution_excludepatterns
+        env.mystnb_config = env.mystnb_config.copy(
+            execution_excludepatterns=[pattern for pattern in patterns if pattern not in _excluded]
+        )
+        _excluded.clear()
+    if _store is None:
+        return
+    if _pending:
+        cache = get_cache(env.mystnb_config.execution_cache_path or ".jupyter_cache")
+        for job in _pending:
+            with suppress(KeyError):
+                record = cache.match_cache_notebook(job.notebook)
+                _store.put(job.notebook, cache.get_cache_bundle(record.pk).nb)
+        _pending.clear()
+    _store.evict()
+
+
+def sphinx_setup(app: Sphinx, config: Config) -> None:
+    """启用笔记本预执行与共享执行缓存。
+
+    Args:
+        app: Sphinx应用实例
+        config: Sphinx配置对象
+    """
+    global _store
+    if getattr(config, "mystx_nb_preexecute", False):
+        logger.info("正在配置笔记本预执行")
+    cache_dir = getattr(config, "mystx_nb_cache_dir", "")
+    if cache_dir:
+        confdir = Path(app.confdir)
+        lockfiles = [confdir / path for path in getattr(config, "mystx_nb_cache_lockfiles", [])]
+        _store = NotebookStore(
+            path=confdir / Path(cache_dir).expanduser(),
+            max_size=getattr(config, "mystx_nb_cache_max_size", 0),
+            fingerprint=environment_fingerprint(lockfiles),
+        )
+        logger.info(f"正在配置共享笔记本缓存: {_store.path}")
+    app.connect("env-before-read-docs", env_before_read_docs_handler)
+    app.connect("env-updated", env_updated_handler)
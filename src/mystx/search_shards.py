@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+搜索索引分片模块
+
+Sphinx 生成的 ``searchindex.js`` 是单个完整索引，页面在首次搜索前必须整体下载并解析。
+该模块在构建结束时按词项首字符把 ``terms`` 与 ``titleterms`` 拆分为若干带内容哈希的分片，
+``searchindex.js`` 只保留文档列表等基础数据与分片清单；
+主题脚本 ``search-shards.js`` 在查询时只加载所需分片并缓存。
+
+完整索引另存于 doctree 目录，下次构建前恢复，以便 Sphinx 的增量构建正常合并索引。
+"""
+
+import hashlib
+import json
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Optional
+from sphinx.application import Sphinx
+from sphinx.config import Config
+from sphinx.search import js_index
+from sphinx.util import logging
+
+# 获取Sphinx日志记录器
+logger = logging.getLogger(__name__)
+
+# 分片在输出目录中的位置（相对于 _static）
+SHARD_DIR = "searchindex"
+# 非 ASCII 字母数字开头的词项按码位取模分桶，需与 search-shards.js 保持一致
+BUCKETS = 32
+ASCII_KEYS = frozenset("abcdefghijklmnopqrstuvwxyz0123456789")
+
+
+def shard_key(term: str) -> str:
+    """返回词项所属分片的键。
+
+    ASCII 字母或数字开头的词项以首字符为键，其余按首字符码位分桶。
+    """
+    first = term[:1]
+    if first in ASCII_KEYS:
+        return first
+    return "u" + format(ord(first) % BUCKETS if first else 0, "x")
+
+
+def split_index(index: Dict[str, Any]) -> tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+    """将完整索引拆分为基础索引和词项分片。
+
+    Args:
+        index: ``Search.setIndex`` 接收的完整索引
+
+    Returns:
+        ``(base, shards)``：``base`` 为去掉词项后的索引，
+        ``shards`` 为分片键到 ``{"terms": ..., "titleterms": ...}`` 的映射
+    """
+    shards: Dict[str, Dict[str, Any]] = {}
+    for field in ("terms", "titleterms"):
+        for term, files in index.get(field, {}).items():
+            shard = shards.setdefault(shard_key(term), {"terms": {}, "titleterms": {}})
+            shard[field][term] = files
+    base = dict(index, terms={}, titleterms={})
+    return base, shards
+
+
+def _full_index_path(app: Sphinx) -> Path:
+    return Path(app.doctreedir) / "mystx" / "searchindex.js"
+
+
+def builder_inited_handler(app: Sphinx) -> None:
+    """builder-inited 事件处理器，恢复上次构建保存的完整索引供 Sphinx 增量加载。"""
+    full = _full_index_path(app)
+    if app.builder.format == "html" and full.exists():
+        shutil.copyfile(full, Path(app.outdir) / app.builder.searchindex_filename)
+
+
+def build_finished_handler(app: Sphinx, exception: Optional[Exception]) -> None:
+    """build-finished 事件处理器，拆分搜索索引并改写 ``searchindex.js``。"""
+    if exception is not None or app.builder.format != "html" or app.builder.indexer is None:
+        return
+    outdir = Path(app.outdir)
+    index_file = outdir / app.builder.searchindex_filename
+    try:
+        index = js_index.loads(index_file.read_text("utf-8"))
+    except (OSError, ValueError) as e:
+        logger.warning(f"无法读取搜索索引，跳过分片: {e}")
+        return
+
+    # 保存完整索引
+    full = _full_index_path(app)
+    full.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(index_file, full)
+
+    base, shards = split_index(index)
+    shard_dir = outdir / "_static" / SHARD_DIR
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {}
+    for key, shard in sorted(shards.items()):
+        data = json.dumps(shard, separators=(",", ":"), sort_keys=True, ensure_ascii=False)
+        digest = hashlib.sha256(data.encode("utf-8")).hexdigest()[:12]
+        name = f"{key}.{digest}.json"
+        target = shard_dir / name
+        if not target.exists():
+            target.write_text(data, "utf-8")
+        manifest[key] = name
+    # 清理旧分片
+    for old in shard_dir.glob("*.json"):
+        if old.name not in manifest.values():
+            old.unlink()
+
+    base["shards"] = manifest
+    index_file.write_text(js_index.dumps(base), "utf-8")
+    logger.info(f"搜索索引已拆分为 {len(manifest)} 个分片")
+
+
+def sphinx_setup(app: Sphinx, config: Config) -> None:
+    """启用搜索索引分片。
+
+    Args:
+        app: Sphinx应用实例
+        config: Sphinx配置对象
+    """
+    logger.info("正在配置搜索索引分片")
+    app.add_js_file("js/search-shards.js", loading_method="defer")
+    app.connect("builder-inited", builder_inited_handler)
+    # 先于 Service Worker 等依赖输出文件的处理器执行
+    app.connect("build-finished", build_finished_handler, priority=400)
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+中文搜索分词缓存模块
+
+Sphinx 的中文搜索语言在每次写入阶段都会对所有文本重新分词，未安装 jieba 时中文内容不会进入索引。
+该模块提供带缓存的中文搜索语言 :class:`SearchChineseCached`：
+
+- 分词在 ``doctree-read`` 阶段完成，使用 ``-j`` 并行构建时分布在各个读取进程中；
+- 分词结果按文档内容哈希缓存在 doctree 目录，增量构建时未变化的文档不会重新分词；
+- 写入阶段建立搜索索引时直接查表；
+- 未安装 jieba 时回退为“整段 + 二元组”切分，仍可通过部分匹配检索中文。
+"""
+
+import hashlib
+import pickle
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from docutils import nodes
+from sphinx.application import Sphinx
+from sphinx.config import Config
+from sphinx.environment import BuildEnvironment
+from sphinx.search.zh import SearchChinese, cut_for_search, JIEBA_DEFAULT_DICT
+from sphinx.util import logging
+
+# 获取Sphinx日志记录器
+logger = logging.getLogger(__name__)
+
+try:
+    import jieba
+except ImportError:
+    jieba = None
+
+# 分词结果：(词列表, 末尾拉丁词的数量)
+Segments = Tuple[Tuple[str, ...], int]
+
+CJK_RUN_RE = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+
+
+def _fallback_cut(text: str) -> List[str]:
+    """未安装 jieba 时的切分：保留完整的汉字串，并补充二元组。"""
+    words = []
+    for run in CJK_RUN_RE.findall(text):
+        words.append(run)
+        if len(run) > 2:
+            words.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return words
+
+
+def segment(text: str) -> Segments:
+    """对一段文本分词，结果与 :meth:`SearchChinese.split` 保持一致。
+
+    Args:
+        text: 待分词的文本
+
+    Returns:
+        ``(words, n_latin)``，``words`` 末尾的 ``n_latin`` 个词为拉丁字母词
+    """
+    chinese = list(cut_for_search(text)) if jieba is not None else _fallback_cut(text)
+    latin1 = [term.strip() for term in SearchChinese.latin1_letters.findall(text)]
+    return tuple(chinese + latin1), len(latin1)
+
+
+def collect_chunks(doctree: nodes.document) -> List[str]:
+    """按搜索索引的方式收集文档中需要分词的文本片段。"""
+    chunks = [node.astext() for node in doctree.findall(nodes.Text)]
+    chunks.extend(node.astext() for node in doctree.findall(nodes.title))
+    return chunks
+
+
+class SearchChineseCached(SearchChinese):
+    """优先使用预先分词结果的中文搜索语言。"""
+
+    #: 当前文档的分词表，在 ``doctree-resolved`` 时设置
+    current: Dict[str, Segments] = {}
+
+    def split(self, input: str) -> List[str]:
+        result = self.current.get(input)
+        if result is None:
+            result = segment(input)
+        words, n_latin = result
+        if n_latin:
+            self.latin_terms.update(words[-n_latin:])
+        return list(words)
+
+
+@dataclass
+class SegmentCache:
+    """按文档保存的分词缓存。
+
+    Attributes:
+        path: 缓存文件路径
+        docs: 文档名到 ``(内容哈希, {文本片段: 分词结果})`` 的映射
+    """
+    path: Path
+    docs: Dict[str, Tuple[str, Dict[str, Segments]]] = field(default_factory=dict)
+
+    def load(self) -> None:
+        try:
+            with open(self.path, "rb") as f:
+                self.docs = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            self.docs = {}
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(self.docs, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp.replace(self.path)
+
+    def segment_doc(self, docname: str,
+                    chunks: List[str]) -> Optional[Tuple[str, Dict[str, Segments]]]:
+        """为文档分词；内容哈希未变化时返回 None。"""
+        digest = hashlib.sha1("\0".join(chunks).encode("utf-8")).hexdigest()
+        old_digest, old_table = self.docs.get(docname, ("", {}))
+        if digest == old_digest:
+            return None
+        table = {}
+        for chunk in chunks:
+            if chunk not in table:
+                table[chunk] = old_table.get(chunk) or segment(chunk)
+        return digest, table
+
+
+_cache: Optional[SegmentCache] = None
+
+
+def builder_inited_handler(app: Sphinx) -> None:
+    """builder-inited 事件处理器，加载分词缓存并在分叉读取进程前初始化 jieba 词典。"""
+    global _cache
+    if app.builder.format != "html":
+        return
+    _cache = SegmentCache(Path(app.doctreedir) / "mystx" / "zh-segments.pickle")
+    _cache.load()
+    if jieba is not None:
+        dict_path = app.config.html_search_options.get("dict", JIEBA_DEFAULT_DICT)
+        if dict_path and Path(dict_path).is_file():
+            jieba.load_userdict(str(dict_path))
+        jieba.initialize()
+
+
+def doctree_read_handler(app: Sphinx, doctree: nodes.document) -> None:
+    """doctree-read 事件处理器，对新读取的文档分词（并行读取时在工作进程中执行）。"""
+    if _cache is None:
+        return
+    env = app.env
+    result = _cache.segment_doc(env.docname, collect_chunks(doctree))
+    if result is not None:
+        if not hasattr(env, "mystx_zh_segments"):
+            env.mystx_zh_segments = {}
+        env.mystx_zh_segments[env.docname] = result
+
+
+def env_merge_info_handler(app: Sphinx, env: BuildEnvironment, docnames,
+                           other: BuildEnvironment) -> None:
+    """env-merge-info 事件处理器，合并并行读取进程的分词结果。"""
+    if hasattr(other, "mystx_zh_segments"):
+        if not hasattr(env, "mystx_zh_segments"):
+            env.mystx_zh_segments = {}
+        env.mystx_zh_segments.update(other.mystx_zh_segments)
+
+
+def env_updated_handler(app: Sphinx, env: BuildEnvironment) -> None:
+    """env-updated 事件处理器，将新分词结果并入缓存，并移除已删除文档的条目。"""
+    if _cache is None:
+        return
+    _cache.docs.update(getattr(env, "mystx_zh_segments", {}))
+    if hasattr(env, "mystx_zh_segments"):
+        # 分词结果只保存在缓存文件中，不写入 environment.pickle
+        del env.mystx_zh_segments
+    for docname in set(_cache.docs) - env.found_docs:
+        del _cache.docs[docname]
+
+
+def doctree_resolved_handler(app: Sphinx, doctree: nodes.document, docname: str) -> None:
+    """doctree-resolved 事件处理器，切换到当前文档的分词表，供随后的索引使用。"""
+    if _cache is not None:
+        SearchChineseCached.current = _cache.docs.get(docname, ("", {}))[1]
+
+
+def build_finished_handler(app: Sphinx, exception: Optional[Exception]) -> None:
+    """build-finished 事件处理器，保存分词缓存。"""
+    if _cache is not None and exception is None:
+        SearchChineseCached.current = {}
+        _cache.save()
+
+
+def sphinx_setup(app: Sphinx, config: Config) -> None:
+    """启用带缓存的中文搜索分词。
+
+    Args:
+        app: Sphinx应用实例
+        config: Sphinx配置对象
+    """
+    logger.info("正在配置中文搜索分词缓存")
+    if jieba is None:
+        logger.info("未安装 jieba，中文搜索将使用二元组切分")
+    app.add_search_language(SearchChineseCached)
+    app.connect("builder-inited", builder_inited_handler)
+    app.connect("doctree-read", doctree_read_handler)
+    app.connect("env-merge-info", env_merge_info_handler)
+    app.connect("env-updated", env_updated_handler)
+    app.connect("doctree-resolved", doctree_resolved_handler)
+    app.connect("build-finished", build_finished_handler)
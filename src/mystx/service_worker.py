@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Service Worker 模块
+
+该模块在 HTML 构建完成后生成带内容哈希的预缓存清单 ``precache-manifest.json``，
+并在输出目录根部写出 Service Worker ``mystx-sw.js``。
+浏览器在重新部署后只会重新下载哈希发生变化的条目，并可选地支持离线阅读。
+"""
+
+import hashlib
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from sphinx.application import Sphinx
+from sphinx.config import Config
+from sphinx.util import logging
+
+# 获取Sphinx日志记录器
+logger = logging.getLogger(__name__)
+
+SW_FILENAME = "mystx-sw.js"
+MANIFEST_FILENAME = "precache-manifest.json"
+SW_TEMPLATE = Path(__file__).parent / "templates" / "service-worker.js"
+# 除 _static 外始终预缓存的文件
+EXTRA_ENTRIES = ("searchindex.js", "search.html")
+
+
+def file_revision(path: Path) -> str:
+    """返回文件内容的短哈希，作为清单中的版本号。"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+@dataclass
+class PrecacheManifest:
+    """预缓存清单生成器。
+
+    Attributes:
+        outdir: HTML 输出目录
+        include_html: 是否预缓存全部 HTML 页面
+        max_size: 单个文件的大小上限（字节），超过的文件不进入清单
+        entries: 清单条目列表，每项包含 ``url`` 与 ``revision``
+    """
+    outdir: Path
+    include_html: bool = False
+    max_size: int = 2 * 1024 * 1024
+    entries: List[Dict[str, str]] = field(init=False, default_factory=list)
+
+    def _candidates(self):
+        static = self.outdir / "_static"
+        if static.exists():
+            yield from static.rglob("*")
+        for name in EXTRA_ENTRIES:
+            yield self.outdir / name
+        if self.include_html:
+            yield from self.outdir.rglob("*.html")
+
+    def collect(self) -> List[Dict[str, str]]:
+        """收集清单条目，按 URL 排序以保证输出稳定。"""
+        seen = {}
+        for path in self._candidates():
+            if not path.is_file() or path.name.startswith("."):
+                continue
+            rel = path.relative_to(self.outdir).as_posix()
+            if rel in seen or rel.startswith(".doctrees/"):
+                continue
+            if path.stat().st_size > self.max_size:
+                logger.debug(f"文件过大，不进入预缓存清单: {rel}")
+                continue
+            seen[rel] = file_revision(path)
+        self.entries = [{"url": url, "revision": rev} for url, rev in sorted(seen.items())]
+        return self.entries
+
+    @property
+    def version(self) -> str:
+        """清单整体的哈希，任一条目变化都会改变该值。"""
+        text = json.dumps(self.entries, sort_keys=True)
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"version": self.version, "entries": self.entries}
+
+
+def render_service_worker(version: str, offline: bool) -> str:
+    """根据模板渲染 Service Worker 源码。
+
+    Args:
+        version: 预缓存清单版本；版本变化会使浏览器安装新的 Service Worker
+        offline: 是否启用离线模式
+
+    Returns:
+        Service Worker 的 JavaScript 源码
+    """
+    source = SW_TEMPLATE.read_text("utf-8")
+    return (source
+            .replace("__MYSTX_MANIFEST__", json.dumps(MANIFEST_FILENAME))
+            .replace("__MYSTX_VERSION__", json.dumps(version))
+            .replace("__MYSTX_OFFLINE__", json.dumps(offline)))
+
+
+def build_finished_handler(app: Sphinx, exception: Optional[Exception]) -> None:
+    """build-finished 事件处理器，写出预缓存清单和 Service Worker。"""
+    if exception is not None or app.builder.format != "html":
+        return
+    config = app.config
+    outdir = Path(app.outdir)
+    manifest = PrecacheManifest(
+        outdir=outdir,
+        include_html=config.mystx_service_worker_precache_html,
+        max_size=config.mystx_service_worker_max_size,
+    )
+    manifest.collect()
+    (outdir / MANIFEST_FILENAME).write_text(json.dumps(manifest.as_dict(), indent=1), "utf-8")
+    source = render_service_worker(manifest.version, config.mystx_service_worker_offline)
+    (outdir / SW_FILENAME).write_text(source, "utf-8")
+    logger.info(f"已生成 Service Worker，预缓存 {len(manifest.entries)} 个文件（版本 {manifest.version}）")
+
+
+def sphinx_setup(app: Sphinx, config: Config) -> None:
+    """启用 Service Worker 与预缓存清单。
+
+    Args:
+        app: Sphinx应用实例
+        config: Sphinx配置对象
+    """
+    logger.info("正在配置 Service Worker")
+    app.add_js_file("js/sw-register.js", loading_method="defer")
+    app.connect("build-finished", build_finished_handler)
@@ -0,0 +1,112 @@
+/**
+ * mystx Service Worker
+ *
+ * 由 mystx.service_worker 在构建结束时生成，请勿手动修改。
+ * - 安装时读取预缓存清单，只下载版本号发生变化的条目；
+ * - 预缓存条目采用缓存优先策略；
+ * - 页面导航优先使用预缓存的页面，其余走网络；离线模式下回退到访问过的页面。
+ */
+const MANIFEST = __MYSTX_MANIFEST__;
+const VERSION = __MYSTX_VERSION__;
+const OFFLINE = __MYSTX_OFFLINE__;
+
+const PRECACHE = 'mystx-precache';
+const RUNTIME = 'mystx-runtime';
+const REVISIONS = '__mystx_revisions__';
+
+function absolute(url) {
+    return new URL(url, self.registration.scope).href;
+}
+
+async function readRevisions(cache) {
+    const response = await cache.match(REVISIONS);
+    return response ? response.json() : {};
+}
+
+self.addEventListener('install', (event) => {
+    event.waitUntil((async () => {
+        const response = await fetch(`${MANIFEST}?v=${VERSION}`, { cache: 'no-store' });
+        const manifest = await response.json();
+        const cache = await caches.open(PRECACHE);
+        const previous = await readRevisions(cache);
+        const revisions = {};
+        const changed = [];
+        for (const entry of manifest.entries) {
+            const url = absolute(entry.url);
+            revisions[url] = entry.revision;
+            if (previous[url] !== entry.revision || !(await cache.match(url))) {
+                changed.push(url);
+            }
+        }
+        // 只下载变化的条目；cache: 'reload' 绕过 HTTP 缓存，保证拿到新版本
+        await Promise.all(changed.map(async (url) => {
+            const fresh = await fetch(new Request(url, { cache: 'reload' }));
+            if (fresh.ok) {
+                await cache.put(url, fresh);
+            }
+        }));
+        await cache.put(REVISIONS, new Response(JSON.stringify(revisions), {
+            headers: { 'Content-Type': 'application/json' },
+        }));
+        await self.skipWaiting();
+    })());
+});
+
+self.addEventListener('activate', (event) => {
+    event.waitUntil((async () => {
+        // 删除已不在清单中的条目
+        const cache = await caches.open(PRECACHE);
+        const revisions = await readRevisions(cache);
+        for (const request of await cache.keys()) {
+            if (!request.url.endsWith(REVISIONS) && !(request.url in revisions)) {
+                await cache.delete(request);
+            }
+        }
+        await self.clients.claim();
+    })());
+});
+
+async function matchPrecache(url) {
+    const cache = await caches.open(PRECACHE);
+    const hit = await cache.match(url);
+    if (hit || !url.endsWith('/')) {
+        return hit;
+    }
+    // dirhtml 构建器的页面地址以 / 结尾
+    return cache.match(url + 'index.html');
+}
+
+async function handleNavigation(request) {
+    // 已预缓存的页面由清单保证版本一致，可直接返回
+    const precached = await matchPrecache(request.url.split('#')[0].split('?')[0]);
+    if (precached) {
+        return precached;
+    }
+    try {
+        const response = await fetch(request);
+        if (OFFLINE && response.ok) {
+            const runtime = await caches.open(RUNTIME);
+            await runtime.put(request, response.clone());
+        }
+        return response;
+    } catch (error) {
+        const cached = OFFLINE && (await caches.match(request));
+        if (cached) {
+            return cached;
+        }
+        throw error;
+    }
+}
+
+self.addEventListener('fetch', (event) => {
+    const request = event.request;
+    if (request.method !== 'GET' || !request.url.startsWith(self.registration.scope)) {
+        return;
+    }
+    if (request.mode === 'navigate') {
+        event.respondWith(handleNavigation(request));
+        return;
+    }
+    const url = request.url.split('#')[0].split('?')[0];
+    event.respondWith((async () => (await matchPrecache(url)) || fetch(request))());
+});
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Thebe 会话复用模块
+
+sphinx-thebe 在每个页面点击激活后都会重新向 Binder 申请服务器并启动新内核，Binder 启动通常需要 30–90 秒。
+启用 ``mystx_thebe_session`` 后，在加载 Thebe 的页面中加入会话层脚本 ``thebe-session.js``：
+
+- 读者表现出使用意图时（``mystx_thebe_prewarm``）在后台启动服务器与内核；
+- 服务器与内核 ID 保存在浏览器存储中，后续页面校验可用后重新连接，而不是重新启动；
+- ``thebe_config`` 中的 ``serverSettings`` 可指向本地或自建的 Jupyter 服务器，此时不经过 Binder。
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional
+from docutils import nodes
+from sphinx.application import Sphinx
+from sphinx.config import Config
+from sphinx.util import logging
+
+# 获取Sphinx日志记录器
+logger = logging.getLogger(__name__)
+
+DEFAULT_BINDER_URL = "https://mybinder.org"
+DEFAULT_REPOSITORY = "https://github.com/binder-examples/jupyter-stacks-datascience"
+PREWARM_MODES = ("intent", "load", "off")
+
+
+def kernel_name(metadata: Dict[str, Any]) -> str:
+    """按 sphinx-thebe 的规则从页面元数据中取得内核名称。"""
+    name = metadata.get("thebe-kernel")
+    if name:
+        return name
+    kernelspec = metadata.get("kernelspec")
+    if isinstance(kernelspec, str):
+        kernelspec = json.loads(kernelspec)
+    if isinstance(kernelspec, dict) and kernelspec.get("name"):
+        return kernelspec["name"]
+    return "python3"
+
+
+def _repository(url: str) -> str:
+    parts = url.rstrip("/").removesuffix(".git").split("/")
+    return "/".join(parts[-2:])
+
+
+def session_config(config: Config, docname: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """生成页面的会话层配置。
+
+    Args:
+        config: Sphinx配置对象
+        docname: 文档名称
+        metadata: 页面元数据
+
+    Returns:
+        写入页面供 ``thebe-session.js`` 读取的配置
+    """
+    thebe_config = getattr(config, "thebe_config", None)
+    thebe_config = thebe_config if isinstance(thebe_config, dict) else {}
+    path_to_docs = thebe_config.get("path_to_docs", ".").strip("/") + "/"
+    prewarm = config.mystx_thebe_prewarm
+    if prewarm not in PREWARM_MODES:
+        logger.warning(f"mystx_thebe_prewarm 取值无效: {prewarm!r}，应为 {', '.join(PREWARM_MODES)} 之一")
+        prewarm = "intent"
+    return {
+        "binderUrl": thebe_config.get("binderUrl", DEFAULT_BINDER_URL),
+        "repo": _repository(thebe_config.get("repository_url", DEFAULT_REPOSITORY)),
+        "ref": thebe_config.get("repository_branch", "master"),
+        "serverSettings": thebe_config.get("serverSettings") or None,
+        "kernelName": kernel_name(metadata),
+        "path": f"{path_to_docs}{Path(docname).parent}",
+        "maxAge": config.mystx_thebe_session_max_age,
+        "prewarm": prewarm,
+    }
+
+
+def _has_thebe(doctree: Optional[nodes.document]) -> bool:
+    # sphinx-thebe 只在需要加载 Thebe 的页面中加入 text/x-thebe-config 配置
+    if doctree is None:
+        return False
+    return any("text/x-thebe-config" in node.astext() for node in doctree.findall(nodes.raw))
+
+
+def html_page_context_handler(app: Sphinx, pagename: str, templatename: str,
+                              context: Dict[str, Any], doctree) -> None:
+    """html-page-context 事件处理器，在加载 Thebe 的页面中加入会话层。"""
+    thebe_config = getattr(app.config, "thebe_config", None)
+    always_load = isinstance(thebe_config, dict) and thebe_config.get("always_load") is True
+    if not (always_load or _has_thebe(doctree)):
+        return
+    metadata = app.env.metadata.get(pagename, {})
+    body = json.dumps(session_config(app.config, pagename, metadata)).replace("</", "<\\/")
+    app.add_js_file(None, body=body, type="application/json", id="mystx-thebe-session")
+    app.add_js_file("js/thebe-session.js", loading_method="defer")
+
+
+def sphinx_setup(app: Sphinx, config: Config) -> None:
+    """启用 Thebe 会话复用。
+
+    Args:
+        app: Sphinx应用实例
+        config: Sphinx配置对象
+    """
+    logger.info("正在配置Thebe会话复用")
+    app.connect("html-page-context", html_page_context_handler)
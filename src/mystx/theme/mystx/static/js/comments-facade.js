@@ -0,0 +1,72 @@
+/**
+ * mystx 评论与批注嵌入的点击加载外观
+ *
+ * .mystx-comments-facade 元素由 mystx.comments_facade 生成，#mystx-comments-facade 记录各嵌入的脚本：
+ * - 点击外观按钮时加载对应嵌入；
+ * - 加载方式为 visible 时，Utterances 评论区滚动到可视区域附近也会加载。
+ */
+(function() {
+    function loadEmbed(facade, embed) {
+        if (facade.classList.contains('is-loaded')) {
+            return;
+        }
+        facade.classList.add('is-loaded');
+        (embed.css || []).forEach(function(href) {
+            const link = document.createElement('link');
+            link.rel = 'stylesheet';
+            link.href = href;
+            document.head.appendChild(link);
+        });
+        const script = document.createElement('script');
+        script.src = embed.src;
+        script.async = true;
+        Object.keys(embed.attributes || {}).forEach(function(name) {
+            script.setAttribute(name, embed.attributes[name]);
+        });
+        if (facade.dataset.kind === 'utterances') {
+            // Utterances 在脚本所在位置插入 iframe
+            facade.replaceChildren(script);
+        } else {
+            document.head.appendChild(script);
+            facade.remove();
+        }
+    }
+
+    function init() {
+        const element = document.getElementById('mystx-comments-facade');
+        if (!element) {
+            return;
+        }
+        const config = JSON.parse(element.textContent);
+        const observer = config.mode === 'visible' && 'IntersectionObserver' in window
+            ? new IntersectionObserver(function(entries) {
+                entries.forEach(function(entry) {
+                    if (entry.isIntersecting) {
+                        observer.unobserve(entry.target);
+                        loadEmbed(entry.target, config.embeds[entry.target.dataset.kind]);
+                    }
+                });
+            }, { rootMargin: '200px 0px' })
+            : null;
+
+        document.querySelectorAll('.mystx-comments-facade[data-kind]').forEach(function(facade) {
+            const embed = config.embeds[facade.dataset.kind];
+            if (!embed) {
+                return;
+            }
+            const button = facade.querySelector('.mystx-comments-facade-load');
+            if (button) {
+                button.addEventListener('click', function() { loadEmbed(facade, embed); });
+            }
+            if (observer && facade.dataset.kind === 'utterances') {
+                observer.observe(facade);
+            }
+        });
+    }
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', init);
+    } else {
+        init();
+    }
+})();
@@ -0,0 +1,142 @@
+/**
+ * mystx 笔记本大输出懒加载
+ *
+ * - .mystx-lazy-output 占位元素由 mystx.nb_outputs 生成，data-src 指向外置的 HTML 输出，
+ *   滚动到可视区域附近或点击按钮时加载，并按顺序执行其中的脚本；
+ * - #mystx-widget-loader 记录外置的 ipywidgets 状态与推迟加载的脚本，
+ *   第一个部件视图可见时插入状态并加载脚本。
+ */
+(function() {
+    const root = new URL(document.documentElement.dataset.content_root || './', window.location.href);
+
+    function loadScript(attributes, text) {
+        return new Promise(function(resolve) {
+            const script = document.createElement('script');
+            Object.keys(attributes).forEach(function(name) {
+                if (name !== 'body') {
+                    script.setAttribute(name, attributes[name]);
+                }
+            });
+            if (attributes.src) {
+                script.onload = resolve;
+                script.onerror = resolve;
+                document.head.appendChild(script);
+            } else {
+                script.textContent = text || '';
+                document.head.appendChild(script);
+                resolve();
+            }
+        });
+    }
+
+    // innerHTML 插入的脚本不会执行，需重新创建，并保持原有顺序
+    function runScripts(container) {
+        const scripts = Array.from(container.querySelectorAll('script'));
+        return scripts.reduce(function(chain, old) {
+            return chain.then(function() {
+                const attributes = {};
+                Array.from(old.attributes).forEach(function(attr) { attributes[attr.name] = attr.value; });
+                const type = attributes.type;
+                if (type && !/(java|ecma)script|module/i.test(type)) {
+                    return undefined;
+                }
+                old.remove();
+                return loadScript(attributes, old.textContent);
+            });
+        }, Promise.resolve());
+    }
+
+    function loadOutput(placeholder) {
+        if (placeholder.dataset.loading) {
+            return;
+        }
+        placeholder.dataset.loading = 'true';
+        fetch(new URL(placeholder.dataset.src, root))
+            .then(function(response) {
+                if (!response.ok) {
+                    throw new Error(response.status);
+                }
+                return response.text();
+            })
+            .then(function(html) {
+                const container = document.createElement('div');
+                container.className = 'mystx-lazy-output-loaded';
+                container.innerHTML = html;
+                placeholder.replaceWith(container);
+                return runScripts(container);
+            })
+            .catch(function(error) {
+                delete placeholder.dataset.loading;
+                console.warn('mystx: 输出加载失败:', placeholder.dataset.src, error);
+            });
+    }
+
+    function loadWidgets(config) {
+        return fetch(new URL(config.state, root))
+            .then(function(response) { return response.text(); })
+            .then(function(state) {
+                return loadScript({ type: 'application/vnd.jupyter.widget-state+json' }, state);
+            })
+            .then(function() {
+                return config.scripts.reduce(function(chain, entry) {
+                    return chain.then(function() {
+                        return loadScript(Object.assign({ src: entry[0] }, entry[1]));
+                    });
+                }, Promise.resolve());
+            })
+            .catch(function(error) {
+                console.warn('mystx: ipywidgets 状态加载失败:', error);
+            });
+    }
+
+    function observe(elements, callback) {
+        if (!elements.length) {
+            return;
+        }
+        if (!('IntersectionObserver' in window)) {
+            elements.forEach(callback);
+            return;
+        }
+        const observer = new IntersectionObserver(function(entries) {
+            entries.forEach(function(entry) {
+                if (entry.isIntersecting) {
+                    observer.unobserve(entry.target);
+                    callback(entry.target);
+                }
+            });
+        }, { rootMargin: '400px 0px' });
+        elements.forEach(function(element) { observer.observe(element); });
+    }
+
+    function init() {
+        const placeholders = Array.from(document.querySelectorAll('.mystx-lazy-output[data-src]'));
+        placeholders.forEach(function(placeholder) {
+            const button = placeholder.querySelector('.mystx-lazy-output-load');
+            if (button) {
+                button.addEventListener('click', function() { loadOutput(placeholder); });
+            }
+        });
+        observe(placeholders, loadOutput);
+
+        const loader = document.getElementById('mystx-widget-loader');
+        if (loader) {
+            const config = JSON.parse(loader.textContent);
+            const views = Array.from(document.querySelectorAll(
+                'script[type="application/vnd.jupyter.widget-view+json"]'
+            )).map(function(view) { return view.parentElement; });
+            let started = false;
+            observe(views, function() {
+                if (!started) {
+                    started = true;
+                    loadWidgets(config);
+                }
+            });
+        }
+    }
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', init);
+    } else {
+        init();
+    }
+})();
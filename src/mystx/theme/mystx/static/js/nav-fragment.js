@@ -0,0 +1,97 @@
+/**
+ * mystx 导航片段加载器
+ *
+ * 页面中的 .mystx-nav-fragment 占位元素由 mystx.nav_cache 生成，data-src 指向带内容哈希的导航片段。
+ * 片段只下载一次并保存在 localStorage 中，之后的页面直接同步插入；
+ * 插入时把片段中的站内链接解析为绝对地址，并标记当前页面及其祖先节点。
+ */
+(function() {
+    const STORAGE_PREFIX = 'mystx-nav:';
+    const EXTERNAL = /^([a-z][a-z0-9+.-]*:|#|\/)/i;
+
+    function normalize(url) {
+        const path = url.split('#')[0].split('?')[0];
+        return path.endsWith('/index.html') ? path.slice(0, -'index.html'.length) : path;
+    }
+
+    function markCurrent(link) {
+        link.classList.add('current');
+        link.setAttribute('href', '#');
+        const own = link.closest('li');
+        const details = own && own.querySelector(':scope > details');
+        if (details) {
+            details.open = true;
+        }
+        for (let node = link.parentElement; node; node = node.parentElement) {
+            if (node.tagName === 'LI') {
+                node.classList.add('current', 'active');
+            } else if (node.tagName === 'UL') {
+                node.classList.add('current');
+            } else if (node.tagName === 'DETAILS') {
+                node.open = true;
+            }
+        }
+    }
+
+    function hydrate(placeholder, html) {
+        const root = new URL(document.documentElement.dataset.content_root || './', window.location.href);
+        const here = normalize(window.location.href);
+        const template = document.createElement('template');
+        template.innerHTML = html;
+        let current = null;
+        template.content.querySelectorAll('a[href]').forEach(function(link) {
+            const href = link.getAttribute('href');
+            if (EXTERNAL.test(href)) {
+                return;
+            }
+            const url = new URL(href, root).href;
+            link.setAttribute('href', url);
+            if (!current && url.indexOf('#') === -1 && normalize(url) === here) {
+                current = link;
+            }
+        });
+        if (current) {
+            markCurrent(current);
+        }
+        placeholder.replaceWith(template.content);
+    }
+
+    function load(placeholder) {
+        const src = new URL(placeholder.dataset.src, window.location.href);
+        const key = STORAGE_PREFIX + src.pathname;
+        let cached = null;
+        try {
+            cached = window.localStorage.getItem(key);
+        } catch (error) {
+            // 存储不可用时每次从网络（浏览器缓存）加载
+        }
+        if (cached !== null) {
+            hydrate(placeholder, cached);
+            return;
+        }
+        fetch(src)
+            .then(function(response) {
+                if (!response.ok) {
+                    throw new Error(response.status);
+                }
+                return response.text();
+            })
+            .then(function(html) {
+                hydrate(placeholder, html);
+                try {
+                    // 片段文件名带内容哈希，旧版本不会再被使用
+                    Object.keys(window.localStorage)
+                        .filter(function(name) { return name.startsWith(STORAGE_PREFIX); })
+                        .forEach(function(name) { window.localStorage.removeItem(name); });
+                    window.localStorage.setItem(key, html);
+                } catch (error) {
+                    // 忽略存储配额等错误
+                }
+            })
+            .catch(function(error) {
+                console.warn('mystx: 导航片段加载失败:', error);
+            });
+    }
+
+    document.querySelectorAll('.mystx-nav-fragment[data-src]').forEach(load);
+})();
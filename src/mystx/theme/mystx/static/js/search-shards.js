@@ -0,0 +1,56 @@
+/**
+ * mystx 分片搜索索引加载器
+ *
+ * searchindex.js 只包含基础索引与分片清单（index.shards），
+ * 查询前按词项首字符加载所需分片并合并到 Search._index，已加载的分片会被复用。
+ * 分片键的计算规则需与 mystx.search_shards.shard_key 保持一致。
+ */
+(function() {
+    if (typeof Search === 'undefined') {
+        return;
+    }
+    const BUCKETS = 32;
+    const pending = new Map();
+
+    function shardKey(term) {
+        const first = term.charAt(0);
+        if (/^[a-z0-9]$/.test(first)) {
+            return first;
+        }
+        return 'u' + (first ? term.codePointAt(0) % BUCKETS : 0).toString(16);
+    }
+
+    function loadShard(index, key) {
+        if (!pending.has(key)) {
+            const root = document.documentElement.dataset.content_root || './';
+            const url = root + '_static/searchindex/' + index.shards[key];
+            pending.set(key, fetch(url)
+                .then(function(response) { return response.json(); })
+                .then(function(shard) {
+                    Object.assign(index.terms, shard.terms);
+                    Object.assign(index.titleterms, shard.titleterms);
+                })
+                .catch(function(error) {
+                    pending.delete(key);
+                    console.warn('mystx: 搜索索引分片加载失败:', key, error);
+                }));
+        }
+        return pending.get(key);
+    }
+
+    const originalQuery = Search.query;
+    Search.query = function(query) {
+        const index = Search._index;
+        if (!index || !index.shards) {
+            return originalQuery(query);
+        }
+        const parsed = Search._parseQuery(query);
+        const keys = new Set();
+        parsed[1].forEach(function(term) { keys.add(shardKey(term)); });
+        parsed[2].forEach(function(term) { keys.add(shardKey(term)); });
+        const loads = Array.from(keys)
+            .filter(function(key) { return key in index.shards; })
+            .map(function(key) { return loadShard(index, key); });
+        Promise.all(loads).then(function() { originalQuery(query); });
+    };
+})();
@@ -0,0 +1,14 @@
+/**
+ * mystx Service Worker 注册脚本
+ *
+ * Service Worker 位于站点根目录，作用域覆盖全部页面。
+ */
+if ('serviceWorker' in navigator) {
+    window.addEventListener('load', function() {
+        const root = new URL(document.documentElement.dataset.content_root || './', window.location.href);
+        navigator.serviceWorker.register(new URL('mystx-sw.js', root), { scope: root.pathname })
+            .catch(function(error) {
+                console.warn('mystx: Service Worker 注册失败:', error);
+            });
+    });
+}
@@ -0,0 +1,312 @@
+/**
+ * mystx Thebe 会话层
+ *
+ * - 读者表现出使用意图（指向、聚焦或触摸 Thebe 启动按钮）时，在后台启动 Binder 服务器与内核；
+ * - 服务器地址、令牌与内核 ID 保存在 localStorage 中，后续页面校验仍然可用后直接复用；
+ * - thebelab 启动时改用已就绪的服务器，并把其启动内核的请求转为重新连接已保存的内核。
+ *
+ * 配置由 mystx.thebe_session 写入 #mystx-thebe-session。
+ */
+(function(global) {
+    const KERNELS = 'api/kernels';
+
+    function joinUrl(base, path) {
+        return base.replace(/\/?$/, '/') + path;
+    }
+
+    function ThebeSession(config, storage, fetchImpl) {
+        this.config = config;
+        this.storage = storage;
+        this.fetch = fetchImpl || global.fetch.bind(global);
+        this._server = null;
+        this._kernel = null;
+    }
+
+    ThebeSession.prototype.key = function() {
+        const config = this.config;
+        const server = config.serverSettings && config.serverSettings.baseUrl;
+        return 'mystx-thebe:' + (server || `${config.binderUrl}/${config.repo}@${config.ref}`);
+    };
+
+    ThebeSession.prototype.load = function() {
+        try {
+            const state = JSON.parse(this.storage.getItem(this.key()) || 'null');
+            if (state && Date.now() - state.created < this.config.maxAge * 1000) {
+                return state;
+            }
+        } catch (error) {
+            // 存储不可用或内容损坏时视为没有会话
+        }
+        this.clear();
+        return null;
+    };
+
+    ThebeSession.prototype.save = function(state) {
+        try {
+            this.storage.setItem(this.key(), JSON.stringify(state));
+        } catch (error) {
+            // 隐私模式等情况下无法保存，仅影响跨页面复用
+        }
+    };
+
+    ThebeSession.prototype.clear = function() {
+        try {
+            this.storage.removeItem(this.key());
+        } catch (error) {
+            // 同上
+        }
+    };
+
+    ThebeSession.prototype.request = function(server, path, init) {
+        const options = Object.assign({}, init);
+        options.headers = Object.assign({ 'Content-Type': 'application/json' }, options.headers);
+        if (server.token) {
+            options.headers.Authorization = `token ${server.token}`;
+        }
+        return this.fetch(joinUrl(server.baseUrl, path), options);
+    };
+
+    ThebeSession.prototype.alive = function(server) {
+        return this.request(server, KERNELS)
+            .then(function(response) { return response.ok; })
+            .catch(function() { return false; });
+    };
+
+    // 通过 Binder 的构建接口启动服务器，读取事件流直到 phase 为 ready
+    ThebeSession.prototype.launchBinder = function() {
+        const config = this.config;
+        const url = `${config.binderUrl.replace(/\/$/, '')}/build/gh/${config.repo}/${config.ref}`;
+        return this.fetch(url, { headers: { Accept: 'text/event-stream' } }).then(function(response) {
+            if (!response.ok || !response.body) {
+                throw new Error(`Binder 请求失败: ${response.status}`);
+            }
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            function read() {
+                return reader.read().then(function(result) {
+                    buffer += decoder.decode(result.value || new Uint8Array(), { stream: !result.done });
+                    const lines = buffer.split('\n');
+                    buffer = lines.pop();
+                    for (const line of lines) {
+                        if (!line.startsWith('data:')) {
+                            continue;
+                        }
+                        const event = JSON.parse(line.slice(5));
+                        if (event.phase === 'ready') {
+                            reader.cancel().catch(function() {});
+                            return { baseUrl: event.url, token: event.token };
+                        }
+                        if (event.phase === 'failed') {
+                            throw new Error(`Binder 启动失败: ${event.message || ''}`);
+                        }
+                    }
+                    if (result.done) {
+                        throw new Error('Binder 事件流意外结束');
+                    }
+                    return read();
+                });
+            }
+            return read();
+        });
+    };
+
+    ThebeSession.prototype.server = function() {
+        if (this._server) {
+            return this._server;
+        }
+        const self = this;
+        const state = this.load();
+        const configured = this.config.serverSettings;
+        this._server = Promise.resolve(state && self.alive(state.server))
+            .then(function(alive) {
+                if (alive) {
+                    return state;
+                }
+                const server = configured && configured.baseUrl ? Promise.resolve(configured) : self.launchBinder();
+                return server.then(function(server) {
+                    const fresh = { server: server, kernels: {}, created: Date.now() };
+                    self.save(fresh);
+                    return fresh;
+                });
+            })
+            .then(function(state) { return state.server; })
+            .catch(function(error) {
+                self._server = null;
+                throw error;
+            });
+        return this._server;
+    };
+
+    // 返回当前内核名称对应的内核模型，已保存的内核仍在运行时直接复用
+    ThebeSession.prototype.kernel = function() {
+        if (this._kernel) {
+            return this._kernel;
+        }
+        const self = this;
+        const name = this.config.kernelName;
+        this._kernel = this.server()
+            .then(function(server) {
+                const state = self.load() || { server: server, kernels: {}, created: Date.now() };
+                const saved = state.kernels[name];
+                const existing = saved
+                    ? self.request(server, `${KERNELS}/${saved}`).then(function(response) {
+                        return response.ok ? response.json() : null;
+                    })
+                    : Promise.resolve(null);
+                return existing.then(function(model) {
+                    if (model) {
+                        return model;
+                    }
+                    return self.request(server, KERNELS, {
+                        method: 'POST',
+                        body: JSON.stringify({ name: name, path: self.config.path }),
+                    }).then(function(response) {
+                        if (!response.ok) {
+                            throw new Error(`内核启动失败: ${response.status}`);
+                        }
+                        return response.json();
+                    }).then(function(model) {
+                        state.kernels[name] = model.id;
+                        self.save(state);
+                        return model;
+                    });
+                });
+            })
+            .catch(function(error) {
+                self._kernel = null;
+                throw error;
+            });
+        return this._kernel;
+    };
+
+    // thebelab 使用的启动参数：跳过 Binder，直接连接已就绪的服务器
+    ThebeSession.prototype.thebeOptions = function(server) {
+        return {
+            requestKernel: true,
+            binderOptions: { repo: null },
+            kernelOptions: {
+                name: this.config.kernelName,
+                path: this.config.path,
+                serverSettings: {
+                    baseUrl: server.baseUrl,
+                    wsUrl: server.baseUrl.replace(/^http/, 'ws'),
+                    token: server.token || '',
+                    appendToken: true,
+                },
+            },
+        };
+    };
+
+    // 包装 fetch：向已就绪服务器启动同名内核的请求直接返回已保存的内核，实现重新连接
+    ThebeSession.prototype.wrapFetch = function(fetchImpl) {
+        const self = this;
+        return function(input, init) {
+            const url = String(input && input.url ? input.url : input);
+            const method = String((init && init.method) || (input && input.method) || 'GET').toUpperCase();
+            if (method !== 'POST' || !self._kernel || !self._server) {
+                return fetchImpl(input, init);
+            }
+            return self._server.then(function(server) {
+                if (url.split('?')[0] !== joinUrl(server.baseUrl, KERNELS)) {
+                    return fetchImpl(input, init);
+                }
+                let requested = self.config.kernelName;
+                try {
+                    requested = JSON.parse(init && init.body).name || requested;
+                } catch (error) {
+                    // 无法解析时按默认内核处理
+                }
+                if (requested !== self.config.kernelName) {
+                    return fetchImpl(input, init);
+                }
+                return self.kernel().then(function(model) {
+                    return new Response(JSON.stringify(model), {
+                        status: 201,
+                        headers: { 'Content-Type': 'application/json' },
+                    });
+                });
+            }).catch(function() {
+                return fetchImpl(input, init);
+            });
+        };
+    };
+
+    function patchThebe(thebe, session) {
+        if (!thebe || thebe.__mystxSession) {
+            return thebe;
+        }
+        const bootstrap = thebe.bootstrap;
+        thebe.__mystxSession = true;
+        thebe.bootstrap = function(options) {
+            return session.kernel()
+                .then(function() { return session.server(); })
+                .then(function(server) {
+                    return bootstrap.call(thebe, merge(options || {}, session.thebeOptions(server)));
+                }, function(error) {
+                    console.warn('mystx: Thebe 会话不可用，回退到默认启动方式:', error);
+                    return bootstrap.call(thebe, options);
+                });
+        };
+        return thebe;
+    }
+
+    function merge(target, source) {
+        Object.keys(source).forEach(function(key) {
+            const value = source[key];
+            if (value && typeof value === 'object' && !Array.isArray(value)) {
+                target[key] = merge(Object.assign({}, target[key]), value);
+            } else {
+                target[key] = value;
+            }
+        });
+        return target;
+    }
+
+    function init() {
+        const element = document.getElementById('mystx-thebe-session');
+        if (!element) {
+            return;
+        }
+        const session = new ThebeSession(JSON.parse(element.textContent), global.localStorage);
+        global.mystxThebeSession = session;
+        global.fetch = session.wrapFetch(global.fetch.bind(global));
+
+        // thebelab 由 sphinx-thebe 在激活时动态加载，在其赋值到全局变量时包装 bootstrap
+        let thebe = patchThebe(global.thebelab, session);
+        Object.defineProperty(global, 'thebelab', {
+            configurable: true,
+            get: function() { return thebe; },
+            set: function(value) { thebe = patchThebe(value, session); },
+        });
+
+        function warm() {
+            session.kernel().catch(function(error) {
+                console.warn('mystx: Thebe 内核预热失败:', error);
+            });
+        }
+        if (session.config.prewarm === 'load') {
+            warm();
+            return;
+        }
+        if (session.config.prewarm !== 'intent') {
+            return;
+        }
+        const selector = '.thebe-launch-button, .btn-launch-thebe, [onclick^="initThebe"]';
+        ['pointerover', 'focusin', 'touchstart'].forEach(function(type) {
+            document.addEventListener(type, function(event) {
+                if (event.target.closest && event.target.closest(selector)) {
+                    warm();
+                }
+            }, { passive: true });
+        });
+    }
+
+    if (typeof module !== 'undefined' && module.exports) {
+        module.exports = { ThebeSession: ThebeSession, patchThebe: patchThebe };
+    } else if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', init);
+    } else {
+        init();
+    }
+})(typeof window !== 'undefined' ? window : globalThis);
@@ -4,8 +4,10 @@ from sphinx.application import Sphinx
 from sphinx.config import Config
 from sphinx.util.typing import ExtensionMetadata
 from sphinx.util import logging
+from .build_timing import timed
 logger = logging.getLogger(__name__)
 
+@timed("version_switcher")
 def sphinx_setup(app: Sphinx, config: Config) -> ExtensionMetadata:
     logger.info("正在配置版本切换器")
     json_url = getattr(config, "version_switcher_json_url", "")
@@ -0,0 +1,61 @@
+from docutils import nodes
+from docutils.frontend import get_default_settings
+from docutils.parsers.rst import Parser
+from docutils.utils import new_document
+from sphinx.builders.html._assets import _CascadingStyleSheet, _JavaScript
+
+from mystx.asset_gating import filter_assets, page_features
+
+
+def _document(*children):
+    document = new_document("test", get_default_settings(Parser))
+    section = nodes.section()
+    section.extend(children)
+    document.append(section)
+    return document
+
+
+def test_prose_page_uses_no_features():
+    document = _document(nodes.paragraph("", "", nodes.Text("plain text")),
+                         nodes.reference("", "site", refuri="https://example.com/"))
+    assert page_features(document) == set()
+    assert page_features(None) == set()
+
+
+def test_page_features_from_nodes_and_raw_html(tmp_path):
+    lazy = tmp_path / "_static" / "mystx-outputs" / "abc.html"
+    lazy.parent.mkdir(parents=True)
+    lazy.write_text('<script>require(["plotly"], function(Plotly) {})</script>', "utf-8")
+    document = _document(
+        nodes.math("", "x"),
+        nodes.literal_block("", "print(1)"),
+        nodes.reference("", "other", refuri="other.html"),
+        nodes.raw("", '<div class="mystx-lazy-output" '
+                      'data-src="_static/mystx-outputs/abc.html"></div>', format="html"),
+    )
+    document[0]["nb_element"] = "cell_code"
+    assert page_features(document, outdir=tmp_path) == {
+        "math", "code", "tooltips", "notebook", "plotly", "requirejs",
+    }
+    assert page_features(_document(), metadata={"py-config": {}}) == {"pyscript"}
+
+
+def test_filter_assets_drops_unused_features():
+    scripts = [
+        _JavaScript("_static/doctools.js"),
+        _JavaScript("https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-mml-chtml.js"),
+        _JavaScript("", body="window.MathJax = {}"),
+        _JavaScript("https://cdnjs.cloudflare.com/ajax/libs/require.js/2.3.4/require.min.js"),
+        _JavaScript("_static/copybutton.js"),
+    ]
+    dropped = filter_assets(scripts, {"code"})
+    assert [str(js.filename) for js in scripts] == ["_static/doctools.js", "_static/copybutton.js"]
+    assert len(dropped) == 3
+    styles = [_CascadingStyleSheet("_static/copybutton.css"),
+              _CascadingStyleSheet("_static/pydata.css")]
+    filter_assets(styles, set())
+    assert [str(css.filename) for css in styles] == ["_static/pydata.css"]
+    require = "https://cdnjs.cloudflare.com/ajax/libs/require.js/2.3.4/require.min.js"
+    scripts = [_JavaScript(require)]
+    filter_assets(scripts, {"widgets"})
+    assert len(scripts) == 1
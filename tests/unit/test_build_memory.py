@@ -0,0 +1,61 @@
+import time
+
+import pytest
+from docutils import nodes
+from docutils.utils import new_document
+
+from mystx import build_memory
+from mystx.build_memory import PeakRss, PhaseRecorder, doctree_breakdown
+
+
+def test_doctree_breakdown_counts_node_types_and_nb_elements():
+    doctree = new_document("test")
+    output = nodes.container(nb_element="cell_code_output")
+    output += nodes.literal_block("x" * 1000, "x" * 1000)
+    doctree += nodes.paragraph("", "hello")
+    doctree += output
+    result = doctree_breakdown(doctree)
+    assert result["container[cell_code_output]"][0] == 1
+    assert result["paragraph"][0] == 1
+    assert result["Text"] == (2, 1005)
+    assert result["literal_block"][1] > 1000
+
+
+def test_phase_recorder_marks_phases():
+    recorder = PhaseRecorder()
+    recorder.mark("init")
+    recorder.mark("read")
+    assert [phase["phase"] for phase in recorder.phases] == ["init", "read"]
+
+
+def test_phase_records_current_and_cumulative_peak_rss():
+    recorder = PhaseRecorder()
+    recorder.mark("init")
+    record = recorder.phases[0]
+    assert set(record) >= {"rss", "rss_peak", "rss_peak_method", "rss_peak_cumulative"}
+    assert record["rss"] is None or record["rss"] > 0
+
+
+@pytest.mark.parametrize("method", ["hwm", "sampled"])
+def test_peak_rss_is_reset_at_each_phase(monkeypatch, method):
+    if build_memory.current_rss() is None:
+        pytest.skip("无法获取当前 RSS")
+    if method == "sampled":
+        monkeypatch.setattr(build_memory, "_reset_hwm", lambda: False)
+    elif not build_memory._reset_hwm():
+        pytest.skip("不支持重置 VmHWM")
+    size = 64 * 1024 * 1024
+    peak = PeakRss()
+    peak.start()
+    try:
+        assert peak.method == method
+        block = bytearray(size)
+        block[::4096] = b"x" * len(block[::4096])
+        time.sleep(0.2)
+        del block
+        first = peak.take()
+        second = peak.take()
+    finally:
+        peak.stop()
+    assert first - build_memory.current_rss() > size // 2
+    assert second < first - size // 2
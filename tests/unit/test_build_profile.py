@@ -0,0 +1,45 @@
+import cProfile
+import pstats
+from pathlib import Path
+from types import SimpleNamespace
+
+from mystx import build_profile
+from mystx.build_profile import collapsed_stacks
+
+
+def _leaf():
+    return sum(range(20000))
+
+
+def _parent():
+    return [_leaf() for _ in range(20)]
+
+
+def test_collapsed_stacks_follow_call_edges():
+    profile = cProfile.Profile()
+    profile.enable()
+    _parent()
+    profile.disable()
+    stacks = collapsed_stacks(pstats.Stats(profile))
+    leaf = [stack for stack in stacks if stack.split(";")[-1].startswith("_leaf ")]
+    assert leaf and all("_parent (" in stack for stack in leaf)
+    assert all(seconds >= 0 for seconds in stacks.values())
+
+
+def test_results_are_written_outside_the_html_output(tmp_path, monkeypatch):
+    connected = {}
+    app = SimpleNamespace(
+        outdir=str(tmp_path / "html"), doctreedir=str(tmp_path / "doctrees"),
+        connect=lambda event, handler, priority=500: connected.__setitem__(event, priority),
+    )
+    monkeypatch.setattr(build_profile, "_profiler", build_profile.PhaseProfiler())
+    build_profile.sphinx_setup(app, None)
+    # 写入阶段的剖析在其他 build-finished 处理器之后才结束
+    assert connected["build-finished"] > 500
+
+    build_profile._profiler.start("write")
+    _parent()
+    build_profile.build_finished_handler(app, None)
+    output = Path(app.doctreedir) / build_profile.OUTPUT_DIR
+    assert sorted(path.name for path in output.iterdir()) == ["write.collapsed", "write.pstats"]
+    assert not (tmp_path / "html").exists()
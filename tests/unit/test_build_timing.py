@@ -0,0 +1,42 @@
+from mystx import build_timing
+from mystx.build_timing import TimingRecorder, summarize, timed
+
+
+def test_summarize_groups_by_document_extension_and_handler():
+    records = [
+        {"phase": "read", "name": "read", "docname": "a", "seconds": 1.0},
+        {"phase": "doctree-read", "name": "myst_nb", "docname": "a", "seconds": 0.5},
+        {"phase": "write", "name": "write", "docname": "a", "seconds": 2.0},
+        {"phase": "html-page-context", "name": "pydata_sphinx_theme", "docname": "b",
+         "seconds": 0.25},
+        {"phase": "build-finished", "name": "mystx.search_shards", "docname": None, "seconds": 0.1},
+        {"phase": "mystx", "name": "github-stats", "docname": "a", "seconds": 0.2},
+        {"phase": "mystx", "name": "github-stats", "docname": "b", "seconds": 0.3},
+    ]
+    report = summarize(records, top=1)
+    assert report["documents"]["a"] == {"read": 1.0, "doctree-read": 0.5, "write": 2.0}
+    # read/write 已包含事件耗时
+    assert report["top_documents"] == [{"docname": "a", "seconds": 3.0}]
+    assert report["extensions"]["mystx.search_shards"] == {"build-finished": 0.1}
+    assert report["top_extensions"] == [{"extension": "myst_nb", "seconds": 0.5}]
+    assert report["mystx"]["github-stats"]["calls"] == 2
+
+
+def test_timed_records_only_when_enabled(tmp_path, monkeypatch):
+    recorder = TimingRecorder()
+    monkeypatch.setattr(build_timing, "_recorder", recorder)
+
+    @timed("handler")
+    def handler():
+        return 42
+
+    assert handler() == 42
+    assert recorder.records == []
+    recorder.directory = tmp_path
+    recorder.docname = "a"
+    handler()
+    records = [(r["phase"], r["name"], r["docname"]) for r in recorder.records]
+    assert records == [("mystx", "handler", "a")]
+    recorder.flush()
+    assert recorder.records == []
+    assert len(list(tmp_path.glob("*.jsonl"))) == 1
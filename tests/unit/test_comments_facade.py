@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+
+from sphinx.builders.html._assets import _CascadingStyleSheet, _JavaScript
+
+from mystx.comments_facade import embeds, html_page_context_handler, page_mode
+
+COMMENTS_CONFIG = {"hypothesis": True, "utterances": {"repo": "org/repo", "theme": "github-dark"}}
+
+
+class FakeApp:
+    def __init__(self, pages):
+        self.config = SimpleNamespace(comments_config=COMMENTS_CONFIG,
+                                      mystx_comments_facade_pages=pages)
+        self.added = []
+
+    def add_js_file(self, filename, **kwargs):
+        self.added.append((filename, kwargs))
+
+
+def _context():
+    return {
+        "body": "<p>text</p>",
+        "script_files": [
+            _JavaScript("_static/doctools.js"),
+            _JavaScript("https://hypothes.is/embed.js", kind="hypothesis", **{"async": "async"}),
+            _JavaScript("", body="var addUtterances = () => {}", kind="utterances"),
+        ],
+        "css_files": [_CascadingStyleSheet("_static/pydata.css")],
+    }
+
+
+def test_page_mode_uses_first_matching_pattern():
+    patterns = {"api/*": "click", "index": "eager", "**": "off"}
+    assert page_mode("api/mystx", patterns) == "click"
+    assert page_mode("index", patterns) == "eager"
+    assert page_mode("guide/intro", patterns) == "off"
+    assert page_mode("guide/intro", {}) == "visible"
+
+
+def test_embeds_follow_comments_config():
+    result = embeds(COMMENTS_CONFIG)
+    assert set(result) == {"hypothesis", "utterances"}
+    assert result["utterances"]["attributes"]["theme"] == "github-dark"
+    assert result["utterances"]["attributes"]["issue-term"] == "pathname"
+
+
+def test_handler_replaces_embeds_with_facades():
+    app = FakeApp({"api/*": "click", "index": "eager", "private/*": "off"})
+    context = _context()
+    html_page_context_handler(app, "guide/intro", "page.html", context, None)
+    assert [str(js.filename) for js in context["script_files"]] == ["_static/doctools.js"]
+    assert 'data-kind="hypothesis"' in context["body"]
+    assert 'data-kind="utterances"' in context["body"]
+    assert '"mode": "visible"' in app.added[0][1]["body"]
+    assert app.added[1][0] == "js/comments-facade.js"
+
+    context = _context()
+    html_page_context_handler(app, "index", "page.html", context, None)
+    assert len(context["script_files"]) == 3 and context["body"] == "<p>text</p>"
+
+    app.added.clear()
+    context = _context()
+    html_page_context_handler(app, "private/notes", "page.html", context, None)
+    assert len(context["script_files"]) == 1 and context["body"] == "<p>text</p>" and not app.added
@@ -0,0 +1,58 @@
+import shutil
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from mystx.font_subset import (
+    SUBSET_DIR, FontSubsetter, collect_text, glyph_hash, rewrite_font_faces,
+)
+
+
+def test_collect_text_skips_script_and_style():
+    chars = collect_text("<p>中文</p><script>var z=1;</script><style>q{}</style>")
+    assert {"中", "文"} <= chars
+    assert "z" not in chars
+    assert "q" not in chars
+
+
+def test_glyph_hash_is_order_independent():
+    assert glyph_hash("abc") == glyph_hash("cba")
+    assert glyph_hash("abc") != glyph_hash("abd")
+
+
+def test_rewrite_font_faces_replaces_src():
+    css = (
+        "@font-face { font-family: 'X';\n"
+        "  src: url('a.woff2') format('woff2'), url(\"a.ttf\") format('truetype');\n"
+        "  font-display: swap; }\n"
+        "body { color: red; }"
+    )
+    out = rewrite_font_faces(css, lambda url: "sub/a.1234.woff2" if url == "a.ttf" else None)
+    assert "src: url('sub/a.1234.woff2') format('woff2');" in out
+    assert "a.ttf" not in out
+    assert "font-display: swap;" in out
+    assert out.endswith("body { color: red; }")
+
+
+def test_rewrite_font_faces_keeps_unresolved():
+    css = "@font-face { src: url('https://cdn/x.woff2'); }"
+    assert rewrite_font_faces(css, lambda url: None) == css
+
+
+def test_docs_font_css_fonts_are_subset(tmp_path):
+    pytest.importorskip("fontTools")
+    static_src = Path(__file__).resolve().parents[2] / "doc" / "_static"
+    outdir = tmp_path / "html"
+    shutil.copytree(static_src / "fonts", outdir / "_static" / "fonts")
+    shutil.copy(static_src / "font.css", outdir / "_static" / "font.css")
+    (outdir / "index.html").write_text("<p>旗帜 \U0001F1E8\U0001F1F3</p>", "utf-8")
+    config = SimpleNamespace(html_css_files=["font.css"], mystx_font_subset_text="")
+    app = SimpleNamespace(outdir=str(outdir), doctreedir=str(tmp_path / "doctrees"), config=config)
+    FontSubsetter(app).run()
+
+    css = (outdir / "_static" / "font.css").read_text("utf-8")
+    assert f"url('{SUBSET_DIR}/NotoColorEmoji." in css
+    assert "local('Maple Mono NF CN')" in css
+    [subset] = (outdir / "_static" / SUBSET_DIR).glob("NotoColorEmoji.*.woff2")
+    assert subset.stat().st_size < (static_src / "fonts" / "NotoColorEmoji.woff2").stat().st_size
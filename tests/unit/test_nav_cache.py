@@ -0,0 +1,90 @@
+from mystx.nav_cache import NavTemplate
+
+NAV = (
+    '<ul class="nav bd-sidenav">'
+    '<li class="toctree-l1"><a class="reference internal" href="a.html">A</a></li>'
+    '<li class="toctree-l1 has-children"><a class="reference internal" href="g/index.html">G</a>'
+    '<details><summary>x</summary><ul>'
+    '<li class="toctree-l2"><a class="reference internal" href="g/c.html">C</a></li>'
+    '</ul></details></li>'
+    '<li class="toctree-l1"><a class="reference external" href="https://example.com">E</a></li>'
+    '</ul>'
+)
+
+
+def test_render_marks_current_page_and_ancestors():
+    template = NavTemplate.from_html(NAV)
+    html = template.render("g/c.html", "g/c.html")
+    assert '<a class="reference internal current" href="#">C</a>' in html
+    assert '<li class="toctree-l1 has-children current active">' in html
+    assert '<li class="toctree-l2 current active">' in html
+    assert "<details open=\"open\">" in html
+    assert 'href="../a.html"' in html and 'href="index.html"' in html
+    assert 'href="https://example.com"' in html
+
+
+def test_render_opens_details_of_current_section():
+    template = NavTemplate.from_html(NAV)
+    html = template.render("g/index.html", "g/index.html")
+    assert '<a class="reference internal current" href="#">G</a>' in html
+    assert "<details open=\"open\">" in html
+    assert 'href="c.html"' in html
+
+
+def test_render_other_page_leaves_template_unmarked():
+    template = NavTemplate.from_html(NAV)
+    html = template.render("a.html", "a.html")
+    assert html.count("current") == 3  # 链接、所在 li 与外层 ul
+    assert "open=" not in html
+    assert 'href="g/c.html"' in html
+
+
+def test_fragment_links_are_relative_to_site_root():
+    template = NavTemplate.from_html(NAV)
+    html = template.fragment("docs/")
+    assert 'href="docs/a.html"' in html and 'href="docs/g/c.html"' in html
+    assert 'href="https://example.com"' in html
+    assert "current" not in html
+
+
+def test_fragment_mode_renders_fallback_from_cached_template(tmp_path, monkeypatch):
+    from types import SimpleNamespace
+
+    from sphinx.util.osutil import relative_uri
+
+    from mystx import nav_cache
+
+    top_level = NAV.split("<details>")[0] + "</li></ul>"
+    renders = []
+
+    def render_sidebar_nav(app, show_nav_level, **kwargs):
+        renders.append(kwargs.get("maxdepth"))
+        return top_level if kwargs.get("maxdepth") == 1 else NAV
+
+    monkeypatch.setattr(nav_cache, "render_sidebar_nav", render_sidebar_nav)
+    monkeypatch.setattr(nav_cache, "_cache", nav_cache.NavCache())
+    builder = SimpleNamespace(
+        get_target_uri=lambda docname, typ=None: f"{docname}.html",
+        get_relative_uri=lambda source, target: relative_uri(f"{source}.html", f"{target}.html"),
+    )
+    app = SimpleNamespace(config=SimpleNamespace(root_doc="index", mystx_nav_fragment=True),
+                          builder=builder, env=SimpleNamespace(), outdir=str(tmp_path))
+
+    def original(*args, **kwargs):
+        raise AssertionError("the theme's toctree renderer should not be called")
+
+    pages = {}
+    for pagename in ("a", "g/c"):
+        context = {"generate_toctree_html": original,
+                   "pathto": lambda path, resource: relative_uri(f"{pagename}.html", path)}
+        nav_cache.html_page_context_handler(app, pagename, "page.html", context, None)
+        generate = context["generate_toctree_html"]
+        pages[pagename] = generate("sidebar", startdepth=0, show_nav_level=1)
+
+    assert renders == [None, 1]
+    assert len(list((tmp_path / "_static" / nav_cache.FRAGMENT_DIR).iterdir())) == 1
+    assert 'data-src="../_static/mystx-nav/nav.' in pages["g/c"]
+    fallback = pages["g/c"].split("<noscript>")[1]
+    assert 'href="../a.html"' in fallback and 'href="index.html"' in fallback
+    assert "g/c.html" not in fallback and "details" not in fallback
+    assert '<a class="reference internal current" href="#">A</a>' in pages["a"]
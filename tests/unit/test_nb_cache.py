@@ -0,0 +1,47 @@
+import os
+
+import nbformat
+from nbformat.v4 import new_code_cell, new_markdown_cell, new_notebook, new_output
+
+from mystx.nb_cache import NotebookStore, merge_outputs, notebook_key
+
+
+def _notebook(source, markdown="text"):
+    notebook = new_notebook(cells=[new_markdown_cell(markdown), new_code_cell(source)])
+    notebook.metadata["kernelspec"] = {"name": "python3", "display_name": "Python 3"}
+    return notebook
+
+
+def test_notebook_key_ignores_markdown_and_whitespace():
+    key = notebook_key(_notebook("x = 1\nprint(x)"), "env")
+    assert notebook_key(_notebook("x = 1   \r\nprint(x)\n\n", markdown="changed"), "env") == key
+    assert notebook_key(_notebook("x = 2\nprint(x)"), "env") != key
+    assert notebook_key(_notebook("x = 1\nprint(x)"), "other-env") != key
+
+
+def test_store_roundtrip_and_merge(tmp_path):
+    store = NotebookStore(tmp_path, fingerprint="env")
+    notebook = _notebook("print(1)")
+    executed = _notebook("print(1)")
+    executed.cells[1].outputs = [new_output("stream", name="stdout", text="1\n")]
+    executed.cells[1].execution_count = 1
+    assert store.get(notebook) is None
+    store.put(notebook, executed)
+    cached = store.get(_notebook("print(1)", markdown="other"))
+    merged = merge_outputs(_notebook("print(1)", markdown="other"), cached)
+    assert merged.cells[0].source == "other"
+    assert merged.cells[1].outputs[0].text == "1\n"
+    nbformat.validate(merged)
+
+
+def test_evict_removes_least_recently_used(tmp_path):
+    store = NotebookStore(tmp_path, fingerprint="env")
+    for i in range(3):
+        store.put(_notebook(f"print({i})"), _notebook(f"print({i})"))
+    files = {i: store._file(notebook_key(_notebook(f"print({i})"), "env")) for i in range(3)}
+    for age, i in enumerate((1, 0, 2)):
+        os.utime(files[i], (1000 + age, 1000 + age))
+    store.max_size = sum(path.stat().st_size for path in files.values()) - 1
+    removed = store.evict()
+    assert removed == [files[1]]
+    assert files[0].exists() and files[2].exists()
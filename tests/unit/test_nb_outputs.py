@@ -0,0 +1,22 @@
+from docutils import nodes
+
+from mystx.nb_outputs import lazy_placeholder, write_asset
+
+
+def test_write_asset_deduplicates_by_content(tmp_path):
+    first = write_asset(tmp_path, "<div>plot</div>", ".html")
+    assert first.startswith("_static/mystx-outputs/") and first.endswith(".html")
+    assert write_asset(tmp_path, "<div>plot</div>", ".html") == first
+    assert write_asset(tmp_path, "<div>other</div>", ".html") != first
+    assert (tmp_path / first).read_text("utf-8") == "<div>plot</div>"
+    assert len(list((tmp_path / "_static" / "mystx-outputs").iterdir())) == 2
+
+
+def test_lazy_placeholder_wraps_preview():
+    preview = [nodes.image(uri="plot.png")]
+    result = lazy_placeholder("_static/mystx-outputs/abc.html", 2 * 1024 * 1024, preview)
+    assert isinstance(result[0], nodes.raw)
+    assert 'data-src="_static/mystx-outputs/abc.html"' in result[0].astext()
+    assert result[1] is preview[0]
+    assert "2.0 MB" in result[-1].astext() and result[-1].astext().endswith("</div>")
+    assert len(lazy_placeholder("x.html", 300 * 1024, [])) == 2
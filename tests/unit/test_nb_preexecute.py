@@ -0,0 +1,91 @@
+from pathlib import PurePosixPath
+from types import SimpleNamespace
+
+import pytest
+
+from myst_nb.core.config import NbParserConfig
+from myst_parser.config.main import MdParserConfig
+
+from mystx.nb_preexecute import collect_jobs
+
+NOTEBOOK = """---
+file_format: mystnb
+kernelspec:
+  name: python3
+  display_name: Python 3
+{extra}---
+# Title
+
+```{{code-cell}} python
+print(1)
+```
+"""
+
+
+def _env(tmp_path, **config):
+    return SimpleNamespace(
+        mystnb_config=NbParserConfig(execution_mode="cache",
+                                     execution_cache_path=str(tmp_path / "cache"), **config),
+        myst_config=MdParserConfig(),
+        doc2path=lambda docname: tmp_path / f"{docname}.md",
+    )
+
+
+def test_collect_jobs_selects_uncached_cache_mode_notebooks(tmp_path):
+    (tmp_path / "nb.md").write_text(NOTEBOOK.format(extra=""), "utf-8")
+    off = NOTEBOOK.format(extra="mystnb:\n  execution_mode: 'off'\n")
+    (tmp_path / "off.md").write_text(off, "utf-8")
+    (tmp_path / "plain.md").write_text("# Plain\n", "utf-8")
+    jobs = collect_jobs(None, _env(tmp_path), ["nb", "off", "plain"])
+    assert [job.docname for job in jobs] == ["nb"]
+    assert jobs[0].cell_timeout == 30
+    assert jobs[0].notebook.cells[-1].source.strip() == "print(1)"
+
+
+def test_failed_results_are_not_cached(tmp_path):
+    import nbformat
+    from jupyter_cache import get_cache
+
+    from mystx.nb_preexecute import store_result
+
+    (tmp_path / "nb.md").write_text(NOTEBOOK.format(extra=""), "utf-8")
+    env = _env(tmp_path)
+    [job] = collect_jobs(None, env, ["nb"])
+    assert job.raise_on_error is False
+
+    # 出错时只记录回溯，不写入缓存，下次构建或由 myst-nb 重新执行
+    store_result(env, job, {"notebook": nbformat.writes(job.notebook), "seconds": 5.0,
+                            "error": "CellTimeoutError", "traceback": "Traceback ..."})
+    cache = get_cache(str(tmp_path / "cache"))
+    assert cache.list_cache_records() == []
+    assert cache.get_project_record(str(job.path)).traceback == "Traceback ..."
+    assert [retry.docname for retry in collect_jobs(None, env, ["nb"])] == ["nb"]
+
+    store_result(env, job, {"notebook": nbformat.writes(job.notebook), "seconds": 1.0,
+                            "error": None, "traceback": None})
+    assert collect_jobs(None, env, ["nb"]) == []
+
+
+def test_run_jobs_enforces_deadline_in_parent(tmp_path):
+    import time
+
+    pytest.importorskip("ipykernel")
+    from mystx.nb_preexecute import exclude_failed, run_jobs
+
+    (tmp_path / "fast.md").write_text(NOTEBOOK.format(extra=""), "utf-8")
+    slow = NOTEBOOK.format(extra="").replace("print(1)", "import time\ntime.sleep(60)")
+    (tmp_path / "slow.md").write_text(slow, "utf-8")
+    # 单元格超时大于整体时间上限，只能由主进程结束工作进程
+    env = _env(tmp_path, execution_timeout=120)
+    jobs = collect_jobs(None, env, ["fast", "slow"])
+
+    started = time.monotonic()
+    results = {job.docname: result for job, result in run_jobs(jobs, 2, 15)}
+    assert time.monotonic() - started < 40
+    assert results["fast"]["error"] is None
+    assert results["slow"]["error"] == "TimeoutError"
+
+    # 失败的笔记本在本次构建中加入 myst-nb 的排除规则
+    exclude_failed(env, [job for job in jobs if job.docname == "slow"])
+    pattern = env.mystnb_config.execution_excludepatterns[-1]
+    assert PurePosixPath((tmp_path / "slow.md").as_posix()).match(pattern)
@@ -0,0 +1,23 @@
+from mystx.search_shards import shard_key, split_index
+
+
+def test_shard_key():
+    assert shard_key("sphinx") == "s"
+    assert shard_key("3d") == "3"
+    assert shard_key("中文") == "u" + format(ord("中") % 32, "x")
+
+
+def test_split_index_moves_terms_into_shards():
+    index = {
+        "docnames": ["a", "b"],
+        "terms": {"alpha": 0, "beta": [0, 1], "中文": 1},
+        "titleterms": {"alpha": 1},
+    }
+    base, shards = split_index(index)
+    assert base["terms"] == {} and base["titleterms"] == {}
+    assert base["docnames"] == ["a", "b"]
+    assert shards["a"] == {"terms": {"alpha": 0}, "titleterms": {"alpha": 1}}
+    assert shards["b"]["terms"] == {"beta": [0, 1]}
+    assert shards[shard_key("中文")]["terms"] == {"中文": 1}
+    # 原索引不被修改
+    assert index["terms"]["alpha"] == 0
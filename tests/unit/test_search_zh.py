@@ -0,0 +1,18 @@
+from mystx.search_zh import SegmentCache, _fallback_cut
+
+
+def test_fallback_cut_keeps_runs_and_bigrams():
+    assert _fallback_cut("中文搜索 abc 世界") == ["中文搜索", "中文", "文搜", "搜索", "世界"]
+
+
+def test_segment_doc_skips_unchanged(tmp_path):
+    cache = SegmentCache(tmp_path / "seg.pickle")
+    digest, table = cache.segment_doc("a", ["hello 世界"])
+    assert table["hello 世界"][1] == 1
+    cache.docs["a"] = (digest, table)
+    assert cache.segment_doc("a", ["hello 世界"]) is None
+    cache.save()
+
+    reloaded = SegmentCache(tmp_path / "seg.pickle")
+    reloaded.load()
+    assert reloaded.docs == cache.docs
@@ -0,0 +1,32 @@
+from mystx.service_worker import PrecacheManifest, render_service_worker
+
+
+def _site(tmp_path):
+    (tmp_path / "_static" / "css").mkdir(parents=True)
+    (tmp_path / "_static" / "css" / "a.css").write_text("a{}")
+    (tmp_path / "searchindex.js").write_text("Search.setIndex({})")
+    (tmp_path / "index.html").write_text("<p>x</p>")
+    return tmp_path
+
+
+def test_manifest_excludes_html_by_default(tmp_path):
+    urls = [e["url"] for e in PrecacheManifest(_site(tmp_path)).collect()]
+    assert urls == ["_static/css/a.css", "searchindex.js"]
+
+
+def test_manifest_version_tracks_content(tmp_path):
+    site = _site(tmp_path)
+    manifest = PrecacheManifest(site, include_html=True)
+    manifest.collect()
+    assert "index.html" in [e["url"] for e in manifest.entries]
+    before = manifest.version
+    (site / "index.html").write_text("<p>y</p>")
+    manifest.collect()
+    assert manifest.version != before
+
+
+def test_render_service_worker():
+    source = render_service_worker("abc", True)
+    assert 'const VERSION = "abc";' in source
+    assert "const OFFLINE = true;" in source
+    assert "__MYSTX_" not in source
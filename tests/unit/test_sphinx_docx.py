@@ -0,0 +1,318 @@
+import io
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("docx")
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "doc" / "_ext"))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+from docx import Document  # noqa: E402
+from sphinx.application import Sphinx  # noqa: E402
+
+import bench_docx  # noqa: E402
+
+CONF = f"import sys\nsys.path.insert(0, {str(ROOT / 'doc' / '_ext')!r})\n" \
+       "extensions = ['sphinx_docx']\nproject = 'test'\nversion = '1'\n"
+
+
+def _project(srcdir, files, **config):
+    srcdir.mkdir(parents=True, exist_ok=True)
+    settings = "".join(f"{k} = {v!r}\n" for k, v in config.items())
+    (srcdir / "conf.py").write_text(CONF + settings, "utf-8")
+    for name, text in files.items():
+        (srcdir / name).write_text(text, "utf-8")
+    return srcdir
+
+
+def _build(srcdir, parallel=0, freshenv=True, warning=None):
+    outdir = srcdir / "_build"
+    app = Sphinx(srcdir, srcdir, outdir, outdir / ".doctrees", "docx",
+                 status=None, warning=warning, freshenv=freshenv, parallel=parallel)
+    app.build()
+    return app
+
+
+def _paragraphs(app):
+    return [p.text for p in Document(str(app.builder.output_path)).paragraphs]
+
+
+NESTED = {
+    "index.rst": "Book\n====\n\n.. toctree::\n\n   ch1\n   ch2\n",
+    "ch1.rst": "Chapter One\n###########\n\nFirst body.\n\n"
+               ".. toctree::\n\n   ch1sub\n\nAfter toctree.\n",
+    "ch1sub.rst": "Sub Chapter\n===========\n\nNested body.\n",
+    "ch2.rst": "Chapter Two\n###########\n\nSecond body.\n",
+}
+
+
+@pytest.mark.parametrize("parallel", [0, 2])
+@pytest.mark.parametrize("streaming", [False, True])
+def test_chapter_assembly_matches_inline_with_nested_toctree(tmp_path, parallel, streaming):
+    inline = _build(_project(tmp_path / "inline", NESTED, docx_streaming=streaming), parallel)
+    chapter = _build(_project(tmp_path / "chapter", NESTED, docx_assembly="chapter",
+                              docx_streaming=streaming), parallel)
+    expected = _paragraphs(inline)
+    assert _paragraphs(chapter) == expected
+    texts = [text for text in expected if text]
+    assert texts.index("Chapter One") < texts.index("Sub Chapter") < texts.index("Chapter Two")
+    assert texts.index("First body.") < texts.index("Nested body.") < texts.index("Second body.")
+
+
+def test_trace_is_collected_only_when_enabled(tmp_path):
+    files = {"index.rst": "Title\n=====\n\nSome *text*.\n\n- one\n- two\n"}
+    plain = _build(_project(tmp_path / "plain", files))
+    traced = _build(_project(tmp_path / "traced", files, docx_trace=True))
+    assert not plain.builder.trace_counts
+    assert traced.builder.trace_counts["paragraph"] == 3
+    assert traced.builder.trace_counts["list_item"] == 2
+    assert set(traced.builder.trace_times) == set(traced.builder.trace_counts)
+    assert _paragraphs(traced) == _paragraphs(plain)
+
+
+def _generated(srcdir, **params):
+    params = {**bench_docx.DEFAULTS, "chapters": 3, "depth": 2, "sections": 2, "paragraphs": 2,
+              **params}
+    bench_docx.generate(srcdir, params)
+    return srcdir
+
+
+def _cache(app):
+    return {path.name: path.stat().st_mtime_ns
+            for path in app.builder.part_cache_dir.glob("*.docx")}
+
+
+def test_part_cache_reused_on_rebuild(tmp_path):
+    srcdir = _generated(tmp_path / "src")
+    first = _build(srcdir)
+    cache = _cache(first)
+    output = first.builder.output_path.stat().st_mtime_ns
+    assert len(cache) == 4  # 根分部与三个章节
+
+    # 没有变化时不重新转换也不重写输出
+    again = _build(srcdir, freshenv=False)
+    assert _cache(again) == cache
+    assert again.builder.output_path.stat().st_mtime_ns == output
+
+    # 重新读取全部文档时分部内容不变，全部复用缓存
+    reread = _build(srcdir)
+    assert _cache(reread) == cache
+    assert _paragraphs(reread) == _paragraphs(first)
+
+    # 修改一个章节只重新转换该章节，旧的分部被清除
+    chapter = srcdir / "chapter1.rst"
+    chapter.write_text(chapter.read_text("utf-8") + "\nAppended paragraph.\n", "utf-8")
+    edited = _build(srcdir, freshenv=False)
+    updated = _cache(edited)
+    assert len(updated) == 4
+    assert len(set(updated) - set(cache)) == 1
+    assert {name: cache[name] for name in set(updated) & set(cache)} == \
+        {name: updated[name] for name in set(updated) & set(cache)}
+    assert "Appended paragraph." in _paragraphs(edited)
+
+
+def test_output_rewritten_when_assembly_settings_change(tmp_path):
+    srcdir = _generated(tmp_path / "src")
+    first = _build(srcdir)
+    output = first.builder.output_path.stat().st_mtime_ns
+
+    # 只修改合并方式时文档无需重新读取，但输出需要重新合并
+    conf = srcdir / "conf.py"
+    conf.write_text(conf.read_text("utf-8") + "docx_streaming = True\n", "utf-8")
+    streamed = _build(srcdir, freshenv=False)
+    assert streamed.builder.output_path.stat().st_mtime_ns != output
+    assert _cache(streamed) == _cache(first)
+    assert _paragraphs(streamed) == _paragraphs(first)
+
+    output = streamed.builder.output_path.stat().st_mtime_ns
+    again = _build(srcdir, freshenv=False)
+    assert again.builder.output_path.stat().st_mtime_ns == output
+
+
+def test_parallel_write_matches_serial(tmp_path):
+    params = {"lists": 1, "tables": 1, "table_rows": 3}
+    serial = _build(_generated(tmp_path / "serial", **params))
+    parallel = _build(_generated(tmp_path / "parallel", **params), parallel=2)
+    assert _paragraphs(parallel) == _paragraphs(serial)
+    assert len(_cache(parallel)) == len(_cache(serial)) == 4
+
+
+def test_parallel_write_bounds_parts_in_flight(tmp_path, monkeypatch):
+    from sphinx.util.parallel import ParallelTasks
+
+    in_flight = []
+    add_task = ParallelTasks.add_task
+
+    def record(tasks, func, *args):
+        if getattr(func, "__name__", None) == "_translate_part":
+            in_flight.append(tasks._pworking + len(tasks._precvs_waiting))
+        add_task(tasks, func, *args)
+
+    monkeypatch.setattr(ParallelTasks, "add_task", record)
+    app = _build(_generated(tmp_path / "src", chapters=6), parallel=2)
+    assert len(in_flight) == 7
+    assert max(in_flight) < 2
+    assert len(_cache(app)) == 7
+
+
+def _body(app):
+    from lxml import etree
+
+    document = Document(str(app.builder.output_path))
+    images = sorted((rel.rId, rel.target_part.blob) for rel in document.part.rels.values()
+                    if rel.reltype.endswith("/image"))
+    return etree.tostring(document.element.body), images
+
+
+@pytest.mark.parametrize("assembly", ["inline", "chapter"])
+def test_stream_parts_matches_merge_parts(tmp_path, assembly):
+    params = {"images": 4, "image_size": (400, 300), "tables": 1, "table_rows": 2, "lists": 1}
+    merged = _build(_generated(tmp_path / "merged", **params, config={"docx_assembly": assembly}))
+    streamed = _build(_generated(tmp_path / "streamed", **params,
+                                 config={"docx_assembly": assembly, "docx_streaming": True}))
+    body, images = _body(streamed)
+    assert (body, images) == _body(merged)
+    assert len(images) == 4
+
+
+def test_style_registry_fallbacks():
+    from docx.enum.style import WD_STYLE_TYPE
+    from sphinx_docx.styles import StyleRegistry, fallbacks
+
+    assert fallbacks("List Bullet 5") == (
+        "List Bullet 4", "List Bullet 3", "List Bullet 2", "List Bullet",
+    )
+    document = Document()
+    registry = StyleRegistry(document.styles)
+    assert registry.resolve("Heading 1", WD_STYLE_TYPE.PARAGRAPH) == ("Heading 1", "Heading1")
+    assert registry.resolve("Normal", WD_STYLE_TYPE.PARAGRAPH) == ("Normal", None)
+    assert registry.resolve("Grid Table 4", WD_STYLE_TYPE.TABLE) == ("Table Grid", "TableGrid")
+    assert registry.resolve("List Bullet 9", WD_STYLE_TYPE.PARAGRAPH) == \
+        ("List Bullet 3", "ListBullet3")
+    assert registry.resolve("No Such Style", WD_STYLE_TYPE.PARAGRAPH) == (None, None)
+    assert registry.name("Heading1") == "Heading 1"
+    assert registry.name(None) == "Normal"
+    shared = StyleRegistry.for_template(None, document)
+    assert shared is StyleRegistry.for_template(None, Document())
+
+
+def test_missing_styles_are_reported_once(tmp_path):
+    table = ".. list-table::\n\n   * - a\n     - b\n\n"
+    warning = io.StringIO()
+    srcdir = _project(tmp_path / "src", {"index.rst": "Title\n=====\n\n" + table * 3})
+    app = _build(srcdir, warning=warning)
+    assert app.builder.missing_styles == {("Grid Table 4", "Table Grid"): 3}
+    assert warning.getvalue().count("docx template is missing styles") == 1
+    document = Document(str(app.builder.output_path))
+    assert [t.style.name for t in document.tables] == ["Table Grid"] * 3
+
+
+SPANNED_TABLE = """\
+Title
+=====
+
++-----+-----+-----+
+| h1  | h2  | h3  |
++=====+=====+=====+
+| wide      | c   |
++-----+-----+     +
+| a   | b   |     |
++-----+-----+-----+
+| tall| x   | y   |
++     +-----+-----+
+|     | z   | w   |
++-----+-----+-----+
+"""
+
+
+def test_table_spans_use_grid_span_and_vmerge(tmp_path):
+    from docx.oxml.ns import qn
+
+    app = _build(_project(tmp_path / "src", {"index.rst": SPANNED_TABLE}))
+    table = Document(str(app.builder.output_path)).tables[0]
+
+    def cells(tr):
+        return [(tc.grid_span, tc.vMerge, "".join(t.text for t in tc.iter(qn("w:t"))))
+                for tc in tr.tc_lst]
+
+    assert [cells(tr) for tr in table._tbl.tr_lst] == [
+        [(1, None, "h1"), (1, None, "h2"), (1, None, "h3")],
+        [(2, None, "wide"), (1, "restart", "c")],
+        [(1, None, "a"), (1, None, "b"), (1, "continue", "")],
+        [(1, "restart", "tall"), (1, None, "x"), (1, None, "y")],
+        [(1, "continue", ""), (1, None, "z"), (1, None, "w")],
+    ]
+    assert len(table._tbl.tblGrid.gridCol_lst) == 3
+
+
+def test_adjacent_text_with_same_format_is_one_run(tmp_path):
+    text = "Title\n=====\n\n" + bench_docx.SENTENCE + "\n\nplain **bold** *it* ``code`` tail\n"
+    app = _build(_project(tmp_path / "src", {"index.rst": text}))
+    paragraphs = Document(str(app.builder.output_path)).paragraphs
+    runs = [[(r.text, bool(r.bold), bool(r.italic)) for r in p.runs] for p in paragraphs[1:3]]
+    assert runs == [
+        [("Lorem ipsum dolor sit amet, ", False, False), ("consectetur", False, True),
+         (" adipiscing elit, sed do eiusmod tempor ", False, False), ("incididunt", True, False),
+         (" ut labore et dolore magna aliqua, see example.", False, False)],
+        [("plain ", False, False), ("bold", True, False), (" ", False, False), ("it", False, True),
+         (" code tail", False, False)],
+    ]
+
+
+def test_image_in_table_cell_is_sized_and_cached(tmp_path):
+    pytest.importorskip("PIL")
+    from PIL import Image
+
+    srcdir = _project(tmp_path / "src", {
+        "index.rst": "Title\n=====\n\n.. list-table::\n\n"
+                     "   * - .. image:: pic.png\n          :width: 50%\n"
+                     "     - text\n",
+    })
+    (srcdir / "pic.png").write_bytes(bench_docx.png_bytes(1600, 1000, seed=1))
+    app = _build(srcdir)
+    document = Document(str(app.builder.output_path))
+    cell = document.tables[0].cell(0, 0)
+    # 图片放在单元格自带的段落中，宽度为单元格宽度的一半
+    assert len(cell.paragraphs) == 1
+    shape = document.inline_shapes[0]
+    assert shape.width == cell.width // 2
+    blob = next(rel.target_part.blob for rel in document.part.rels.values()
+                if rel.reltype.endswith("/image"))
+    with Image.open(io.BytesIO(blob)) as image:
+        assert image.width == round(shape.width.inches * 150)
+        assert abs(shape.height - shape.width * 1000 / 1600) < shape.width / image.width
+
+    # 分部缓存清空后重新转换，缩放后的图片从缓存复用
+    cached = {path: path.stat().st_mtime_ns for path in app.builder.image_cache_dir.iterdir()}
+    assert len(cached) == 1
+    for path in app.builder.part_cache_dir.iterdir():
+        path.unlink()
+    again = _build(srcdir)
+    reused = {path: path.stat().st_mtime_ns for path in again.builder.image_cache_dir.iterdir()}
+    assert reused == cached
+    assert _body(again) == _body(app)
+
+
+def test_image_settings_change_rewrites_images(tmp_path):
+    pytest.importorskip("PIL")
+    from PIL import Image
+
+    text = "Title\n=====\n\n.. image:: pic.png\n   :width: 4in\n"
+    srcdir = _project(tmp_path / "src", {"index.rst": text})
+    (srcdir / "pic.png").write_bytes(bench_docx.png_bytes(1600, 1000, seed=1))
+
+    def width(app):
+        document = Document(str(app.builder.output_path))
+        blob = next(rel.target_part.blob for rel in document.part.rels.values()
+                    if rel.reltype.endswith("/image"))
+        with Image.open(io.BytesIO(blob)) as image:
+            return image.width
+
+    assert width(_build(srcdir)) == 600
+    conf = srcdir / "conf.py"
+    conf.write_text(conf.read_text("utf-8") + "docx_image_dpi = 50\n", "utf-8")
+    assert width(_build(srcdir, freshenv=False)) == 200
+
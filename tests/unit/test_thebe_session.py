@@ -0,0 +1,141 @@
+import json
+import shutil
+import subprocess
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from mystx.thebe_session import kernel_name, session_config
+
+SCRIPT = (Path(__file__).parents[2] / "src" / "mystx" / "theme" / "mystx" / "static" / "js"
+          / "thebe-session.js")
+
+
+class JupyterStandIn(BaseHTTPRequestHandler):
+    """只实现内核接口与 Binder 构建事件流的 Jupyter 服务器替身。"""
+
+    kernels = {}
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.requests.append(("GET", self.path))
+        if self.path.startswith("/build/"):
+            base = f"http://127.0.0.1:{self.server.server_port}/"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            events = ({"phase": "building"}, {"phase": "ready", "url": base, "token": "secret"})
+            for event in events:
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+            return
+        if self.path == "/api/kernels":
+            return self._json(200, list(self.kernels.values()))
+        kernel = self.kernels.get(self.path.rsplit("/", 1)[-1])
+        return self._json(200, kernel) if kernel else self._json(404, {})
+
+    def do_POST(self):
+        self.requests.append(("POST", self.path))
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        kernel = {"id": str(uuid.uuid4()), "name": body["name"]}
+        self.kernels[kernel["id"]] = kernel
+        self._json(201, kernel)
+
+
+HARNESS = """
+const { ThebeSession } = require(process.argv[1]);
+const config = JSON.parse(process.argv[2]);
+const data = {};
+const storage = {
+    getItem: (key) => (key in data ? data[key] : null),
+    setItem: (key, value) => { data[key] = value; },
+    removeItem: (key) => { delete data[key]; },
+};
+(async () => {
+    const first = await new ThebeSession(config, storage).kernel();
+    // 下一个页面：新的会话层实例，共享浏览器存储
+    const page = new ThebeSession(config, storage);
+    const second = await page.kernel();
+    const server = await page.server();
+    // thebelab 启动内核的请求被转为重新连接
+    const patched = page.wrapFetch(fetch);
+    const response = await patched(server.baseUrl + 'api/kernels', {
+        method: 'POST', body: JSON.stringify({ name: config.kernelName }),
+    });
+    const reattached = await response.json();
+    console.log(JSON.stringify({ first: first.id, second: second.id, reattached: reattached.id,
+                                 status: response.status, server }));
+})().catch((error) => { console.error(error); process.exit(1); });
+"""
+
+
+@pytest.fixture
+def standin():
+    JupyterStandIn.kernels = {}
+    JupyterStandIn.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), JupyterStandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def _run(config):
+    result = subprocess.run(["node", "-e", HARNESS, str(SCRIPT), json.dumps(config)],
+                            capture_output=True, text=True, timeout=30)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout)
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="需要 Node.js")
+@pytest.mark.parametrize("via_binder", [False, True])
+def test_session_reattaches_across_pages(standin, via_binder):
+    config = {"binderUrl": standin, "repo": "org/repo", "ref": "main", "kernelName": "python3",
+              "path": "docs/.", "maxAge": 3600, "serverSettings": None}
+    if not via_binder:
+        config["serverSettings"] = {"baseUrl": f"{standin}/", "token": ""}
+    result = _run(config)
+    assert result["first"] == result["second"] == result["reattached"]
+    assert result["status"] == 201
+    assert result["server"]["baseUrl"] == f"{standin}/"
+    posts = [path for method, path in JupyterStandIn.requests if method == "POST"]
+    assert posts == ["/api/kernels"]
+    builds = [path for _, path in JupyterStandIn.requests if path.startswith("/build/")]
+    assert builds == (["/build/gh/org/repo/main"] if via_binder else [])
+
+
+def test_session_config_follows_thebe_config():
+    config = SimpleNamespace(
+        thebe_config={
+            "repository_url": "https://github.com/org/repo.git",
+            "repository_branch": "main",
+            "path_to_docs": "docs",
+            "serverSettings": {"baseUrl": "http://localhost:8888/"},
+        },
+        mystx_thebe_prewarm="load",
+        mystx_thebe_session_max_age=600,
+    )
+    result = session_config(config, "guide/intro", {"kernelspec": {"name": "ir"}})
+    assert result["repo"] == "org/repo"
+    assert result["ref"] == "main"
+    assert result["path"] == "docs/guide"
+    assert result["kernelName"] == "ir"
+    assert result["serverSettings"] == {"baseUrl": "http://localhost:8888/"}
+    assert result["prewarm"] == "load"
+    assert kernel_name({"thebe-kernel": "julia", "kernelspec": '{"name": "ir"}'}) == "julia"
+    assert kernel_name({"kernelspec": '{"name": "ir"}'}) == "ir"
+    assert kernel_name({}) == "python3"